@@ -363,8 +363,9 @@ async def discover_topic_ideas(content: str, custom_prompt: str = None) -> list:
             logger.warning(f"获取默认AI模型失败: {e}")
             model = "deepseek-chat"
         
-        # 调用AI分析
-        result = refine_content(content, prompt, model)
+        # 调用AI分析（在线程池中执行，重试等待不阻塞事件循环）
+        from task_pools import run_in_pool
+        result = await run_in_pool("ai", refine_content, content, prompt, model)
         
         if result and 'refined_text' in result:
             # 尝试解析JSON结果
@@ -0,0 +1,145 @@
+"""
+文件名: async_crud.py
+作用: 异步数据库 CRUD 操作（供 async 接口使用，不阻塞事件循环）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from models import Material, Topic
+import crud
+import cache_service
+import job_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 通过 AsyncSession.run_sync 复用 crud.py 中的同步实现：
+# 同步代码在 greenlet 中执行，数据库 IO 由 aiosqlite 异步完成，事件循环不会被阻塞
+# 返回给接口的对象必须已加载所需属性（延迟加载只能在 run_sync 内部触发）
+
+async def _run(db: AsyncSession, func, *args, **kwargs):
+    """在异步会话上执行同步 CRUD 函数"""
+    return await db.run_sync(lambda session: func(session, *args, **kwargs))
+
+# ========== 列表查询 ==========
+
+async def list_materials(db: AsyncSession, columns: list, **filters):
+    """查询素材列表，参数同 crud.list_materials"""
+    return await _run(db, crud.list_materials, columns, **filters)
+
+async def list_deleted_materials(db: AsyncSession, columns: list, **filters):
+    """查询回收站素材，参数同 crud.list_deleted_materials"""
+    return await _run(db, crud.list_deleted_materials, columns, **filters)
+
+async def list_topics(db: AsyncSession, columns: list, **filters):
+    """查询选题列表，参数同 crud.list_topics"""
+    return await _run(db, crud.list_topics, columns, **filters)
+
+# ========== 素材 ==========
+
+def _get_material_with_content(db: Session, material_id: int):
+    """获取素材并预先加载正文"""
+    logger.info(f"查询素材: id={material_id}")
+    return db.query(Material).options(
+        selectinload(Material.body_chunks)
+    ).filter(Material.id == material_id).first()
+
+async def get_material(db: AsyncSession, material_id: int, with_content: bool = False):
+    """
+    获取素材
+
+    参数:
+        with_content (bool): 是否同时加载正文（需要访问 material.content 时传 True）
+    """
+    if with_content:
+        return await _run(db, _get_material_with_content, material_id)
+    return await _run(db, crud.get_material, material_id)
+
+async def delete_material(db: AsyncSession, material_id: int):
+    """软删除素材（素材不存在时返回 None）"""
+    return await _run(db, crud.delete_material, material_id)
+
+async def restore_material(db: AsyncSession, material_id: int):
+    """恢复素材（素材不存在时返回 None）"""
+    return await _run(db, crud.restore_material, material_id)
+
+async def get_material_by_file_hash(db: AsyncSession, file_hash: str):
+    """根据原始文件哈希查找素材（包括回收站中的素材）"""
+    return await _run(db, crud.get_material_by_file_hash, file_hash)
+
+async def get_material_by_source_url(db: AsyncSession, source_url: str):
+    """根据来源 URL 查找素材（包括回收站中的素材）"""
+    return await _run(db, crud.get_material_by_source_url, source_url)
+
+async def get_material_contents(db: AsyncSession, material_ids: list):
+    """批量读取素材正文，返回 {素材ID: 正文}"""
+    return await _run(db, crud.get_material_contents, material_ids)
+
+# ========== 选题 ==========
+
+async def create_topic(db: AsyncSession, topic_data: dict):
+    """创建选题"""
+    return await _run(db, crud.create_topic, topic_data)
+
+async def get_topic(db: AsyncSession, topic_id: int):
+    """获取选题"""
+    return await _run(db, crud.get_topic, topic_id)
+
+async def update_topic(db: AsyncSession, db_topic: Topic, topic_data: dict):
+    """更新选题"""
+    return await _run(db, crud.update_topic, db_topic, topic_data)
+
+async def delete_topic(db: AsyncSession, db_topic: Topic):
+    """删除选题"""
+    return await _run(db, crud.delete_topic, db_topic)
+
+# ========== 标签 ==========
+
+async def get_all_tags(db: AsyncSession):
+    """获取所有标签"""
+    return await _run(db, crud.get_all_tags)
+
+async def get_tag_by_name(db: AsyncSession, name: str):
+    """根据名称获取标签"""
+    return await _run(db, crud.get_tag_by_name, name)
+
+async def create_tag(db: AsyncSession, name: str, color: str = "#3b82f6", is_preset: bool = False):
+    """创建标签"""
+    return await _run(db, crud.create_tag, name, color, is_preset)
+
+async def update_material_tags(db: AsyncSession, material: Material, tag_names: list):
+    """更新素材标签（JSON 字段和关联表同时更新）"""
+    return await _run(db, crud.update_material_tags, material, tag_names)
+
+async def update_tag_usage_count(db: AsyncSession, tag_name: str, increment: int = 1):
+    """更新标签使用次数"""
+    return await _run(db, crud.update_tag_usage_count, tag_name, increment)
+
+# ========== 后台任务 ==========
+
+async def get_job(db: AsyncSession, job_id: int):
+    """获取后台任务"""
+    return await _run(db, crud.get_job, job_id)
+
+async def enqueue_job(db: AsyncSession, job_type: str, params: dict):
+    """创建任务并提交到线程池，参数同 job_service.enqueue_job"""
+    return await _run(db, job_service.enqueue_job, job_type, params)
+
+# ========== 配置和使用统计 ==========
+
+async def get_config(db: AsyncSession, key: str):
+    """获取配置"""
+    return await _run(db, crud.get_config, key)
+
+async def create_or_update_usage_stats(db: AsyncSession, **stats):
+    """创建或更新使用统计，参数同 crud.create_or_update_usage_stats"""
+    return await _run(db, crud.create_or_update_usage_stats, **stats)
+
+# ========== 运行指标 ==========
+
+async def get_cache_stats(db: AsyncSession):
+    """提取缓存统计"""
+    return await _run(db, cache_service.get_stats)
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+性能基准测试脚本
+用于对比优化前后的性能（在临时目录中运行，不影响正式数据库）
+
+用法:
+    python benchmark.py            运行全部场景
+    python benchmark.py db pdf     只运行指定场景
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import threading
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 被测模块的日志过多，只保留警告
+for module_name in ("crud", "search_service", "main", "pdf_service", "dedup_service", "image_service"):
+    logging.getLogger(module_name).setLevel(logging.WARNING)
+
+# ========== 数据库并发读写 ==========
+
+def _run_write_storm(engine, seconds: float, writers: int, readers: int):
+    """
+    写入风暴中测量读取吞吐
+
+    writers 个线程持续写入大段正文素材，同时 readers 个线程反复查询素材列表
+
+    返回:
+        dict: 读写次数和失败次数
+    """
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, Material
+    import crud
+
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    stats = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def writer(worker_id):
+        count = 0
+        while time.time() < deadline:
+            db = Session()
+            try:
+                # 约 200KB 正文，模拟一次 PDF 入库
+                content = f"写入线程{worker_id}-第{count}篇 " + "模拟长篇 PDF 素材正文。" * 16000
+                crud.create_material(db, {"title": f"素材{worker_id}-{count}", "content": content, "source_type": "podcast"})
+                with lock:
+                    stats["writes"] += 1
+            except Exception:
+                db.rollback()
+                with lock:
+                    stats["write_errors"] += 1
+            finally:
+                db.close()
+            count += 1
+
+    def reader():
+        while time.time() < deadline:
+            db = Session()
+            try:
+                db.query(Material.id, Material.title, Material.created_at).filter(
+                    Material.is_deleted == 0
+                ).order_by(Material.created_at.desc(), Material.id.desc()).limit(20).all()
+                with lock:
+                    stats["reads"] += 1
+            except Exception:
+                with lock:
+                    stats["read_errors"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return stats
+
+def benchmark_db(seconds: float = 10, writers: int = 4, readers: int = 8):
+    """对比默认配置和 WAL + PRAGMA 调优后的并发读写"""
+    from sqlalchemy import create_engine
+    from database import create_db_engine
+
+    logger.info(f"🗄️ 数据库并发读写: {writers} 个写线程, {readers} 个读线程, 各 {seconds} 秒")
+
+    work_dir = tempfile.mkdtemp(prefix="contenthub-bench-")
+    try:
+        # 优化前：与原 database.py 相同的引擎
+        baseline = create_engine(
+            f"sqlite:///{os.path.join(work_dir, 'baseline.db')}",
+            connect_args={"check_same_thread": False}
+        )
+        tuned = create_db_engine(f"sqlite:///{os.path.join(work_dir, 'tuned.db')}")
+
+        results = {}
+        for name, engine in (("默认配置", baseline), ("WAL + 调优", tuned)):
+            stats = _run_write_storm(engine, seconds, writers, readers)
+            results[name] = stats
+            logger.info(
+                f"  {name}: 读 {stats['reads'] / seconds:.0f} 次/秒（失败 {stats['read_errors']}）, "
+                f"写 {stats['writes'] / seconds:.1f} 次/秒（失败 {stats['write_errors']}）"
+            )
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# ========== 测试数据 ==========
+
+def make_text_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """
+    生成纯文本 PDF（手写 PDF 结构，不依赖第三方库）
+
+    参数:
+        path (str): 输出路径
+        pages (int): 页数
+        lines_per_page (int): 每页行数
+
+    返回:
+        list: 写入的全部文本行（用于核对提取结果）
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # 页面树，页面对象生成后再填充
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    all_lines = []
+    for page in range(pages):
+        lines = [
+            f"Page {page + 1} line {line + 1}: ContentHub benchmark text for PDF extraction."
+            for line in range(lines_per_page)
+        ]
+        all_lines.extend(lines)
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(output)
+    return all_lines
+
+# ========== PDF 文本提取 ==========
+
+def benchmark_pdf(pages: int = 300, repeat: int = 2):
+    """对比逐页顺序提取和进程池并行提取的吞吐"""
+    from config import settings
+    from pdf_service import extract_text_from_pdf
+    from task_pools import get_process_pool, shutdown_pools
+
+    workers = settings.PROCESS_POOL_WORKERS
+    logger.info(f"📄 PDF 文本提取: {pages} 页, 进程数 {workers}（CPU 核数 {os.cpu_count()}）")
+
+    work_dir = tempfile.mkdtemp(prefix="contenthub-bench-")
+    try:
+        path = os.path.join(work_dir, "bench.pdf")
+        make_text_pdf(path, pages)
+
+        # 预先启动子进程，不把进程启动时间计入结果
+        get_process_pool().submit(os.getpid).result()
+
+        results = {}
+        texts = {}
+        for name, parallel in (("顺序", False), ("并行", True)):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                texts[name] = extract_text_from_pdf(path, parallel=parallel)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = best
+            logger.info(f"  {name}: {best:.2f} 秒, {pages / best:.0f} 页/秒")
+
+        if texts["顺序"] != texts["并行"]:
+            logger.error("❌ 顺序和并行提取的文本不一致")
+        logger.info(f"  加速比: {results['顺序'] / results['并行']:.2f}x")
+        return results
+    finally:
+        shutdown_pools()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _line_fidelity(text: str, expected_lines: list) -> float:
+    """提取文本的还原度：期望行中被原样提取出来的比例"""
+    extracted = set(line.strip() for line in text.splitlines())
+    return sum(1 for line in expected_lines if line.strip() in extracted) / len(expected_lines)
+
+def benchmark_engines(pages: int = 100):
+    """
+    对比各 PDF 提取引擎的速度和还原度
+
+    使用生成的 PDF（与写入的文本逐行核对）；设置环境变量 BENCHMARK_PDF_DIR 时，
+    同时测试该目录下的真实 PDF（以 pdfplumber 的结果为基准）
+    """
+    from pdf_service import extract_text_from_pdf, PDF_ENGINES
+
+    logger.info(f"🔧 PDF 提取引擎: {', '.join(PDF_ENGINES)}")
+
+    work_dir = tempfile.mkdtemp(prefix="contenthub-bench-")
+    try:
+        path = os.path.join(work_dir, "bench.pdf")
+        samples = [(path, pages, make_text_pdf(path, pages))]
+
+        sample_dir = os.environ.get("BENCHMARK_PDF_DIR")
+        if sample_dir:
+            for name in sorted(os.listdir(sample_dir)):
+                if name.lower().endswith(".pdf"):
+                    samples.append((os.path.join(sample_dir, name), None, None))
+
+        results = {}
+        for sample_path, page_count, expected_lines in samples:
+            logger.info(f"  {os.path.basename(sample_path)}:")
+            if expected_lines is None:
+                expected_lines = extract_text_from_pdf(sample_path, parallel=False, engine="pdfplumber").splitlines()
+            if page_count is None:
+                import pdfplumber
+                with pdfplumber.open(sample_path) as pdf:
+                    page_count = len(pdf.pages)
+
+            for engine in PDF_ENGINES:
+                start = time.perf_counter()
+                text = extract_text_from_pdf(sample_path, parallel=False, engine=engine)
+                elapsed = time.perf_counter() - start
+                fidelity = _line_fidelity(text, expected_lines)
+                results[(sample_path, engine)] = {"seconds": elapsed, "fidelity": fidelity}
+                logger.info(f"    {engine}: {page_count / elapsed:.0f} 页/秒, 还原度 {fidelity:.1%}")
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# ========== 接口响应（重负载入库时） ==========
+
+def _start_api_server(work_dir: str):
+    """在后台线程启动 API 服务（工作目录为临时目录），返回 (server, 地址)"""
+    import socket
+    import uvicorn
+
+    os.chdir(work_dir)
+    import main
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+def benchmark_health(uploads: int = 4, pages: int = 60):
+    """多个 PDF 同时入库时，测量健康检查接口的延迟"""
+    import requests
+
+    logger.info(f"💓 入库期间的接口延迟: 同时上传 {uploads} 个 {pages} 页 PDF")
+
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="contenthub-bench-")
+    server = None
+    try:
+        server, base_url = _start_api_server(work_dir)
+
+        pdf_paths = []
+        for i in range(uploads):
+            path = os.path.join(work_dir, f"bench-{i}.pdf")
+            # 每个文件内容不同，避免被去重
+            make_text_pdf(path, pages + i)
+            pdf_paths.append(path)
+
+        def upload(path):
+            with open(path, "rb") as f:
+                requests.post(
+                    f"{base_url}/api/materials/pdf",
+                    files={"file": (os.path.basename(path), f, "application/pdf")},
+                    timeout=600
+                )
+
+        # 先测一次空闲时的延迟
+        idle = []
+        for _ in range(20):
+            start = time.perf_counter()
+            requests.get(f"{base_url}/api/health", timeout=60)
+            idle.append(time.perf_counter() - start)
+
+        workers = [threading.Thread(target=upload, args=(path,)) for path in pdf_paths]
+        ingest_start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        busy = []
+        while any(worker.is_alive() for worker in workers):
+            start = time.perf_counter()
+            requests.get(f"{base_url}/api/health", timeout=60)
+            busy.append(time.perf_counter() - start)
+            time.sleep(0.05)
+        ingest_seconds = time.perf_counter() - ingest_start
+
+        busy.sort()
+        logger.info(f"  空闲时: 平均 {sum(idle) / len(idle) * 1000:.1f} ms")
+        logger.info(
+            f"  入库时: {len(busy)} 次请求, 中位数 {busy[len(busy) // 2] * 1000:.1f} ms, "
+            f"最大 {busy[-1] * 1000:.1f} ms（入库总耗时 {ingest_seconds:.1f} 秒）"
+        )
+        return {"idle": idle, "busy": busy, "ingest_seconds": ingest_seconds}
+    finally:
+        if server is not None:
+            server.should_exit = True
+            time.sleep(0.5)
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# ========== 网页图片下载和 OCR ==========
+
+def make_png(index: int) -> bytes:
+    """生成一张内容各不相同的 PNG 图片"""
+    from io import BytesIO
+    from PIL import Image
+
+    image = Image.new("RGB", (200, 120), ((index * 37) % 256, (index * 91) % 256, (index * 53) % 256))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _start_image_server(images: list, delay: float):
+    """
+    启动本地图片站点（模拟图文笔记），返回 (server, 笔记页地址)
+
+    /note 页面按顺序引用 /img/<序号>.png，每张图片响应前等待 delay 秒（模拟网络延迟）；
+    使用 HTTP/1.1 长连接，server.connections 记录客户端建立过的连接
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    html = "<html><body>" + "".join(
+        f'<img src="/img/{i}.png">' for i in range(len(images))
+    ) + "</body></html>"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 响应头和正文分两次写出，长连接下 Nagle 算法会和客户端的延迟确认互相等待
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.server.connections.add(self.client_address)
+            if self.path == "/note":
+                body, content_type = html.encode("utf-8"), "text/html; charset=utf-8"
+            elif self.path.startswith("/img/"):
+                time.sleep(delay)
+                body, content_type = images[int(self.path[5:].split(".")[0])], "image/png"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/note"
+
+def benchmark_images(count: int = 10, delay: float = 0.3, ocr_seconds: float = 0.3):
+    """
+    网页图片处理的端到端耗时（下载和 OCR 流水线）
+
+    本地站点每张图片延迟 delay 秒返回；OCR 用固定耗时模拟（不依赖 tesseract），
+    理想情况下总耗时接近单张图片的耗时，而不是 count 倍
+    """
+    from config import settings
+    import image_service
+    from task_pools import shutdown_pools
+
+    logger.info(
+        f"🖼️ 网页图片处理: {count} 张图片, 下载 {delay:.1f} 秒/张, OCR {ocr_seconds:.1f} 秒/张"
+        f"（OCR 线程数 {settings.OCR_POOL_WORKERS}, 同域名并发 {settings.IMAGE_HOST_CONCURRENCY}）"
+    )
+
+    original_dir = os.getcwd()
+    original_ocr = image_service.extract_text_from_image_bytes
+    original_cache = settings.EXTRACTION_CACHE_ENABLED
+    work_dir = tempfile.mkdtemp(prefix="contenthub-bench-")
+    server = None
+    try:
+        os.chdir(work_dir)
+        settings.EXTRACTION_CACHE_ENABLED = False
+
+        def fake_ocr(data):
+            time.sleep(ocr_seconds)
+            return f"图片文字 {len(data)}"
+
+        image_service.extract_text_from_image_bytes = fake_ocr
+        server, note_url = _start_image_server([make_png(i) for i in range(count)], delay)
+
+        start = time.perf_counter()
+        result = image_service.process_url_for_images(note_url)
+        elapsed = time.perf_counter() - start
+
+        expected = [f"{note_url.rsplit('/', 1)[0]}/img/{i}.png" for i in range(count)]
+        if [image["url"] for image in result["images"]] != expected:
+            logger.error("❌ 图片结果没有按页面顺序排列")
+        single = delay + ocr_seconds
+        logger.info(f"  总耗时: {elapsed:.2f} 秒（单张约 {single:.2f} 秒，逐张串行约 {single * count:.2f} 秒）")
+        return {"seconds": elapsed, "single": single}
+    finally:
+        if server is not None:
+            server.shutdown()
+        image_service.extract_text_from_image_bytes = original_ocr
+        settings.EXTRACTION_CACHE_ENABLED = original_cache
+        shutdown_pools()
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def benchmark_http(count: int = 300, workers: int = 8):
+    """对比每次请求新建连接和使用共用连接池下载同一站点的大量图片"""
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    import http_client
+
+    logger.info(f"🌐 HTTP 连接复用: {count} 张图片, {workers} 个线程并发下载")
+
+    images = [make_png(i) for i in range(count)]
+    server, note_url = _start_image_server(images, 0)
+    base_url = note_url.rsplit("/", 1)[0]
+    urls = [f"{base_url}/img/{i}.png" for i in range(count)]
+    results = {}
+    try:
+        def fetch_bare(url):
+            with requests.get(url, timeout=30) as response:
+                return len(response.content)
+
+        def fetch_pooled(url):
+            with http_client.get(url) as response:
+                return len(response.content)
+
+        for name, fetch in (("每次新建连接", fetch_bare), ("共用连接池", fetch_pooled)):
+            server.connections.clear()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                sizes = list(pool.map(fetch, urls))
+            elapsed = time.perf_counter() - start
+            if sizes != [len(image) for image in images]:
+                logger.error(f"❌ {name}: 下载内容不完整")
+            results[name] = elapsed
+            logger.info(
+                f"  {name}: {elapsed:.2f} 秒, {count / elapsed:.0f} 张/秒, "
+                f"建立连接 {len(server.connections)} 次"
+            )
+        logger.info(f"  加速比: {results['每次新建连接'] / results['共用连接池']:.2f}x")
+        return results
+    finally:
+        server.shutdown()
+        http_client.close_session()
+
+# 场景名 -> 测试函数
+BENCHMARKS = {
+    "db": benchmark_db,
+    "pdf": benchmark_pdf,
+    "engines": benchmark_engines,
+    "health": benchmark_health,
+    "images": benchmark_images,
+    "http": benchmark_http,
+}
+
+def main():
+    """主测试函数"""
+    names = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        logger.error(f"❌ 未知场景: {', '.join(unknown)}，可选: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+
+    logger.info("🚀 开始性能基准测试...")
+    for name in names:
+        BENCHMARKS[name]()
+    logger.info("🎉 基准测试完成")
+
+if __name__ == "__main__":
+    main()
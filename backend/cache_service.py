@@ -0,0 +1,144 @@
+"""
+文件名: cache_service.py
+作用: 文本提取结果缓存（PDF 文本、图片 OCR 结果按原始文件哈希寻址，LRU 淘汰）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+from models import ExtractionCache
+
+logger = logging.getLogger(__name__)
+
+# 缓存读写失败只记录日志，不影响入库流程
+# 调用方在线程池中执行，每次读写使用独立的数据库会话
+
+# 进程内统计（服务启动以来），通过 /api/metrics 查看
+_stats = {"hits": 0, "misses": 0, "bytes_served": 0, "bytes_written": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+def _count(**increments):
+    """累加统计值"""
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+def cache_key(kind: str, source_hash: str, variant: str) -> str:
+    """
+    计算缓存键
+
+    参数:
+        kind (str): 类型（pdf / image）
+        source_hash (str): 原始文件的 SHA-256
+        variant (str): 提取方式（引擎、版本、OCR 参数等，任何影响输出的因素）
+    """
+    return hashlib.sha256(f"{kind}:{source_hash}:{variant}".encode("utf-8")).hexdigest()
+
+def get_text(kind: str, source_hash: str, variant: str):
+    """
+    读取缓存的提取结果
+
+    返回:
+        str: 缓存的文本，未命中（或缓存未启用）时返回 None
+    """
+    if not settings.EXTRACTION_CACHE_ENABLED or not source_hash:
+        return None
+
+    db = SessionLocal()
+    try:
+        entry = db.get(ExtractionCache, cache_key(kind, source_hash, variant))
+        if entry is None:
+            _count(misses=1)
+            return None
+        text = entry.content
+        size_bytes = entry.size_bytes
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_used_at = datetime.now()
+        db.commit()
+        _count(hits=1, bytes_served=size_bytes)
+        logger.info(f"命中提取缓存: kind={kind}, {size_bytes} 字节")
+        return text
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"读取提取缓存失败: {e}")
+        return None
+    finally:
+        db.close()
+
+def put_text(kind: str, source_hash: str, variant: str, text: str):
+    """写入提取结果，超出容量时淘汰最久未使用的缓存"""
+    if not settings.EXTRACTION_CACHE_ENABLED or not source_hash or text is None:
+        return
+
+    size_bytes = len(text.encode("utf-8"))
+    if size_bytes > settings.EXTRACTION_CACHE_MAX_BYTES:
+        return
+
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        db.merge(ExtractionCache(
+            cache_key=cache_key(kind, source_hash, variant),
+            kind=kind,
+            content=text,
+            size_bytes=size_bytes,
+            hit_count=0,
+            created_at=now,
+            last_used_at=now
+        ))
+        db.flush()
+        evicted = _evict(db, settings.EXTRACTION_CACHE_MAX_BYTES)
+        db.commit()
+        _count(bytes_written=size_bytes, evictions=evicted)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"写入提取缓存失败: {e}")
+    finally:
+        db.close()
+
+def _evict(db: Session, max_bytes: int) -> int:
+    """按最近使用时间淘汰缓存，直到总大小不超过 max_bytes，返回淘汰条数"""
+    total = db.query(func.coalesce(func.sum(ExtractionCache.size_bytes), 0)).scalar()
+    if total <= max_bytes:
+        return 0
+
+    evicted_keys = []
+    entries = db.query(ExtractionCache.cache_key, ExtractionCache.size_bytes).order_by(
+        ExtractionCache.last_used_at
+    ).all()
+    for key, size_bytes in entries:
+        if total <= max_bytes:
+            break
+        evicted_keys.append(key)
+        total -= size_bytes
+    db.query(ExtractionCache).filter(
+        ExtractionCache.cache_key.in_(evicted_keys)
+    ).delete(synchronize_session=False)
+    logger.info(f"淘汰提取缓存: {len(evicted_keys)} 条")
+    return len(evicted_keys)
+
+def get_stats(db: Session) -> dict:
+    """缓存统计（条数和大小来自数据库，命中率等为服务启动以来的进程内统计）"""
+    entries, stored_bytes = db.query(
+        func.count(ExtractionCache.cache_key),
+        func.coalesce(func.sum(ExtractionCache.size_bytes), 0)
+    ).one()
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        "enabled": settings.EXTRACTION_CACHE_ENABLED,
+        "entries": entries,
+        "stored_bytes": stored_bytes,
+        "max_bytes": settings.EXTRACTION_CACHE_MAX_BYTES,
+        "hit_rate": round(stats["hits"] / lookups, 4) if lookups else None,
+        **stats
+    }
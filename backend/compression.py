@@ -0,0 +1,82 @@
+"""
+文件名: compression.py
+作用: 长文本透明压缩（素材正文、选题内容）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import logging
+import zlib
+from sqlalchemy.types import TypeDecorator, Text
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# zstd 为可选依赖，未安装时使用标准库 zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# zstd 数据帧的魔数，用于读取时识别压缩算法
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+def compress_text(value: str):
+    """
+    压缩文本
+
+    超过阈值的文本压缩为 bytes（SQLite 中以 BLOB 存储），
+    未启用压缩、文本较短或压缩后没有变小时原样返回字符串
+
+    参数:
+        value (str): 原始文本
+
+    返回:
+        str | bytes: 原始文本或压缩后的数据
+    """
+    if value is None or not settings.COMPRESSION_ENABLED:
+        return value
+
+    raw = value.encode("utf-8")
+    if len(raw) < settings.COMPRESSION_MIN_BYTES:
+        return value
+
+    if zstandard is not None:
+        compressed = zstandard.ZstdCompressor(level=settings.COMPRESSION_LEVEL).compress(raw)
+    else:
+        compressed = zlib.compress(raw, settings.COMPRESSION_LEVEL)
+
+    if len(compressed) >= len(raw):
+        return value
+    return compressed
+
+def decompress_text(value):
+    """
+    解压文本（字符串原样返回，bytes 按魔数识别 zstd / zlib）
+
+    异常:
+        Exception: 数据为 zstd 格式但未安装 zstandard 时
+    """
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+
+    data = bytes(value)
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            logger.error("数据使用 zstd 压缩，但未安装 zstandard")
+            raise Exception("读取压缩内容失败，请安装 zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """写入时自动压缩、读取时自动解压的文本列类型"""
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
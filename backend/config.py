@@ -14,12 +14,119 @@ class Settings:
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./contenthub.db"
+    DB_POOL_SIZE: int = 10  # 连接池常驻连接数
+    DB_MAX_OVERFLOW: int = 20  # 连接池满时允许额外创建的连接数
+    DB_POOL_TIMEOUT: int = 30  # 等待空闲连接的超时（秒）
+    
+    # SQLite 调优（WAL 模式下读写互不阻塞）
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 模式下 NORMAL 不会损坏数据库，仅掉电时可能丢失最后的事务
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 遇到写锁时等待的时间，而不是立即报 database is locked
+    # 页缓存按连接分配：同步、异步两个引擎各最多 DB_POOL_SIZE + DB_MAX_OVERFLOW = 30 个连接，
+    # 最坏情况共 60 个连接 × 8MB ≈ 480MB（64MB 时约 3.8GB）；缓存只在读到页时才增长，
+    # 大部分读取由下面的内存映射承担（映射的是操作系统页缓存，所有连接共用，不按连接计）
+    SQLITE_CACHE_SIZE_KB: int = 8 * 1024  # 每个连接的页缓存上限（8MB）
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取（256MB），设为 0 关闭
+    
+    # 列表分页配置
+    LIST_COUNT_CACHE_SECONDS: int = 30  # 游标分页时总数缓存有效期
+    
+    # 长文本压缩配置（素材正文、选题内容）
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 4096  # 超过该大小才压缩
+    COMPRESSION_LEVEL: int = 6
+    
+    # 近似重复检测配置（SimHash 汉明距离不超过该值视为近似重复，最大为 3）
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3
+    NEAR_DUPLICATE_SCAN_LIMIT: int = 5000  # 近似重复分组接口单次请求最多扫描的素材数（超过时返回 next_cursor 继续）
     
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 上传文件分块写入磁盘的块大小（1MB）
     ALLOWED_EXTENSIONS: set = {'.pdf'}
     
+    # 后台线程池配置（阻塞任务在线程池中执行，不占用事件循环）
+    PDF_POOL_WORKERS: int = 2  # PDF 文本提取
+    URL_POOL_WORKERS: int = 4  # URL 抓取、图片下载和 OCR
+    AI_POOL_WORKERS: int = 4  # AI 接口调用（含重试等待）
+    JOB_POOL_WORKERS: int = 2  # 后台入库任务（async_mode）
+    TEXT_POOL_WORKERS: int = 4  # 文本素材入库（内容哈希、SimHash、压缩和写库）
+    IMAGE_DOWNLOAD_WORKERS: int = 16  # 网页图片并发下载（所有 URL 任务共用）
+    IMAGE_HOST_CONCURRENCY: int = 4  # 同一域名同时下载的图片数上限
+    MAX_IMAGE_SIZE: int = 10 * 1024 * 1024  # 单张网页图片的最大字节数（10MB），下载超过即中止
+    MAX_IMAGE_PIXELS: int = 40_000_000  # 单张图片的最大像素数，超过时不解码（防止解压炸弹占满内存）
+    KEEP_DOWNLOADED_IMAGES: bool = False  # 是否把网页图片原图保存到 UPLOAD_DIR（默认只在内存中 OCR，不写磁盘）
+    # 图片 OCR（tesseract 在子进程中运行，线程数即并行的 tesseract 进程数）
+    # 默认只用一半 CPU：扫描版 PDF 的 OCR 在进程池（PROCESS_POOL_WORKERS）中同时运行，
+    # 两者加起来最多约 1.5 倍 CPU 数个 tesseract 进程；配合 OCR_TESSERACT_THREADS=1 不再成倍超额
+    OCR_POOL_WORKERS: int = max(1, (os.cpu_count() or 1) // 2)
+    JOB_PROGRESS_INTERVAL: float = 1.0  # 任务进度写入数据库的最小间隔（秒）
+    JOB_HEARTBEAT_INTERVAL: float = 15  # 执行中的任务刷新心跳的间隔（秒）
+    JOB_LEASE_SECONDS: float = 120  # 心跳超过该时长未刷新的任务视为中断（多个工作进程时由其他进程接管）
+    PROCESS_POOL_WORKERS: int = min(4, os.cpu_count() or 1)  # CPU 密集任务的进程数
+    
+    # 抓取 HTTP 客户端配置（进程内共用连接池，同一域名的请求复用 TCP/TLS 连接）
+    HTTP_POOL_HOSTS: int = 20  # 保留连接池的域名数
+    HTTP_POOL_MAXSIZE: int = 16  # 每个域名保持的连接数（不小于 IMAGE_HOST_CONCURRENCY）
+    HTTP_CONNECT_TIMEOUT: float = 10  # 建立连接超时（秒）
+    HTTP_READ_TIMEOUT: float = 30  # 读取响应超时（秒）
+    HTTP_RETRIES: int = 2  # 连接失败、读取超时和 429/5xx 响应的重试次数
+    HTTP_RETRY_BACKOFF: float = 0.5  # 重试间隔按 0.5, 1, 2... 秒递增
+    HTTP_RETRY_AFTER_MAX: float = 30  # 按 Retry-After 等待的上限（秒），防止服务端让工作线程长时间挂起
+    
+    # 抓取限速（按域名的令牌桶，进程内所有请求共用）: 域名后缀 -> (每秒请求数, 突发请求数)
+    # 网页来源站点限速较严，图片 CDN 可以承受较多并发请求；按最长后缀匹配，子域名共用规则
+    HOST_RATE_LIMIT_ENABLED: bool = True
+    HOST_RATE_LIMITS: dict = {
+        # twitter
+        'twitter.com': (1.0, 2),
+        'x.com': (1.0, 2),
+        'twimg.com': (20.0, 20),
+        # xiaohongshu
+        'xiaohongshu.com': (1.0, 2),
+        'xhslink.com': (1.0, 2),
+        'xhscdn.com': (20.0, 20),
+        # weibo
+        'weibo.com': (1.0, 2),
+        'weibo.cn': (1.0, 2),
+        'sinaimg.cn': (20.0, 20),
+        # douyin
+        'douyin.com': (1.0, 2),
+        'tiktok.com': (1.0, 2),
+        'douyinpic.com': (20.0, 20),
+        'tiktokcdn.com': (20.0, 20),
+    }
+    DEFAULT_HOST_RATE_LIMIT: tuple = (5.0, 10)  # 未配置的域名
+    
+    # PDF 文本提取引擎: pdfplumber（版面分析，最慢）/ pdfium（直接读文本层，快）/
+    # auto（先用 pdfium，提取不到文字的页面再用 pdfplumber），上传接口可按请求指定
+    PDF_ENGINE: str = "auto"
+    
+    # PDF 并行解析配置（页数较多时按页段分给进程池并行提取）
+    PDF_PARALLEL_MIN_PAGES: int = 40  # 页数达到该值才并行（进程间传输有固定开销）
+    PDF_PAGES_PER_TASK: int = 25  # 每个子任务处理的页数
+    
+    # OCR 配置（图片 OCR 和扫描版 PDF 共用）
+    OCR_TESSERACT_CONFIG: str = r'--oem 3 --psm 6 -l chi_sim+eng'  # 中英文
+    OCR_TESSERACT_THREADS: int = 1  # 每个 tesseract 进程的 OpenMP 线程数（OMP_THREAD_LIMIT），并行靠多个进程，不再在进程内开多线程
+    
+    # 扫描版 PDF 的 OCR 配置（只对没有文字层的页面渲染成图片后 OCR，在进程池中并行执行）
+    PDF_OCR_ENABLED: bool = True
+    PDF_OCR_DPI: int = 200  # 渲染分辨率，越高识别越准、越慢
+    
+    # 文本提取缓存配置（同一文件再次上传时直接使用缓存的提取结果，超出容量时淘汰最久未使用的）
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_BYTES: int = 200 * 1024 * 1024  # 按文本原始大小计（200MB）
+    
+    # PDF 流式入库配置（后台任务逐页写入正文，解析过程中即可查看和搜索）
+    # 流式入库逐页串行提取，不走多进程并行提取，整体耗时比一次性提取长，默认关闭；
+    # 开启后也只有不小于 PDF_STREAMING_MIN_SIZE 的文件流式入库，较小的文件仍走并行提取和提取缓存
+    PDF_STREAMING_INGEST: bool = False
+    PDF_STREAMING_MIN_SIZE: int = 20 * 1024 * 1024  # 20MB
+    PDF_STREAM_BATCH_PAGES: int = 10  # 每多少页追加一个正文分块并提交
+    PDF_STREAM_INDEX_PAGES: int = 50  # 每多少页刷新一次全文索引
+    
     # AI 配置
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     CLAUDE_API_KEY: Optional[str] = os.getenv("CLAUDE_API_KEY")
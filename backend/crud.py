@@ -6,30 +6,558 @@
 最后更新: 2025-10-25
 """
 
-from sqlalchemy.orm import Session
-from models import Material, Topic, Config, Tag, UsageStats
+from sqlalchemy import select, func, tuple_, or_, and_, type_coerce, String
+from sqlalchemy.orm import Session, selectinload, aliased
+from models import Material, MaterialBody, MaterialSimhashBand, Topic, Config, Tag, UsageStats, MaterialTag, TopicTag, Job
+import search_service
+import dedup_service
+from config import settings
+from utils import encode_cursor, decode_cursor
 import logging
+import json
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# ========== 分页 ==========
+
+# 列表总数缓存：{(SQL, 参数): (总数, 缓存时间)}
+_count_cache = {}
+_COUNT_CACHE_MAX_ENTRIES = 256
+
+def count_query(query, use_cache: bool = False):
+    """
+    统计查询总数
+
+    use_cache=True 时在有效期内复用同一筛选条件的上次结果（估算值），
+    避免翻页时每一页都重新扫描整个结果集
+    """
+    query = query.order_by(None)
+    if not use_cache:
+        return query.count()
+
+    statement = query.statement.compile()
+    key = (str(statement), tuple(sorted((k, str(v)) for k, v in statement.params.items())))
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    if cached and now - cached[1] < settings.LIST_COUNT_CACHE_SECONDS:
+        return cached[0]
+
+    total = query.count()
+    if len(_count_cache) >= _COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.clear()
+    _count_cache[key] = (total, now)
+    return total
+
+def paginate_query(query, sort_column, id_column, page: int = 1, per_page: int = 20,
+                   cursor: str = None, with_total: bool = True, order_by: list = None):
+    """
+    分页查询
+
+    默认按 (sort_column, id) 倒序。传入 cursor 时使用游标分页：
+    直接在索引上定位到上一页最后一条之后，不再 OFFSET 扫描前面的行。
+
+    参数:
+        query: 已添加筛选条件的查询
+        sort_column: 排序列（如 Material.created_at）
+        id_column: 主键列，用于排序值相同时确定顺序
+        page (int): 页码（仅 OFFSET 模式）
+        per_page (int): 每页条数
+        cursor (str): 上一页返回的 next_cursor
+        with_total (bool): 是否统计总数；游标模式下总数来自短期缓存
+        order_by (list): 自定义排序（如相关度），此时不支持游标
+
+    返回:
+        tuple: (items, total, next_cursor)，不统计总数时 total 为 None
+
+    异常:
+        ValueError: 游标格式错误时
+    """
+    total = count_query(query, use_cache=bool(cursor)) if with_total else None
+
+    if order_by is not None:
+        query = query.order_by(*order_by)
+    else:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(sort_value, last_id))
+    else:
+        query = query.offset((page - 1) * per_page)
+
+    # 多取一条用于判断是否还有下一页
+    items = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        last_sort_value = getattr(last, sort_column.key)
+        if order_by is None and last_sort_value is not None:
+            next_cursor = encode_cursor(last_sort_value, getattr(last, id_column.key))
+
+    return items, total, next_cursor
+
+# ========== 列表查询 ==========
+# 只查询 columns 指定的列，返回 paginate_query 的结果 (items, total, next_cursor)
+
+def list_materials(db: Session, columns: list, source_type: str = None, tag_names: list = None,
+                   match_all: bool = False, search: str = None, sort: str = "created_at",
+                   page: int = 1, per_page: int = 20, cursor: str = None, with_total: bool = True):
+    """
+    查询素材列表（未删除）
+
+    sort=relevance 且使用全文索引搜索时按相关度（BM25）排序，此时不支持游标
+
+    异常:
+        ValueError: 游标格式错误，或按相关度排序时传入了游标
+    """
+    query = db.query(*columns).filter(Material.is_deleted == 0)
+
+    # 来源筛选
+    if source_type:
+        logger.info(f"按来源筛选: {source_type}")
+        query = query.filter(Material.source_type == source_type)
+
+    # 标签筛选（走素材-标签关联表索引）
+    if tag_names:
+        logger.info(f"按标签筛选: {tag_names}, match_all={match_all}")
+        query = query.filter(material_tag_filter(db, tag_names, match_all))
+
+    # 搜索（走 FTS5 全文索引）
+    matches = None
+    if search:
+        logger.info(f"搜索关键词: {search}")
+        if search_service.fts_available:
+            matches = search_service.search_subquery(search_service.MATERIALS_FTS, search)
+            query = query.join(matches, Material.id == matches.c.id)
+        else:
+            query = query.filter(
+                (Material.title.like(f"%{search}%")) |
+                (Material.id.in_(material_ids_with_content_like(search)))
+            )
+
+    # 按相关度或创建时间倒序排列
+    order_by = None
+    if sort == "relevance" and matches is not None:
+        if cursor:
+            raise ValueError("按相关度排序时不支持游标分页")
+        order_by = [matches.c.rank, Material.created_at.desc(), Material.id.desc()]
+
+    return paginate_query(
+        query, Material.created_at, Material.id,
+        page=page, per_page=per_page, cursor=cursor,
+        with_total=with_total, order_by=order_by
+    )
+
+def list_deleted_materials(db: Session, columns: list, page: int = 1, per_page: int = 20,
+                           cursor: str = None, with_total: bool = True):
+    """查询回收站素材（按删除时间倒序）"""
+    query = db.query(*columns).filter(Material.is_deleted == 1)
+    return paginate_query(
+        query, Material.deleted_at, Material.id,
+        page=page, per_page=per_page, cursor=cursor, with_total=with_total
+    )
+
+def list_topics(db: Session, columns: list, tag_names: list = None, match_all: bool = False,
+                search: str = None, sort: str = "created_at", page: int = 1, per_page: int = 20,
+                cursor: str = None, with_total: bool = True):
+    """
+    查询选题列表
+
+    异常:
+        ValueError: 游标格式错误，或按相关度排序时传入了游标
+    """
+    query = db.query(*columns)
+
+    # 标签筛选（走选题-标签关联表索引）
+    if tag_names:
+        logger.info(f"按标签筛选: {tag_names}, match_all={match_all}")
+        query = query.filter(topic_tag_filter(db, tag_names, match_all))
+
+    # 搜索（走 FTS5 全文索引）
+    matches = None
+    if search:
+        logger.info(f"搜索关键词: {search}")
+        if search_service.fts_available:
+            matches = search_service.search_subquery(search_service.TOPICS_FTS, search)
+            query = query.join(matches, Topic.id == matches.c.id)
+        else:
+            query = query.filter(
+                (Topic.title.like(f"%{search}%")) |
+                (content_like(Topic.refined_content, search))
+            )
+
+    # 按相关度或创建时间倒序排列
+    order_by = None
+    if sort == "relevance" and matches is not None:
+        if cursor:
+            raise ValueError("按相关度排序时不支持游标分页")
+        order_by = [matches.c.rank, Topic.created_at.desc(), Topic.id.desc()]
+
+    return paginate_query(
+        query, Topic.created_at, Topic.id,
+        page=page, per_page=per_page, cursor=cursor,
+        with_total=with_total, order_by=order_by
+    )
+
 # ========== 素材 CRUD ==========
 
-def create_material(db: Session, material_data: dict):
-    """创建素材"""
+# 列表预览长度（写入时截取并存入 content_preview）
+PREVIEW_LENGTH = 200
+
+def create_material(db: Session, material_data: dict, digest: str = None, fingerprint: int = None):
+    """
+    创建素材
+
+    同时写入内容长度、预览和内容哈希；内容哈希有唯一索引，
+    重复内容会抛出 IntegrityError，调用方应先用 get_material_by_content_hash 检查
+
+    参数:
+        digest (str): 已算好的内容哈希，为空时在这里计算
+        fingerprint (int): 已算好的 SimHash，为空时在这里计算（长文本计算较慢，查重时算过的应传入）
+    """
     logger.info(f"创建素材: source={material_data.get('source_type')}")
-    db_material = Material(**material_data)
+    content = material_data["content"]
+    db_material = Material(
+        content_length=len(content),
+        content_preview=content[:PREVIEW_LENGTH],
+        content_hash=digest or dedup_service.content_hash(content),
+        simhash=fingerprint if fingerprint is not None else dedup_service.simhash(content),
+        **material_data
+    )
     db.add(db_material)
+    db.flush()
+    write_simhash_bands(db, db_material.id, db_material.simhash)
+    if db_material.tags:
+        sync_material_tags(db, db_material.id, json.loads(db_material.tags))
+    search_service.index_material(db, db_material.id)
     db.commit()
     db.refresh(db_material)
     logger.info(f"素材创建成功: id={db_material.id}")
     return db_material
 
 def get_material(db: Session, material_id: int):
-    """获取素材"""
+    """获取素材（正文在访问 content 时才加载）"""
     logger.info(f"查询素材: id={material_id}")
     return db.query(Material).filter(Material.id == material_id).first()
 
+def get_material_by_content_hash(db: Session, content_hash: str):
+    """根据内容哈希查找素材（包括回收站中的素材）"""
+    return db.query(Material).filter(Material.content_hash == content_hash).first()
+
+def get_material_by_file_hash(db: Session, file_hash: str):
+    """根据原始文件哈希查找素材（包括回收站中的素材）"""
+    return db.query(Material).filter(Material.file_hash == file_hash).first()
+
+def get_material_by_source_url(db: Session, source_url: str):
+    """根据来源 URL 查找素材（包括回收站中的素材）"""
+    return db.query(Material).filter(Material.source_url == source_url).first()
+
+# ========== 流式入库 ==========
+# PDF 逐页解析时先创建 processing 状态的素材，正文按批追加为分块，
+# 全部写入后再计算内容哈希和 SimHash（哈希为空时不占用唯一索引）
+
+def create_streaming_material(db: Session, material_data: dict):
+    """创建正文为空、状态为 processing 的素材"""
+    logger.info(f"创建流式入库素材: source={material_data.get('source_type')}")
+    db_material = Material(
+        content_length=0,
+        content_preview="",
+        ingest_status="processing",
+        pages_done=0,
+        fts_chunks=0,
+        **material_data
+    )
+    db.add(db_material)
+    db.flush()
+    if db_material.tags:
+        sync_material_tags(db, db_material.id, json.loads(db_material.tags))
+    search_service.index_material(db, db_material.id)
+    db.commit()
+    db.refresh(db_material)
+    logger.info(f"素材创建成功: id={db_material.id}")
+    return db_material
+
+def append_material_chunk(db: Session, material: Material, chunk_index: int, content: str,
+                          pages_done: int, pages_total: int, reindex: bool = False):
+    """
+    追加一个正文分块并提交，提交后即可读取到已写入的部分
+
+    参数:
+        content (str): 分块内容，为空时只更新进度
+        reindex (bool): 是否用已写入的全部正文刷新全文索引
+    """
+    if content:
+        db.add(MaterialBody(material_id=material.id, chunk_index=chunk_index, content=content))
+        if not material.content_length:
+            material.content_preview = content[:PREVIEW_LENGTH]
+        material.content_length = (material.content_length or 0) + len(content)
+    material.pages_done = pages_done
+    material.pages_total = pages_total
+    if reindex:
+        # 索引中是上次刷新时的分块，先按原 fts_chunks 删除，再纳入已写入的全部分块重新索引
+        search_service.remove_material(db, material.id)
+        material.fts_chunks = chunk_index + 1 if content else chunk_index
+        db.flush()
+        search_service.index_material(db, material.id)
+    db.commit()
+
+def finalize_streaming_material(db: Session, material: Material, content: str,
+                                digest: str = None, fingerprint: int = None):
+    """
+    完成流式入库：写入内容哈希、SimHash 和全文索引，状态改为 ready
+
+    内容哈希与已有素材重复时抛出 IntegrityError；digest / fingerprint 同 create_material
+    """
+    search_service.remove_material(db, material.id)
+    material.fts_chunks = None
+    material.content_hash = digest or dedup_service.content_hash(content)
+    material.simhash = fingerprint if fingerprint is not None else dedup_service.simhash(content)
+    material.ingest_status = "ready"
+    db.flush()
+    write_simhash_bands(db, material.id, material.simhash)
+    search_service.index_material(db, material.id)
+    db.commit()
+    db.refresh(material)
+    logger.info(f"素材流式入库完成: id={material.id}, 长度={material.content_length}")
+    return material
+
+def delete_unfinished_materials(db: Session, stale_before: datetime, material_ids: list = ()) -> int:
+    """
+    删除已中断的流式入库素材（对应的任务会重新执行，重新创建素材）
+
+    参数:
+        stale_before (datetime): 在此之后仍有写入的素材视为还在入库，不删除
+        material_ids (list): 已确认中断的任务关联的素材，只要仍是 processing 状态就删除
+
+    多个工作进程共用数据库时，其他进程正在执行的任务关联的素材不会被删除
+    """
+    running_material_ids = select(Job.material_id).filter(
+        Job.status == "running", Job.material_id.isnot(None)
+    )
+    query = db.query(Material.id).filter(
+        Material.ingest_status == "processing",
+        or_(
+            Material.id.in_(list(material_ids)),
+            (Material.updated_at < stale_before) & Material.id.notin_(running_material_ids)
+        )
+    )
+    unfinished_ids = [row[0] for row in query]
+    for material_id in unfinished_ids:
+        permanent_delete_material(db, material_id)
+    return len(unfinished_ids)
+
+# ========== 近似重复检测 ==========
+
+def write_simhash_bands(db: Session, material_id: int, fingerprint: int):
+    """写入素材的 SimHash 分段索引（覆盖旧记录）"""
+    db.query(MaterialSimhashBand).filter(
+        MaterialSimhashBand.material_id == material_id
+    ).delete(synchronize_session=False)
+    db.add_all([
+        MaterialSimhashBand(material_id=material_id, band=band, value=value)
+        for band, value in dedup_service.simhash_bands(fingerprint)
+    ])
+
+def find_near_duplicate_material(db: Session, content: str, max_distance: int = None, fingerprint: int = None):
+    """
+    查找与给定内容近似重复的素材（不包括回收站中的素材）
+
+    先按 SimHash 分段值从索引表取候选，再计算汉明距离；fingerprint 为已算好的 SimHash（可选）
+
+    返回:
+        tuple: (最相似的素材, 汉明距离)，没有近似重复时为 (None, None)
+    """
+    if max_distance is None:
+        max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE
+    if fingerprint is None:
+        fingerprint = dedup_service.simhash(content)
+
+    band_filters = [
+        (MaterialSimhashBand.band == band) & (MaterialSimhashBand.value == value)
+        for band, value in dedup_service.simhash_bands(fingerprint)
+    ]
+    candidate_ids = select(MaterialSimhashBand.material_id).where(or_(*band_filters))
+    candidates = db.query(Material.id, Material.simhash).filter(
+        Material.id.in_(candidate_ids),
+        Material.is_deleted == 0
+    ).all()
+
+    best_id, best_distance = None, None
+    for material_id, candidate in candidates:
+        distance = dedup_service.hamming_distance(fingerprint, candidate)
+        if distance <= max_distance and (best_distance is None or distance < best_distance):
+            best_id, best_distance = material_id, distance
+    if best_id is None:
+        return None, None
+    return get_material(db, best_id), best_distance
+
+def _near_duplicate_neighbors(db: Session, material_ids, max_distance: int) -> dict:
+    """
+    按分段索引查找给定素材的近似重复邻居（只查这些素材的分段，不做全表自连接）
+
+    返回:
+        dict: {素材ID: 邻居素材ID集合}，只包含未删除且汉明距离不超过 max_distance 的素材
+    """
+    left = aliased(MaterialSimhashBand)
+    right = aliased(MaterialSimhashBand)
+    pairs = db.query(left.material_id, right.material_id).join(
+        right,
+        (left.band == right.band) & (left.value == right.value) & (left.material_id != right.material_id)
+    ).filter(left.material_id.in_(list(material_ids))).distinct().all()
+    if not pairs:
+        return {}
+
+    ids = {material_id for pair in pairs for material_id in pair}
+    fingerprints = dict(db.query(Material.id, Material.simhash).filter(
+        Material.id.in_(ids),
+        Material.is_deleted == 0
+    ).all())
+
+    neighbors = {}
+    for a, b in pairs:
+        if a not in fingerprints or b not in fingerprints:
+            continue
+        if dedup_service.hamming_distance(fingerprints[a], fingerprints[b]) <= max_distance:
+            neighbors.setdefault(a, set()).add(b)
+    return neighbors
+
+def get_near_duplicate_clusters(db: Session, max_distance: int = None, cursor: int = None,
+                                limit: int = 20, scan_limit: int = None):
+    """
+    分页获取近似重复的素材分组（不包括回收站中的素材）
+
+    按素材 id 升序扫描，每批只查询本批素材的分段索引找邻居，再沿邻居展开成完整分组；
+    每组在其最小 id 处输出一次。单次请求最多扫描 scan_limit 条素材，避免素材很多时全表计算
+
+    参数:
+        cursor: 上一页返回的 next_cursor（从该素材 id 之后继续扫描）
+        limit: 每页最多返回的分组数
+        scan_limit: 单次请求最多扫描的素材数
+
+    返回:
+        tuple: (分组列表, next_cursor)；每组为按 id 排序的素材列表，扫描完毕时 next_cursor 为 None
+    """
+    if max_distance is None:
+        max_distance = settings.NEAR_DUPLICATE_MAX_DISTANCE
+    if scan_limit is None:
+        scan_limit = settings.NEAR_DUPLICATE_SCAN_LIMIT
+    logger.info(f"查询近似重复素材: max_distance={max_distance}, cursor={cursor}, limit={limit}")
+
+    batch_size = 500
+    position = cursor or 0
+    scanned = 0
+    clusters = []
+    seen = set()
+    next_cursor = None
+    while True:
+        batch = [material_id for (material_id,) in db.query(Material.id).filter(
+            Material.id > position,
+            Material.is_deleted == 0,
+            Material.simhash.isnot(None)
+        ).order_by(Material.id).limit(min(batch_size, scan_limit - scanned)).all()]
+        if not batch:
+            break
+        neighbors = _near_duplicate_neighbors(db, batch, max_distance)
+        for material_id in batch:
+            position = material_id
+            scanned += 1
+            if material_id in neighbors and material_id not in seen:
+                # 沿邻居展开分组，本批之外的素材按需查询其邻居
+                members = {material_id}
+                frontier = set(neighbors[material_id])
+                while frontier:
+                    members |= frontier
+                    unknown = [member for member in frontier if member not in neighbors]
+                    if unknown:
+                        neighbors.update(_near_duplicate_neighbors(db, unknown, max_distance))
+                    frontier = {
+                        neighbor
+                        for member in frontier
+                        for neighbor in neighbors.get(member, ())
+                    } - members
+                seen |= members
+                # 分组包含更小的 id 时，已在扫描到该 id 时（本页或之前的页）输出
+                if min(members) == material_id:
+                    clusters.append(sorted(members))
+            if len(clusters) >= limit or scanned >= scan_limit:
+                break
+        if len(clusters) >= limit or scanned >= scan_limit:
+            next_cursor = position
+            break
+
+    materials = {
+        material.id: material
+        for material in db.query(Material).filter(
+            Material.id.in_([material_id for cluster in clusters for material_id in cluster])
+        ).all()
+    }
+    return [
+        [materials[material_id] for material_id in cluster]
+        for cluster in clusters
+    ], next_cursor
+
+def get_material_contents(db: Session, material_ids: list) -> dict:
+    """批量读取素材正文，返回 {素材ID: 正文}"""
+    if not material_ids:
+        return {}
+    chunks = {}
+    rows = db.query(MaterialBody.material_id, MaterialBody.content).filter(
+        MaterialBody.material_id.in_(material_ids)
+    ).order_by(MaterialBody.material_id, MaterialBody.chunk_index)
+    for material_id, content in rows:
+        chunks.setdefault(material_id, []).append(content)
+    return {material_id: "".join(parts) for material_id, parts in chunks.items()}
+
+def get_material_excerpts(db: Session, length: int) -> list:
+    """
+    读取所有未删除素材的标题和正文开头（最多 length 字），返回 [(标题, 正文开头)]
+
+    预览列已包含足够内容时直接使用，否则在库中截取各正文分块的开头，不加载整篇正文
+    """
+    materials = db.query(
+        Material.id, Material.title, Material.content_preview, Material.content_length
+    ).filter(Material.is_deleted == 0).order_by(Material.created_at.desc()).all()
+
+    need_body = [
+        material.id for material in materials
+        if material.content_preview is None or (
+            len(material.content_preview) < length
+            and (material.content_length is None or material.content_length > len(material.content_preview))
+        )
+    ]
+    heads = {}
+    if need_body:
+        rows = db.query(
+            MaterialBody.material_id, func.substr(func.decompress_text(MaterialBody.content), 1, length)
+        ).filter(
+            MaterialBody.material_id.in_(need_body)
+        ).order_by(MaterialBody.material_id, MaterialBody.chunk_index)
+        for material_id, part in rows:
+            head = heads.get(material_id, "")
+            if len(head) < length:
+                heads[material_id] = (head + (part or ""))[:length]
+
+    return [
+        (material.title, heads.get(material.id, material.content_preview or "")[:length])
+        for material in materials
+    ]
+
+def content_like(column, keyword: str):
+    """
+    压缩列（CompressedText）包含关键词的条件（全文索引不可用时的退化路径）
+
+    压缩过的行在库中是 BLOB，先用连接上注册的 decompress_text 函数还原再匹配；
+    匹配模式按普通字符串绑定，不经过 CompressedText 的压缩处理
+    """
+    return func.decompress_text(column).like(type_coerce(f"%{keyword}%", String))
+
+def material_ids_with_content_like(keyword: str):
+    """正文包含关键词的素材 id 子查询（全文索引不可用时的退化路径）"""
+    return select(MaterialBody.material_id).where(content_like(MaterialBody.content, keyword))
+
 # ========== 选题 CRUD ==========
 
 def create_topic(db: Session, topic_data: dict):
@@ -37,11 +565,42 @@ def create_topic(db: Session, topic_data: dict):
     logger.info(f"创建选题: title={topic_data.get('title')}")
     db_topic = Topic(**topic_data)
     db.add(db_topic)
+    db.flush()
+    sync_topic_tags(db, db_topic.id, json.loads(db_topic.tags))
+    search_service.index_topic(db, db_topic.id)
     db.commit()
     db.refresh(db_topic)
     logger.info(f"选题创建成功: id={db_topic.id}")
     return db_topic
 
+def get_topic(db: Session, topic_id: int):
+    """获取选题"""
+    logger.info(f"查询选题: id={topic_id}")
+    return db.query(Topic).filter(Topic.id == topic_id).first()
+
+def update_topic(db: Session, db_topic: Topic, topic_data: dict):
+    """更新选题"""
+    logger.info(f"更新选题: id={db_topic.id}")
+    search_service.remove_topic(db, db_topic.id)
+    for key, value in topic_data.items():
+        setattr(db_topic, key, value)
+    sync_topic_tags(db, db_topic.id, json.loads(db_topic.tags))
+    db.flush()
+    search_service.index_topic(db, db_topic.id)
+    db.commit()
+    db.refresh(db_topic)
+    logger.info(f"选题更新成功: id={db_topic.id}")
+    return db_topic
+
+def delete_topic(db: Session, db_topic: Topic):
+    """删除选题"""
+    logger.info(f"删除选题: id={db_topic.id}")
+    search_service.remove_topic(db, db_topic.id)
+    db.query(TopicTag).filter(TopicTag.topic_id == db_topic.id).delete(synchronize_session=False)
+    db.delete(db_topic)
+    db.commit()
+    logger.info(f"选题删除成功: id={db_topic.id}")
+
 def get_topics(db: Session, skip: int = 0, limit: int = 20):
     """获取选题列表"""
     logger.info(f"查询选题列表: skip={skip}, limit={limit}")
@@ -70,7 +629,7 @@ def set_config(db: Session, key: str, value: str):
 def get_all_materials(db: Session, include_deleted: bool = False):
     """获取所有素材"""
     logger.info(f"获取所有素材: include_deleted={include_deleted}")
-    query = db.query(Material)
+    query = db.query(Material).options(selectinload(Material.body_chunks))
     if not include_deleted:
         query = query.filter(Material.is_deleted == 0)
     return query.order_by(Material.created_at.desc()).all()
@@ -102,6 +661,11 @@ def permanent_delete_material(db: Session, material_id: int):
     logger.info(f"永久删除素材: id={material_id}")
     material = db.query(Material).filter(Material.id == material_id).first()
     if material:
+        search_service.remove_material(db, material.id)
+        db.query(MaterialTag).filter(MaterialTag.material_id == material.id).delete(synchronize_session=False)
+        db.query(MaterialSimhashBand).filter(
+            MaterialSimhashBand.material_id == material.id
+        ).delete(synchronize_session=False)
         db.delete(material)
         db.commit()
         logger.info(f"素材永久删除成功: {material.title}")
@@ -125,10 +689,12 @@ def get_tag_by_name(db: Session, name: str):
     return db.query(Tag).filter(Tag.name == name).first()
 
 def create_tag(db: Session, name: str, color: str = "#3b82f6", is_preset: bool = False):
-    """创建标签"""
+    """创建标签（已在使用该名称的素材和选题同时补齐关联）"""
     logger.info(f"创建标签: name={name}, color={color}")
     tag = Tag(name=name, color=color, is_preset=1 if is_preset else 0)
     db.add(tag)
+    db.flush()
+    _link_existing_owners(db, tag)
     db.commit()
     db.refresh(tag)
     logger.info(f"标签创建成功: id={tag.id}")
@@ -149,11 +715,95 @@ def delete_tag(db: Session, tag_id: int):
     logger.info(f"删除标签: id={tag_id}")
     tag = db.query(Tag).filter(Tag.id == tag_id).first()
     if tag:
+        db.query(MaterialTag).filter(MaterialTag.tag_id == tag.id).delete(synchronize_session=False)
+        db.query(TopicTag).filter(TopicTag.tag_id == tag.id).delete(synchronize_session=False)
         db.delete(tag)
         db.commit()
         logger.info(f"标签删除成功: {tag.name}")
     return tag
 
+# 关联表只记录已创建的标签（标签管理中的标签）；素材和选题上自由填写、但没有创建为标签的名称
+# 只保存在 JSON 标签字段中，不会自动创建标签，按这类名称筛选时匹配 JSON 字段
+
+def _tags_json_pattern(name: str) -> str:
+    """JSON 标签字段中包含某个标签名的 LIKE 模式（与写入时的 json.dumps 格式一致）"""
+    return f"%{json.dumps(name, ensure_ascii=False)}%"
+
+def _tag_names_from_json(tags_json: str) -> set:
+    """解析 JSON 标签字段（格式错误时返回空集合）"""
+    try:
+        names = json.loads(tags_json) if tags_json else []
+    except (TypeError, ValueError):
+        return set()
+    return {name.strip() for name in names if isinstance(name, str) and name.strip()}
+
+def _link_existing_owners(db: Session, tag: Tag):
+    """为 JSON 标签字段中已包含该标签名的素材和选题补齐关联（不提交）"""
+    pattern = _tags_json_pattern(tag.name)
+    for owner_model, link_model, owner_column in (
+        (Material, MaterialTag, "material_id"),
+        (Topic, TopicTag, "topic_id"),
+    ):
+        for owner_id, tags_json in db.query(owner_model.id, owner_model.tags).filter(owner_model.tags.like(pattern)):
+            if tag.name in _tag_names_from_json(tags_json):
+                db.add(link_model(**{owner_column: owner_id, "tag_id": tag.id}))
+
+def get_tags_by_names(db: Session, tag_names: list):
+    """按名称获取已创建的标签（没有对应标签的名称忽略，不会自动创建）"""
+    names = list(dict.fromkeys(name.strip() for name in tag_names if name and name.strip()))
+    if not names:
+        return []
+    return db.query(Tag).filter(Tag.name.in_(names)).all()
+
+def sync_material_tags(db: Session, material_id: int, tag_names: list):
+    """同步素材-标签关联表（只关联已创建的标签，不提交）"""
+    db.query(MaterialTag).filter(MaterialTag.material_id == material_id).delete(synchronize_session=False)
+    for tag in get_tags_by_names(db, tag_names):
+        db.add(MaterialTag(material_id=material_id, tag_id=tag.id))
+
+def sync_topic_tags(db: Session, topic_id: int, tag_names: list):
+    """同步选题-标签关联表（只关联已创建的标签，不提交）"""
+    db.query(TopicTag).filter(TopicTag.topic_id == topic_id).delete(synchronize_session=False)
+    for tag in get_tags_by_names(db, tag_names):
+        db.add(TopicTag(topic_id=topic_id, tag_id=tag.id))
+
+def update_material_tags(db: Session, material: Material, tag_names: list):
+    """更新素材标签（JSON 字段和关联表同时更新）"""
+    logger.info(f"更新素材标签: id={material.id}, tags={tag_names}")
+    material.tags = json.dumps(tag_names, ensure_ascii=False)
+    sync_material_tags(db, material.id, tag_names)
+    db.commit()
+    return material
+
+def _tag_filter(db: Session, owner_model, id_column, tag_id_column, tag_names: list, match_all: bool):
+    """
+    构建按标签筛选的条件
+
+    已创建的标签走关联表索引；没有对应标签的名称（自由填写、已删除的标签）不在关联表中，
+    按 JSON 标签字段匹配
+    """
+    names = list(dict.fromkeys(tag_names))
+    known = {row[0] for row in db.query(Tag.name).filter(Tag.name.in_(names))}
+
+    conditions = []
+    if known:
+        stmt = select(id_column).join(Tag, Tag.id == tag_id_column).where(Tag.name.in_(known))
+        if match_all:
+            stmt = stmt.group_by(id_column).having(func.count(func.distinct(Tag.id)) == len(known))
+        conditions.append(owner_model.id.in_(stmt))
+    for name in names:
+        if name not in known:
+            conditions.append(owner_model.tags.like(_tags_json_pattern(name)))
+    return and_(*conditions) if match_all else or_(*conditions)
+
+def material_tag_filter(db: Session, tag_names: list, match_all: bool = False):
+    """包含任一（match_all=True 时为全部）标签的素材筛选条件"""
+    return _tag_filter(db, Material, MaterialTag.material_id, MaterialTag.tag_id, tag_names, match_all)
+
+def topic_tag_filter(db: Session, tag_names: list, match_all: bool = False):
+    """包含任一（match_all=True 时为全部）标签的选题筛选条件"""
+    return _tag_filter(db, Topic, TopicTag.topic_id, TopicTag.tag_id, tag_names, match_all)
+
 # ========== 配置相关操作 ==========
 def get_config(db: Session, key: str):
     """根据键获取配置"""
@@ -261,4 +911,74 @@ def get_usage_stats_summary(db: Session, days: int = 30):
     logger.info(f"使用统计汇总完成: 总请求{summary['total_requests']}次, 总费用${summary['total_cost']:.4f}")
     return summary
 
+# ========== 后台任务相关操作 ==========
+def create_job(db: Session, job_type: str, params: dict):
+    """创建后台任务（参数以 JSON 保存）"""
+    logger.info(f"创建后台任务: type={job_type}")
+    job = Job(job_type=job_type, status="pending", params=json.dumps(params, ensure_ascii=False))
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"后台任务创建成功: id={job.id}")
+    return job
+
+def get_job(db: Session, job_id: int):
+    """获取后台任务"""
+    return db.query(Job).filter(Job.id == job_id).first()
+
+def get_pending_job_ids(db: Session):
+    """获取待执行的任务 id（按创建顺序）"""
+    return [row.id for row in db.query(Job.id).filter(Job.status == "pending").order_by(Job.id).all()]
+
+def claim_job(db: Session, job_id: int, worker_id: str) -> bool:
+    """
+    领取待执行的任务（状态条件和更新在同一条 UPDATE 中完成，多个进程同时领取时只有一个成功）
+
+    返回:
+        bool: 是否领取成功
+    """
+    now = datetime.now()
+    count = db.query(Job).filter(Job.id == job_id, Job.status == "pending").update({
+        Job.status: "running",
+        Job.worker_id: worker_id,
+        Job.heartbeat_at: now,
+        Job.started_at: now,
+        Job.attempts: func.coalesce(Job.attempts, 0) + 1,
+        Job.progress_done: 0,
+    }, synchronize_session=False)
+    db.commit()
+    return count == 1
+
+def heartbeat_jobs(db: Session, worker_id: str) -> int:
+    """刷新本进程执行中任务的心跳"""
+    count = db.query(Job).filter(Job.worker_id == worker_id, Job.status == "running").update(
+        {Job.heartbeat_at: datetime.now()}, synchronize_session=False
+    )
+    db.commit()
+    return count
+
+def reset_expired_jobs(db: Session, expired_before: datetime) -> tuple:
+    """
+    把心跳已过期的执行中任务重置为待执行（执行它们的进程已退出）
 
+    返回:
+        tuple: (重置的任务 id 列表, 这些任务关联的素材 id 列表)，素材是流式入库写了一半的
+    """
+    expired = or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < expired_before)
+    candidates = db.query(Job.id, Job.material_id).filter(Job.status == "running", expired).all()
+
+    job_ids = []
+    material_ids = []
+    for job_id, material_id in candidates:
+        # 逐个带条件更新：查询之后刚刷新过心跳的任务不会被重置
+        count = db.query(Job).filter(Job.id == job_id, Job.status == "running", expired).update(
+            {Job.status: "pending", Job.worker_id: None, Job.material_id: None},
+            synchronize_session=False
+        )
+        if not count:
+            continue
+        job_ids.append(job_id)
+        if material_id is not None:
+            material_ids.append(material_id)
+    db.commit()
+    return job_ids, material_ids
@@ -6,25 +6,139 @@
 最后更新: 2025-10-25
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from config import settings
+from compression import decompress_text
 import logging
 
 logger = logging.getLogger(__name__)
 
-# 数据库连接字符串
-DATABASE_URL = "sqlite:///./contenthub.db"
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """为每个新建的 SQLite 连接设置 PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        # cache_size 为负数时单位是 KB
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """
+    为每个新建的 SQLite 连接注册自定义函数
+
+    decompress_text(列): 返回压缩列（CompressedText）的原文，SQL 中需要按正文内容过滤时使用，
+    直接对压缩列做 LIKE 匹配的是压缩后的字节，会漏掉所有压缩过的行
+    """
+    dbapi_connection.create_function("decompress_text", 1, decompress_text, deterministic=True)
+
+def create_db_engine(database_url: str = None):
+    """
+    创建数据库引擎
+
+    SQLite 文件数据库会启用 WAL 等 PRAGMA，并按配置设置连接池大小；
+    内存数据库无法使用 WAL，只使用默认配置
+
+    参数:
+        database_url (str): 数据库连接字符串，默认使用 settings.DATABASE_URL
+
+    返回:
+        Engine: 数据库引擎
+    """
+    database_url = database_url or settings.DATABASE_URL
+
+    if not database_url.startswith("sqlite"):
+        return create_engine(
+            database_url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            echo=False
+        )
+
+    if database_url in ("sqlite://", "sqlite:///:memory:"):
+        db_engine = create_engine(
+            database_url,
+            connect_args={"check_same_thread": False},
+            echo=False
+        )
+        event.listen(db_engine, "connect", _register_sqlite_functions)
+        return db_engine
+
+    db_engine = create_engine(
+        database_url,
+        connect_args={
+            "check_same_thread": False,  # SQLite 需要此配置
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        },
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        echo=False  # 设置为 True 可以看到 SQL 语句
+    )
+    event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    event.listen(db_engine, "connect", _register_sqlite_functions)
+    return db_engine
+
+def create_async_db_engine(database_url: str = None):
+    """
+    创建异步数据库引擎（SQLite 使用 aiosqlite 驱动，PRAGMA 与同步引擎一致）
+
+    参数:
+        database_url (str): 同步驱动的连接字符串，默认使用 settings.DATABASE_URL
+
+    返回:
+        AsyncEngine: 异步数据库引擎
+    """
+    database_url = database_url or settings.DATABASE_URL
+    if database_url.startswith("sqlite://"):
+        database_url = "sqlite+aiosqlite://" + database_url[len("sqlite://"):]
+
+    if not database_url.startswith("sqlite"):
+        return create_async_engine(
+            database_url,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            echo=False
+        )
+
+    if ":memory:" in database_url or database_url.endswith("://"):
+        db_engine = create_async_engine(database_url, echo=False)
+        event.listen(db_engine.sync_engine, "connect", _register_sqlite_functions)
+        return db_engine
+
+    # aiosqlite 默认不复用连接（NullPool），这里改用连接池，PRAGMA 只需在建连时设置一次
+    db_engine = create_async_engine(
+        database_url,
+        connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        echo=False
+    )
+    event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    event.listen(db_engine.sync_engine, "connect", _register_sqlite_functions)
+    return db_engine
 
 # 创建数据库引擎
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite 需要此配置
-    echo=False  # 设置为 True 可以看到 SQL 语句
-)
+engine = create_db_engine()
+async_engine = create_async_db_engine()
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步会话工厂（提交后不过期对象，避免在事件循环中触发隐式的延迟加载）
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 def get_db():
     """获取数据库会话"""
     db = SessionLocal()
@@ -33,11 +147,29 @@ def get_db():
     finally:
         db.close()
 
+def run_with_session(func, *args, **kwargs):
+    """
+    新建会话执行 func(db, *args, **kwargs) 后关闭会话
+
+    供 run_in_pool 在线程池中执行数据库操作：会话只在执行它的线程中使用，
+    请求的会话不传给其他线程；返回的对象已脱离会话，只能访问已加载的属性
+    """
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     """初始化数据库（创建所有表）"""
     from models import Base
     logger.info("开始初始化数据库")
     Base.metadata.create_all(bind=engine)
+    from migrations import run_migrations
+    run_migrations(engine)
     logger.info("数据库初始化完成")
-
-
@@ -0,0 +1,109 @@
+"""
+文件名: dedup_service.py
+作用: 素材去重（内容哈希、文件哈希、SimHash 近似重复检测）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+def normalize_content(content: str) -> str:
+    """
+    规范化文本，用于计算内容哈希
+
+    统一全角/半角（NFKC）、大小写，并把连续空白压缩为一个空格，
+    这样仅排版不同的同一篇内容会得到相同的哈希
+    """
+    content = unicodedata.normalize("NFKC", content)
+    content = re.sub(r"\s+", " ", content)
+    return content.strip().lower()
+
+def content_hash(content: str) -> str:
+    """计算规范化内容的 SHA-256"""
+    return hashlib.sha256(normalize_content(content).encode("utf-8")).hexdigest()
+
+def file_hash(file_content: bytes) -> str:
+    """计算原始文件的 SHA-256"""
+    return file_hasher(file_content).hexdigest()
+
+def file_hasher(file_content: bytes = b""):
+    """创建文件哈希对象，可分块 update，结果与 file_hash 相同"""
+    return hashlib.sha256(file_content)
+
+# ========== SimHash 近似重复检测 ==========
+# 对规范化文本的字符 3-gram 计算 64 位 SimHash，汉明距离越小内容越相似
+# 指纹拆成 4 段 16 位存入索引表：汉明距离 <= 3 的两个指纹至少有一段完全相同（抽屉原理），
+# 因此只需按段精确查找候选，再逐个计算汉明距离，不必扫描全部素材
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+SHINGLE_SIZE = 3
+
+def _shingles(content: str):
+    """把规范化文本切成字符 n-gram（去掉空格，OCR 断行不影响结果）"""
+    text = normalize_content(content).replace(" ", "")
+    if len(text) <= SHINGLE_SIZE:
+        return [text] if text else []
+    return [text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+
+SIMHASH_BYTES = SIMHASH_BITS // 8
+
+# 字节值 -> 该字节中为 1 的位
+_BYTE_BITS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+
+def simhash(content: str) -> int:
+    """
+    计算文本的 64 位 SimHash
+
+    每个 n-gram 的哈希（大端 64 位）逐位投票：该位为 1 加权重、为 0 减权重，结果为正的位置 1。
+    不逐个 n-gram 循环 64 位：所有哈希拼成一个字节串，按字节位置统计各字节值出现的次数，
+    再由每个字节值的次数换算出每一位为 1 的次数（重复的 n-gram 各算一次，即权重）
+
+    返回:
+        int: 有符号 64 位整数（可直接存入 SQLite INTEGER 列）
+    """
+    shingles = _shingles(content)
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=SIMHASH_BYTES).digest() for shingle in shingles
+    )
+
+    fingerprint = 0
+    for position in range(SIMHASH_BYTES):
+        # 大端序：第 position 个字节对应第 (SIMHASH_BYTES - 1 - position) * 8 位起的 8 位
+        ones = [0] * 8
+        for value, count in Counter(digests[position::SIMHASH_BYTES]).items():
+            for bit in _BYTE_BITS[value]:
+                ones[bit] += count
+        shift = (SIMHASH_BYTES - 1 - position) * 8
+        for bit in range(8):
+            # 为 1 的次数多于为 0 的次数
+            if ones[bit] * 2 > len(shingles):
+                fingerprint |= 1 << (shift + bit)
+    return _to_signed(fingerprint)
+
+def _to_signed(value: int) -> int:
+    """无符号 64 位转有符号（SQLite INTEGER 为有符号 64 位）"""
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+def simhash_bands(fingerprint: int):
+    """
+    把指纹拆成若干段，用于索引表
+
+    返回:
+        list: [(段序号, 段值), ...]
+    """
+    unsigned = fingerprint & ((1 << SIMHASH_BITS) - 1)
+    mask = (1 << SIMHASH_BAND_BITS) - 1
+    return [(band, unsigned >> (band * SIMHASH_BAND_BITS) & mask) for band in range(SIMHASH_BANDS)]
+
+def hamming_distance(a: int, b: int) -> int:
+    """计算两个指纹的汉明距离"""
+    return bin((a ^ b) & ((1 << SIMHASH_BITS) - 1)).count("1")
@@ -0,0 +1,127 @@
+"""
+文件名: http_client.py
+作用: 进程内共用的 HTTP 客户端（连接池复用、超时、连接失败重试和按域名限速的状态码重试）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+from config import settings
+import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# fetch() 遇到这些状态码时经限速器重试
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_session = None
+_session_lock = threading.Lock()
+
+def _create_session() -> requests.Session:
+    """按配置创建 Session（连接池大小、重试策略）"""
+    # 连接池层只重试连接失败和读取超时；按状态码的重试由 fetch() 处理，
+    # 每次重试都经过 rate_limiter，Retry-After 的等待时长有上限
+    retry = Retry(
+        total=settings.HTTP_RETRIES,
+        connect=settings.HTTP_RETRIES,
+        read=settings.HTTP_RETRIES,
+        status=0,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    # pool_connections: 缓存连接池的域名数；pool_maxsize: 每个域名保持的连接数
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_HOSTS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    logger.info(
+        f"创建 HTTP 连接池: 域名数={settings.HTTP_POOL_HOSTS}, "
+        f"每域名连接数={settings.HTTP_POOL_MAXSIZE}, 重试次数={settings.HTTP_RETRIES}"
+    )
+    return session
+
+def get_session() -> requests.Session:
+    """获取共用的 Session（首次使用时创建）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+def get(url: str, timeout=None, **kwargs) -> requests.Response:
+    """
+    发送 GET 请求（复用连接池中的连接）
+
+    参数:
+        url (str): 请求地址
+        timeout: 超时（秒），默认使用 (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        **kwargs: 其他参数同 requests.get
+
+    返回:
+        requests.Response: 响应（stream=True 时需要关闭响应，连接才会放回连接池）
+    """
+    if timeout is None:
+        timeout = (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    """
+    计算状态码重试前的等待秒数
+
+    有 Retry-After 响应头（秒数或 HTTP 日期）时按其等待，否则按 HTTP_RETRY_BACKOFF 指数递增；
+    两者都不超过 HTTP_RETRY_AFTER_MAX
+    """
+    delay = settings.HTTP_RETRY_BACKOFF * (2 ** attempt)
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = Retry().parse_retry_after(retry_after)
+        except InvalidHeader:
+            pass
+    return min(max(delay, 0.0), settings.HTTP_RETRY_AFTER_MAX)
+
+def fetch(url: str, timeout=None, **kwargs) -> requests.Response:
+    """
+    按域名限速发送 GET 请求，429/5xx 响应按 Retry-After（有上限）等待后重试
+
+    每次请求（包括重试）前都调用 rate_limiter.acquire，重试不会绕过限速
+
+    参数:
+        url (str): 请求地址
+        timeout: 超时（秒），默认使用 (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        **kwargs: 其他参数同 requests.get
+
+    返回:
+        requests.Response: 最后一次请求的响应（重试用完时可能仍是 429/5xx，由调用方处理）
+    """
+    for attempt in range(settings.HTTP_RETRIES + 1):
+        rate_limiter.acquire(url)
+        response = get(url, timeout=timeout, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt == settings.HTTP_RETRIES:
+            return response
+        delay = _retry_delay(response, attempt)
+        response.close()
+        logger.warning(f"请求返回 {response.status_code}，{delay:.1f} 秒后重试: {url}")
+        time.sleep(delay)
+
+def close_session():
+    """关闭共用的 Session（释放连接池中的连接）"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            logger.info("HTTP 连接池已关闭")
@@ -16,20 +16,48 @@ from io import BytesIO
 import re
 from urllib.parse import urlparse, urljoin
 from bs4 import BeautifulSoup
-import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import wait, FIRST_COMPLETED
+from config import settings
+from task_pools import get_pool
+import http_client
 
 logger = logging.getLogger(__name__)
 
-def download_image_from_url(url: str, timeout: int = 30) -> str:
+# tesseract 默认按 CPU 数开 OpenMP 线程，多个 OCR 线程/进程同时运行时会成倍超额占用 CPU；
+# pytesseract 启动的子进程继承本进程的环境变量，PDF 进程池的子进程导入本模块时同样生效
+os.environ.setdefault("OMP_THREAD_LIMIT", str(settings.OCR_TESSERACT_THREADS))
+
+# Pillow 打开超大图片时的保护（超过 2 倍直接报错），其他位置打开图片同样生效
+Image.MAX_IMAGE_PIXELS = settings.MAX_IMAGE_PIXELS
+
+# 域名 -> 信号量，限制同一域名的并发下载数（所有 URL 任务共用）
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+@contextmanager
+def host_slot(url: str):
+    """占用目标域名的一个下载名额（达到 IMAGE_HOST_CONCURRENCY 时等待）"""
+    host = urlparse(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(settings.IMAGE_HOST_CONCURRENCY)
+            _host_slots[host] = slot
+    with slot:
+        yield
+
+def fetch_image(url: str, timeout=None) -> tuple:
     """
-    从URL下载图片到本地
+    从URL下载图片到内存
     
     参数:
         url (str): 图片URL
-        timeout (int): 下载超时时间（秒）
+        timeout: 下载超时（秒），默认使用 HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT
     
     返回:
-        str: 本地图片文件路径
+        tuple: (图片字节, content-type)
     
     异常:
         Exception: 当下载失败时
@@ -47,56 +75,36 @@ def download_image_from_url(url: str, timeout: int = 30) -> str:
             'Upgrade-Insecure-Requests': '1',
         }
         
-        # 下载图片
-        response = requests.get(url, headers=headers, timeout=timeout, stream=True)
-        response.raise_for_status()
-        
-        # 检查内容类型
-        content_type = response.headers.get('content-type', '').lower()
-        if not content_type.startswith('image/'):
-            logger.warning(f"URL不是图片: {content_type}")
-            raise Exception(f"URL不是图片格式: {content_type}")
-        
-        # 生成唯一文件名
-        parsed_url = urlparse(url)
-        file_ext = os.path.splitext(parsed_url.path)[1]
-        if not file_ext:
-            # 根据content-type确定扩展名
-            if 'jpeg' in content_type or 'jpg' in content_type:
-                file_ext = '.jpg'
-            elif 'png' in content_type:
-                file_ext = '.png'
-            elif 'gif' in content_type:
-                file_ext = '.gif'
-            elif 'webp' in content_type:
-                file_ext = '.webp'
-            else:
-                file_ext = '.jpg'  # 默认
-        
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
+        # 下载图片（按域名限速，429/5xx 经限速器重试）
+        # 响应用完后关闭，连接放回连接池
+        with http_client.fetch(url, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
         
-        # 确保uploads目录存在
-        from config import settings
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+            # 检查内容类型
+            content_type = response.headers.get('content-type', '').lower()
+            if not content_type.startswith('image/'):
+                logger.warning(f"URL不是图片: {content_type}")
+                raise Exception(f"URL不是图片格式: {content_type}")
         
-        file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+            # 检查文件大小：先看响应头声明的大小，下载过程中超过限制立即中止
+            max_size = settings.MAX_IMAGE_SIZE
+            too_large = f"图片文件过大，最大支持{max_size // (1024 * 1024)}MB"
+            content_length = response.headers.get('content-length', '')
+            if content_length.isdigit() and int(content_length) > max_size:
+                raise Exception(too_large)
         
-        # 保存图片
-        with open(file_path, 'wb') as f:
+            # 读入内存
+            buffer = BytesIO()
             for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        # 检查文件大小
-        file_size = os.path.getsize(file_path)
-        file_size_mb = file_size / (1024 * 1024)
+                buffer.write(chunk)
+                if buffer.tell() > max_size:
+                    raise Exception(too_large)
         
-        logger.info(f"图片下载成功: {file_path}, 大小: {file_size_mb:.2f} MB")
+        data = buffer.getvalue()
         
-        if file_size_mb > 10:  # 限制10MB
-            os.remove(file_path)
-            raise Exception("图片文件过大，最大支持10MB")
+        logger.info(f"图片下载成功: {url}, 大小: {len(data) / (1024 * 1024):.2f} MB")
         
-        return file_path
+        return data, content_type
         
     except requests.exceptions.RequestException as e:
         logger.error(f"下载图片失败: {e}")
@@ -105,6 +113,122 @@ def download_image_from_url(url: str, timeout: int = 30) -> str:
         logger.error(f"处理图片失败: {e}")
         raise Exception(f"处理图片失败: {str(e)}")
 
+def save_image(url: str, data: bytes, content_type: str) -> str:
+    """
+    把下载的图片保存到 UPLOAD_DIR
+    
+    返回:
+        str: 本地图片文件路径
+    """
+    # 生成唯一文件名
+    parsed_url = urlparse(url)
+    file_ext = os.path.splitext(parsed_url.path)[1]
+    if not file_ext:
+        # 根据content-type确定扩展名
+        if 'jpeg' in content_type or 'jpg' in content_type:
+            file_ext = '.jpg'
+        elif 'png' in content_type:
+            file_ext = '.png'
+        elif 'gif' in content_type:
+            file_ext = '.gif'
+        elif 'webp' in content_type:
+            file_ext = '.webp'
+        else:
+            file_ext = '.jpg'  # 默认
+    
+    unique_filename = f"{uuid.uuid4()}{file_ext}"
+    
+    # 确保uploads目录存在
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    
+    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    with open(file_path, 'wb') as f:
+        f.write(data)
+    
+    logger.info(f"图片已保存: {file_path}")
+    return file_path
+
+def download_image_from_url(url: str, timeout=None) -> str:
+    """
+    从URL下载图片到本地
+    
+    参数:
+        url (str): 图片URL
+        timeout: 下载超时（秒），默认使用 HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT
+    
+    返回:
+        str: 本地图片文件路径
+    
+    异常:
+        Exception: 当下载失败时
+    """
+    data, content_type = fetch_image(url, timeout)
+    return save_image(url, data, content_type)
+
+def _fetch_for_ocr(url: str) -> tuple:
+    """
+    下载图片用于 OCR（同一域名受 host_slot 限制）
+    
+    返回:
+        tuple: (图片字节, 本地文件路径)，未开启 KEEP_DOWNLOADED_IMAGES 时不落盘，文件路径为 None
+    """
+    with host_slot(url):
+        data, content_type = fetch_image(url)
+    file_path = save_image(url, data, content_type) if settings.KEEP_DOWNLOADED_IMAGES else None
+    return data, file_path
+
+def ocr_image(image: Image.Image) -> str:
+    """
+    对已打开的图片做 OCR（图片 OCR 和扫描版 PDF 共用）
+    
+    参数:
+        image (Image.Image): PIL 图片
+    
+    返回:
+        str: 提取的文字内容（去掉空行），未识别到文字时为空字符串
+    """
+    # 转换为RGB模式（如果需要）
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # 获取图片信息
+    width, height = image.size
+    logger.info(f"图片尺寸: {width}x{height}")
+    
+    # 如果图片太小，尝试放大
+    if width < 100 or height < 100:
+        logger.info("图片尺寸较小，尝试放大")
+        scale_factor = max(100 / width, 100 / height)
+        new_width = int(width * scale_factor)
+        new_height = int(height * scale_factor)
+        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        logger.info(f"放大后尺寸: {new_width}x{new_height}")
+    
+    # 使用pytesseract进行OCR（参数见 settings.OCR_TESSERACT_CONFIG，默认中英文）
+    text = pytesseract.image_to_string(image, config=settings.OCR_TESSERACT_CONFIG)
+    
+    # 清理文字，移除多余的空行
+    lines = [line.strip() for line in text.strip().split('\n') if line.strip()]
+    return '\n'.join(lines)
+
+def _extract_text(image: Image.Image) -> str:
+    """对已打开的图片做 OCR，未识别到文字时返回“未检测到文字内容”"""
+    # Image.open 只读取了文件头，像素数超限时在解码前拒绝
+    width, height = image.size
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise Exception(f"图片像素过多: {width}x{height}，最大支持 {settings.MAX_IMAGE_PIXELS} 像素")
+    
+    text = ocr_image(image)
+    
+    word_count = len(text)
+    logger.info(f"OCR提取完成: {word_count} 字")
+    
+    if not text:
+        logger.warning("OCR未提取到任何文字")
+        return "未检测到文字内容"
+    
+    return text
+
 def extract_text_from_image(image_path: str) -> str:
     """
     从图片中提取文字（OCR）
@@ -125,52 +249,52 @@ def extract_text_from_image(image_path: str) -> str:
         if not os.path.exists(image_path):
             raise Exception(f"图片文件不存在: {image_path}")
         
-        # 打开图片
+        # 打开图片并提取文字
         with Image.open(image_path) as image:
-            # 转换为RGB模式（如果需要）
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # 获取图片信息
-            width, height = image.size
-            logger.info(f"图片尺寸: {width}x{height}")
-            
-            # 如果图片太小，尝试放大
-            if width < 100 or height < 100:
-                logger.info("图片尺寸较小，尝试放大")
-                scale_factor = max(100 / width, 100 / height)
-                new_width = int(width * scale_factor)
-                new_height = int(height * scale_factor)
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                logger.info(f"放大后尺寸: {new_width}x{new_height}")
-            
-            # 使用pytesseract进行OCR
-            # 配置OCR参数，支持中英文
-            custom_config = r'--oem 3 --psm 6 -l chi_sim+eng'
+            return _extract_text(image)
             
-            # 提取文字
-            text = pytesseract.image_to_string(image, config=custom_config)
-            
-            # 清理文字
-            text = text.strip()
-            
-            # 移除多余的空行
-            lines = [line.strip() for line in text.split('\n') if line.strip()]
-            text = '\n'.join(lines)
-            
-            word_count = len(text)
-            logger.info(f"OCR提取完成: {word_count} 字")
-            
-            if not text:
-                logger.warning("OCR未提取到任何文字")
-                return "未检测到文字内容"
-            
-            return text
+    except Exception as e:
+        logger.error(f"OCR处理失败: {e}")
+        raise Exception(f"OCR文字提取失败: {str(e)}")
+
+def extract_text_from_image_bytes(data: bytes) -> str:
+    """
+    从内存中的图片提取文字（OCR），不经过磁盘
+    
+    参数:
+        data (bytes): 图片文件内容
+    
+    返回和异常同 extract_text_from_image
+    """
+    logger.info(f"开始OCR文字提取: {len(data)} 字节")
+    
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return _extract_text(image)
             
     except Exception as e:
         logger.error(f"OCR处理失败: {e}")
         raise Exception(f"OCR文字提取失败: {str(e)}")
 
+def extract_text_from_image_cached(data: bytes) -> str:
+    """
+    从内存中的图片提取文字，按图片内容哈希使用提取缓存（同一张图片不重复 OCR）
+
+    参数和返回值同 extract_text_from_image_bytes
+    """
+    # 延迟导入：PDF OCR 的进程池子进程也会导入本模块，子进程不需要数据库
+    import cache_service
+    import dedup_service
+
+    image_hash = dedup_service.file_hash(data)
+    variant = settings.OCR_TESSERACT_CONFIG
+
+    text = cache_service.get_text("image", image_hash, variant)
+    if text is None:
+        text = extract_text_from_image_bytes(data)
+        cache_service.put_text("image", image_hash, variant, text)
+    return text
+
 def extract_images_from_webpage(url: str) -> list:
     """
     从网页中提取图片URL列表
@@ -197,8 +321,8 @@ def extract_images_from_webpage(url: str) -> list:
             'Upgrade-Insecure-Requests': '1',
         }
         
-        # 获取网页内容
-        response = requests.get(url, headers=headers, timeout=30)
+        # 获取网页内容（按域名限速，429/5xx 经限速器重试）
+        response = http_client.fetch(url, headers=headers)
         response.raise_for_status()
         
         # 解析HTML
@@ -224,8 +348,8 @@ def extract_images_from_webpage(url: str) -> list:
                 absolute_url = urljoin(url, bg_img)
                 image_urls.append(absolute_url)
         
-        # 去重
-        image_urls = list(set(image_urls))
+        # 去重（保持图片在页面中的顺序）
+        image_urls = list(dict.fromkeys(image_urls))
         
         # 过滤掉明显不是图片的URL
         filtered_urls = []
@@ -243,16 +367,17 @@ def extract_images_from_webpage(url: str) -> list:
         logger.error(f"解析网页图片失败: {e}")
         raise Exception(f"解析网页图片失败: {str(e)}")
 
-def process_url_for_images(url: str) -> dict:
+def process_url_for_images(url: str, progress_callback=None) -> dict:
     """
     处理URL，提取图片并识别文字
     
     参数:
         url (str): 网页或图片URL
+        progress_callback (callable): 进度回调 callback(已处理图片数, 图片总数)，可选
     
     返回:
         dict: {
-            'images': [{'url': str, 'text': str, 'file_path': str}],
+            'images': [{'url': str, 'text': str, 'file_path': str}],  # 未开启 KEEP_DOWNLOADED_IMAGES 时 file_path 为 None
             'total_text': str,
             'source_type': str
         }
@@ -284,10 +409,13 @@ def process_url_for_images(url: str) -> dict:
             logger.info("检测到直接图片URL")
             
             # 下载图片
-            image_path = download_image_from_url(url)
+            data, image_path = _fetch_for_ocr(url)
             
             # 提取文字
-            text = extract_text_from_image(image_path)
+            text = extract_text_from_image_cached(data)
+            
+            if progress_callback:
+                progress_callback(1, 1)
             
             return {
                 'images': [{
@@ -308,34 +436,51 @@ def process_url_for_images(url: str) -> dict:
             if not image_urls:
                 raise Exception("网页中未找到图片")
             
-            # 处理每个图片
-            processed_images = []
-            all_texts = []
+            # 下载和 OCR 流水线：图片在下载线程池中并发下载到内存（同一域名受 host_slot 限制），
+            # 每张下载完成后立即提交到 OCR 线程池，最后按页面顺序合并结果
+            total = len(image_urls)
+            image_paths = [None] * total
+            texts = [None] * total
+            finished = 0
             
-            for i, img_url in enumerate(image_urls):
-                try:
-                    logger.info(f"处理第 {i+1}/{len(image_urls)} 个图片: {img_url}")
-                    
-                    # 下载图片
-                    image_path = download_image_from_url(img_url)
-                    
-                    # 提取文字
-                    text = extract_text_from_image(image_path)
-                    
-                    if text and text != "未检测到文字内容":
-                        processed_images.append({
-                            'url': img_url,
-                            'text': text,
-                            'file_path': image_path
-                        })
-                        all_texts.append(text)
-                    
-                    # 添加延迟，避免请求过快
-                    time.sleep(1)
+            download_pool = get_pool("image")
+            ocr_pool = get_pool("ocr")
+            pending = {
+                download_pool.submit(_fetch_for_ocr, img_url): ("download", i)
+                for i, img_url in enumerate(image_urls)
+            }
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, i = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.warning(f"处理图片失败 {image_urls[i]}: {e}")
+                    else:
+                        if stage == "download":
+                            data, image_paths[i] = result
+                            pending[ocr_pool.submit(extract_text_from_image_cached, data)] = ("ocr", i)
+                            continue
+                        texts[i] = result
                     
-                except Exception as e:
-                    logger.warning(f"处理图片失败 {img_url}: {e}")
-                    continue
+                    # 下载失败或 OCR 结束，这张图片处理完毕
+                    finished += 1
+                    logger.info(f"图片处理进度: {finished}/{total}")
+                    if progress_callback:
+                        progress_callback(finished, total)
+            
+            processed_images = []
+            all_texts = []
+            for img_url, image_path, text in zip(image_urls, image_paths, texts):
+                if text and text != "未检测到文字内容":
+                    processed_images.append({
+                        'url': img_url,
+                        'text': text,
+                        'file_path': image_path
+                    })
+                    all_texts.append(text)
             
             if not processed_images:
                 raise Exception("所有图片都未能提取到文字内容")
@@ -0,0 +1,286 @@
+"""
+文件名: ingest_service.py
+作用: 素材入库（去重保存、PDF/URL 解析入库），供接口和后台任务共用
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import logging
+import os
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from config import settings
+from pdf_service import extract_text_from_pdf, extraction_variant, iter_pdf_pages
+from image_service import process_url_for_images
+import cache_service
+import crud
+import dedup_service
+
+logger = logging.getLogger(__name__)
+
+# 近似重复（SimHash）的处理方式:
+#   allow  - 照常创建（默认）
+#   reject - 拒绝入库（NearDuplicateError）
+#   merge  - 不创建新素材，返回已有素材
+NEAR_DUPLICATE_MODES = ("allow", "reject", "merge")
+
+class IngestError(Exception):
+    """素材解析失败（文件无法解析、未提取到文字等，属于用户输入问题）"""
+
+class NearDuplicateError(Exception):
+    """存在近似重复的素材（near_duplicate=reject 时）"""
+
+    def __init__(self, material, distance: int):
+        super().__init__(f"存在近似重复的素材: id={material.id}")
+        self.material = material
+        self.distance = distance
+
+def save_material(db: Session, material_data: dict, near_duplicate: str = "allow"):
+    """
+    保存素材，内容重复时返回已有素材
+
+    返回:
+        tuple: (素材对象, 重复类型)，重复类型为 None（新建）、"exact" 或 "near"
+
+    异常:
+        NearDuplicateError: near_duplicate 为 reject 且存在近似重复素材时
+    """
+    # 哈希和指纹只算一次，查重和写入共用（长文本的 SimHash 计算较慢）
+    digest = dedup_service.content_hash(material_data["content"])
+    fingerprint = dedup_service.simhash(material_data["content"])
+    existing, duplicate = find_duplicate(db, material_data["content"], near_duplicate, digest, fingerprint)
+    if existing:
+        return existing, duplicate
+
+    try:
+        return crud.create_material(db, material_data, digest, fingerprint), None
+    except IntegrityError:
+        # 并发写入同一内容时由唯一索引兜底
+        db.rollback()
+        existing = crud.get_material_by_content_hash(db, digest)
+        if existing is None:
+            raise
+        return existing, "exact"
+
+def find_duplicate(db: Session, content: str, near_duplicate: str = "allow", digest: str = None,
+                   fingerprint: int = None):
+    """
+    查找与内容重复的已有素材（digest / fingerprint 为已算好的内容哈希和 SimHash，可选）
+
+    返回:
+        tuple: (已有素材, 重复类型)，没有重复时为 (None, None)
+
+    异常:
+        NearDuplicateError: near_duplicate 为 reject 且存在近似重复素材时
+    """
+    existing = crud.get_material_by_content_hash(db, digest or dedup_service.content_hash(content))
+    if existing:
+        return existing, "exact"
+
+    if near_duplicate != "allow":
+        similar, distance = crud.find_near_duplicate_material(db, content, fingerprint=fingerprint)
+        if similar:
+            logger.info(f"发现近似重复素材: id={similar.id}, distance={distance}")
+            if near_duplicate == "reject":
+                raise NearDuplicateError(similar, distance)
+            return similar, "near"
+
+    return None, None
+
+def ingest_pdf(db: Session, file_path: str, file_name: str, source_type: str, title: str = None,
+               file_hash: str = None, near_duplicate: str = "allow", progress_callback=None,
+               engine: str = None):
+    """
+    解析已保存的 PDF 并入库
+
+    解析失败、被判定为近似重复或内容与已有素材相同时，删除已保存的文件
+
+    参数:
+        progress_callback (callable): 进度回调 callback(已处理页数, 总页数)，可选
+        engine (str): PDF 提取引擎，默认使用配置
+
+    返回:
+        tuple: (素材对象, 重复类型)，同 save_material
+
+    异常:
+        IngestError: PDF 解析失败时
+        NearDuplicateError: 同 save_material
+    """
+    try:
+        # 同一文件用同样方式提取过时直接使用缓存结果
+        variant = extraction_variant(engine)
+        extracted_text = cache_service.get_text("pdf", file_hash, variant)
+        if extracted_text is None:
+            extracted_text = extract_text_from_pdf(
+                file_path, progress_callback=progress_callback, engine=engine
+            )
+            cache_service.put_text("pdf", file_hash, variant, extracted_text)
+        logger.info(f"PDF 文本提取成功: {len(extracted_text)} 字")
+    except Exception as e:
+        logger.error(f"PDF 文本提取失败: {e}")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise IngestError(f"PDF 解析失败: {str(e)}")
+
+    return _save_pdf_text(db, file_path, extracted_text, file_name, source_type, title, file_hash, near_duplicate)
+
+def _save_pdf_text(db: Session, file_path: str, text: str, file_name: str, source_type: str,
+                   title: str, file_hash: str, near_duplicate: str):
+    """保存 PDF 提取出的文本；保存失败或内容与已有素材重复时删除已保存的文件"""
+    material_data = {
+        "title": title or file_name,
+        "content": text,
+        "source_type": source_type,
+        "file_name": file_name,
+        "file_hash": file_hash
+    }
+    try:
+        material, duplicate = save_material(db, material_data, near_duplicate)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    if duplicate:
+        # 文件不同但内容相同，已保存的文件不再需要
+        os.remove(file_path)
+    return material, duplicate
+
+def ingest_pdf_streaming(db: Session, file_path: str, file_name: str, source_type: str, title: str = None,
+                         file_hash: str = None, near_duplicate: str = "allow", progress_callback=None,
+                         engine: str = None, material_callback=None):
+    """
+    逐页解析 PDF 并增量入库
+
+    先创建 processing 状态的素材，每 PDF_STREAM_BATCH_PAGES 页追加一个正文分块并提交，
+    解析过程中即可查看素材；全文索引每 PDF_STREAM_INDEX_PAGES 页刷新一次。
+    全部页面写入后再做去重判断，素材状态变为 ready；
+    解析失败或与已有素材重复时删除该素材和已保存的文件
+
+    参数:
+        progress_callback (callable): 进度回调 callback(已处理页数, 总页数)，可选
+        material_callback (callable): 素材创建后的回调 callback(素材对象)，可选
+
+    返回:
+        tuple: (素材对象, 重复类型)，同 save_material
+
+    异常:
+        IngestError: PDF 解析失败时
+        NearDuplicateError: 同 save_material
+    """
+    # 命中提取缓存时不需要逐页解析，直接整篇保存
+    try:
+        variant = extraction_variant(engine)
+    except ValueError as e:
+        raise IngestError(f"PDF 解析失败: {str(e)}")
+    cached_text = cache_service.get_text("pdf", file_hash, variant)
+    if cached_text is not None:
+        return _save_pdf_text(db, file_path, cached_text, file_name, source_type, title, file_hash, near_duplicate)
+
+    material = crud.create_streaming_material(db, {
+        "title": title or file_name,
+        "source_type": source_type,
+        "file_name": file_name,
+        "file_hash": file_hash
+    })
+    try:
+        if material_callback:
+            material_callback(material)
+
+        batch = []
+        chunk_index = 0
+        indexed_pages = 0
+        try:
+            for page_num, total_pages, page_text in iter_pdf_pages(file_path, engine=engine):
+                if page_text:
+                    batch.append(page_text)
+                if page_num % settings.PDF_STREAM_BATCH_PAGES == 0 or page_num == total_pages:
+                    # 分块之间用换行连接，与一次性提取的拼接方式一致
+                    chunk = "\n".join(batch)
+                    if chunk and material.content_length:
+                        chunk = "\n" + chunk
+                    reindex = page_num - indexed_pages >= settings.PDF_STREAM_INDEX_PAGES
+                    crud.append_material_chunk(
+                        db, material, chunk_index, chunk, page_num, total_pages, reindex=reindex
+                    )
+                    if chunk:
+                        chunk_index += 1
+                    if reindex:
+                        indexed_pages = page_num
+                    batch = []
+                if progress_callback:
+                    progress_callback(page_num, total_pages)
+        except Exception as e:
+            logger.error(f"PDF 文本提取失败: {e}")
+            raise IngestError(f"PDF 解析失败: {str(e)}")
+
+        content = crud.get_material_contents(db, [material.id]).get(material.id, "")
+        if not content.strip():
+            logger.error("PDF 中没有提取到任何文字（OCR 也未识别到文字）")
+            raise IngestError("PDF 解析失败: PDF 中没有可识别的文字内容")
+
+        digest = dedup_service.content_hash(content)
+        fingerprint = dedup_service.simhash(content)
+        existing, duplicate = find_duplicate(db, content, near_duplicate, digest, fingerprint)
+        if existing is None:
+            try:
+                material = crud.finalize_streaming_material(db, material, content, digest, fingerprint)
+                cache_service.put_text("pdf", file_hash, variant, content)
+                return material, None
+            except IntegrityError:
+                # 并发写入同一内容时由唯一索引兜底
+                db.rollback()
+                existing = crud.get_material_by_content_hash(db, digest)
+                if existing is None:
+                    raise
+                duplicate = "exact"
+    except Exception:
+        db.rollback()
+        crud.permanent_delete_material(db, material.id)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    # 与已有素材重复，删除刚写入的素材和文件
+    crud.permanent_delete_material(db, material.id)
+    os.remove(file_path)
+    return existing, duplicate
+
+def ingest_url(db: Session, url: str, source_type: str = None, title: str = None,
+               near_duplicate: str = "allow", progress_callback=None):
+    """
+    抓取 URL 中的图片、识别文字并入库
+
+    参数:
+        progress_callback (callable): 进度回调 callback(已处理图片数, 图片总数)，可选
+
+    返回:
+        tuple: (素材对象, 重复类型, 图片数量)
+
+    异常:
+        IngestError: URL 处理失败或未识别到文字时
+        NearDuplicateError: 同 save_material
+    """
+    try:
+        result = process_url_for_images(url, progress_callback=progress_callback)
+        logger.info(f"URL处理成功: 找到{len(result['images'])}个图片")
+    except Exception as e:
+        logger.error(f"URL处理失败: {e}")
+        raise IngestError(f"处理URL失败: {str(e)}")
+
+    if not result['total_text'] or result['total_text'].strip() == "":
+        logger.warning("未提取到任何文字内容")
+        raise IngestError("未从图片中提取到文字内容")
+
+    material_data = {
+        "title": title or f"来自{result['source_type']}的素材",
+        "content": result['total_text'],
+        "source_type": source_type or result['source_type'],
+        "source_url": url
+    }
+    material, duplicate = save_material(db, material_data, near_duplicate)
+
+    # 图片默认只在内存中处理，不产生临时文件；开启 KEEP_DOWNLOADED_IMAGES 时原图保留在 UPLOAD_DIR
+
+    return material, duplicate, len(result['images'])
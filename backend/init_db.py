@@ -7,6 +7,8 @@
 """
 
 import logging
+from contextlib import contextmanager
+from sqlalchemy import event
 from database import engine, init_db
 from models import Base, Material, Topic, Config
 import json
@@ -26,8 +28,8 @@ def create_tables():
     logger.info("=" * 60)
     
     try:
-        # 创建所有表
-        Base.metadata.create_all(bind=engine)
+        # 创建所有表并执行迁移
+        init_db()
         logger.info("✅ 数据库表创建成功")
         
         # 显示创建的表
@@ -158,6 +160,100 @@ def verify_database():
     finally:
         db.close()
 
+@contextmanager
+def _capture_statements(bind):
+    """记录执行期间发出的 SQL 及参数"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+def verify_query_plans():
+    """
+    验证列表查询的执行计划
+
+    调用各列表接口实际使用的 crud 查询（带筛选条件和游标），记录发出的 SQL，
+    逐条执行 EXPLAIN QUERY PLAN，确认走索引，而不是全表扫描或临时 B 树排序
+
+    按标签筛选时，规划器可能先从关联表取出带该标签的 id、再按主键查找并排序，
+    排序的只是带该标签的行，这种计划允许临时 B 树排序
+    """
+    from datetime import datetime
+    from database import SessionLocal
+    from models import UsageStats, Tag
+    from utils import encode_cursor
+    import crud
+    
+    logger.info("\n开始验证查询执行计划...")
+    
+    db = SessionLocal()
+    try:
+        page = 20
+        cursor = encode_cursor(datetime.now(), 2 ** 31)
+        # 标签筛选只有已创建的标签走关联表，临时创建一个标签，验证结束后回滚
+        tag = Tag(name="__verify_query_plans__")
+        db.add(tag)
+        db.flush()
+        material_columns = [Material.id, Material.title, Material.created_at]
+        topic_columns = [Topic.id, Topic.title, Topic.created_at]
+        tag_filtered = {"素材列表（按标签筛选）", "选题列表（按标签筛选）"}
+        queries = {
+            "素材列表": lambda: crud.list_materials(
+                db, material_columns, per_page=page, cursor=cursor, with_total=False),
+            "素材列表（按来源筛选）": lambda: crud.list_materials(
+                db, material_columns, source_type="twitter", per_page=page, cursor=cursor, with_total=False),
+            "素材列表（按标签筛选）": lambda: crud.list_materials(
+                db, material_columns, tag_names=[tag.name], per_page=page, cursor=cursor, with_total=False),
+            "回收站": lambda: crud.list_deleted_materials(
+                db, [Material.id, Material.title, Material.deleted_at], per_page=page, cursor=cursor,
+                with_total=False),
+            "选题列表": lambda: crud.list_topics(
+                db, topic_columns, per_page=page, cursor=cursor, with_total=False),
+            "选题列表（按标签筛选）": lambda: crud.list_topics(
+                db, topic_columns, tag_names=[tag.name], per_page=page, cursor=cursor, with_total=False),
+            "素材关联的选题": lambda: db.query(Topic.id).filter(Topic.material_id == 1).all(),
+            "使用统计": lambda: db.query(UsageStats)
+                .filter(UsageStats.date == "2025-01-01", UsageStats.model == "gpt-4").all(),
+        }
+        
+        passed = True
+        for name, run_query in queries.items():
+            with _capture_statements(db.get_bind()) as statements:
+                run_query()
+            details = []
+            for statement, parameters in statements:
+                plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                details.extend(row[-1] for row in plan)
+            # 全表扫描的计划为 "SCAN 表名"（没有 USING INDEX），额外排序为 "USE TEMP B-TREE"
+            sort_from_links = name in tag_filtered and any(
+                "USING INTEGER PRIMARY KEY" in detail for detail in details
+            )
+            bad = [
+                detail for detail in details
+                if ("TEMP B-TREE" in detail and not sort_from_links)
+                or (detail.startswith("SCAN") and "USING" not in detail)
+            ]
+            if bad:
+                logger.error(f"❌ {name}: 未使用索引 {details}")
+                passed = False
+            else:
+                logger.info(f"✅ {name}: {'; '.join(details)}")
+        
+        return passed
+        
+    except Exception as e:
+        logger.error(f"❌ 执行计划验证失败: {e}", exc_info=True)
+        return False
+    finally:
+        db.rollback()
+        db.close()
+
 def test_crud_operations():
     """测试基本的 CRUD 操作"""
     from database import SessionLocal
@@ -252,7 +348,12 @@ if __name__ == "__main__":
         logger.error("数据库验证失败")
         exit(1)
     
-    # 4. 测试 CRUD 操作
+    # 4. 验证查询执行计划
+    if not verify_query_plans():
+        logger.error("查询执行计划验证失败")
+        exit(1)
+    
+    # 5. 测试 CRUD 操作
     if not test_crud_operations():
         logger.error("CRUD 操作测试失败")
         exit(1)
@@ -0,0 +1,261 @@
+"""
+文件名: job_service.py
+作用: 后台入库任务（任务持久化在 jobs 表，由线程池执行，服务重启后自动恢复）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from config import settings
+from database import SessionLocal
+from task_pools import get_pool
+import crud
+import ingest_service
+
+logger = logging.getLogger(__name__)
+
+# 本进程的标识（多个工作进程共用数据库时区分任务由谁执行）
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_heartbeat_thread = None
+_heartbeat_lock = threading.Lock()
+
+# 任务进度的单位
+PROGRESS_UNITS = {
+    "pdf": "pages",
+    "url": "images",
+}
+
+def _use_streaming_ingest(file_path: str) -> bool:
+    """是否流式入库（开启 PDF_STREAMING_INGEST 且文件不小于 PDF_STREAMING_MIN_SIZE）"""
+    if not settings.PDF_STREAMING_INGEST:
+        return False
+    try:
+        return os.path.getsize(file_path) >= settings.PDF_STREAMING_MIN_SIZE
+    except OSError:
+        return False
+
+def _run_pdf_job(db, job, params: dict, progress_callback):
+    """
+    执行 PDF 入库任务
+
+    流式入库时素材一创建就记录到任务上，解析过程中即可通过素材详情查看已写入的部分
+    """
+    if _use_streaming_ingest(params["file_path"]):
+        def record_material(material):
+            job.material_id = material.id
+            db.commit()
+
+        material, duplicate = ingest_service.ingest_pdf_streaming(
+            db,
+            file_path=params["file_path"],
+            file_name=params["file_name"],
+            source_type=params["source_type"],
+            title=params.get("title"),
+            file_hash=params.get("file_hash"),
+            near_duplicate=params.get("near_duplicate", "allow"),
+            progress_callback=progress_callback,
+            engine=params.get("engine"),
+            material_callback=record_material
+        )
+        return material, {"duplicate": bool(duplicate), "duplicate_type": duplicate}
+
+    material, duplicate = ingest_service.ingest_pdf(
+        db,
+        file_path=params["file_path"],
+        file_name=params["file_name"],
+        source_type=params["source_type"],
+        title=params.get("title"),
+        file_hash=params.get("file_hash"),
+        near_duplicate=params.get("near_duplicate", "allow"),
+        progress_callback=progress_callback,
+        engine=params.get("engine")
+    )
+    return material, {"duplicate": bool(duplicate), "duplicate_type": duplicate}
+
+def _run_url_job(db, job, params: dict, progress_callback):
+    """执行 URL 入库任务"""
+    material, duplicate, images_count = ingest_service.ingest_url(
+        db,
+        url=params["url"],
+        source_type=params.get("source_type"),
+        title=params.get("title"),
+        near_duplicate=params.get("near_duplicate", "allow"),
+        progress_callback=progress_callback
+    )
+    return material, {
+        "duplicate": bool(duplicate),
+        "duplicate_type": duplicate,
+        "images_count": images_count
+    }
+
+# 任务类型 -> 执行函数
+JOB_HANDLERS = {
+    "pdf": _run_pdf_job,
+    "url": _run_url_job,
+}
+
+def enqueue_job(db, job_type: str, params: dict):
+    """
+    创建任务并提交到线程池
+
+    参数:
+        db: 数据库会话
+        job_type (str): 任务类型（pdf / url）
+        params (dict): 任务参数（需可 JSON 序列化，重启后据此重新执行）
+
+    返回:
+        Job: 新建的任务
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"未知的任务类型: {job_type}")
+    job = crud.create_job(db, job_type, params)
+    submit_job(job.id)
+    return job
+
+def submit_job(job_id: int):
+    """把任务提交到线程池"""
+    get_pool("job").submit(run_job, job_id)
+
+def _recover_interrupted_jobs(db) -> list:
+    """
+    重置心跳超过 JOB_LEASE_SECONDS 的任务，并删除它们写了一半的素材
+
+    返回:
+        list: 被重置为待执行的任务 id
+    """
+    expired_before = datetime.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    job_ids, material_ids = crud.reset_expired_jobs(db, expired_before)
+    if job_ids:
+        logger.info(f"重新执行中断的任务: {len(job_ids)} 个")
+    # 任务重新执行时会重新创建素材
+    unfinished = crud.delete_unfinished_materials(db, expired_before, material_ids)
+    if unfinished:
+        logger.info(f"删除未完成入库的素材: {unfinished} 个")
+    return job_ids
+
+def _heartbeat_loop():
+    """
+    定期刷新本进程执行中任务的心跳，同时接管心跳已过期的任务
+
+    服务重启后，上次中断的任务要等心跳过期才会被重置，由这里在租约到期后重新提交
+    """
+    while True:
+        time.sleep(settings.JOB_HEARTBEAT_INTERVAL)
+        db = SessionLocal()
+        try:
+            crud.heartbeat_jobs(db, WORKER_ID)
+            job_ids = _recover_interrupted_jobs(db)
+        except Exception as e:
+            logger.warning(f"刷新任务心跳失败: {e}")
+            job_ids = []
+        finally:
+            db.close()
+        for job_id in job_ids:
+            submit_job(job_id)
+
+def _start_heartbeat():
+    """启动心跳线程（每个进程一个）"""
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+def run_job(job_id: int):
+    """执行任务（在线程池中调用，使用独立的数据库会话）"""
+    db = SessionLocal()
+    try:
+        # 原子地领取任务：同一任务被多个进程提交时只有一个会执行
+        if not crud.claim_job(db, job_id, WORKER_ID):
+            return
+        _start_heartbeat()
+        job = crud.get_job(db, job_id)
+        logger.info(f"开始执行任务: id={job_id}, type={job.job_type}, worker={WORKER_ID}")
+
+        last_report = [0.0]
+
+        def report_progress(done: int, total: int):
+            """记录进度（按间隔节流写入，最后一项总会写入）"""
+            now = time.time()
+            if done < total and now - last_report[0] < settings.JOB_PROGRESS_INTERVAL:
+                return
+            last_report[0] = now
+            job.progress_done = done
+            job.progress_total = total
+            db.commit()
+
+        try:
+            material, result = JOB_HANDLERS[job.job_type](db, job, json.loads(job.params), report_progress)
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            # 流式入库失败时已写入的素材会被删除
+            job.material_id = None
+            job.finished_at = datetime.now()
+            db.commit()
+            if isinstance(e, (ingest_service.IngestError, ingest_service.NearDuplicateError)):
+                logger.warning(f"任务失败: id={job_id}, {e}")
+            else:
+                logger.error(f"任务失败: id={job_id}, {e}", exc_info=True)
+            return
+
+        job.status = "succeeded"
+        job.material_id = material.id
+        job.result = json.dumps(result, ensure_ascii=False)
+        job.finished_at = datetime.now()
+        db.commit()
+        logger.info(f"任务完成: id={job_id}, material_id={material.id}")
+    except Exception as e:
+        logger.error(f"执行任务出错: id={job_id}, {e}", exc_info=True)
+    finally:
+        db.close()
+
+def resume_jobs():
+    """
+    服务启动时恢复任务：中断的任务重新执行，待执行的任务重新提交
+
+    多个工作进程（如 gunicorn -w 4）各自启动时都会调用：只有心跳超过 JOB_LEASE_SECONDS
+    的任务才视为中断，其他进程正在执行的任务和素材不受影响；重复提交的任务由 claim_job 保证只执行一次
+    """
+    db = SessionLocal()
+    try:
+        _recover_interrupted_jobs(db)
+        job_ids = crud.get_pending_job_ids(db)
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        submit_job(job_id)
+    if job_ids:
+        logger.info(f"已恢复待执行任务: {len(job_ids)} 个")
+    _start_heartbeat()
+
+def format_job(job) -> dict:
+    """格式化任务信息（接口返回用）"""
+    return {
+        "id": job.id,
+        "job_type": job.job_type,
+        "status": job.status,
+        "progress": {
+            "done": job.progress_done or 0,
+            "total": job.progress_total,
+            "unit": PROGRESS_UNITS.get(job.job_type)
+        },
+        "material_id": job.material_id,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
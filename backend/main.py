@@ -60,22 +60,190 @@ async def health_check():
 
 # ========== 素材管理接口 ==========
 
-from fastapi import Depends, HTTPException, UploadFile, File
+from fastapi import Depends, HTTPException, UploadFile, File, Response
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db, async_engine, run_with_session
 from schemas import MaterialCreate, MaterialResponse, ApiResponse, RefineRequest, TagCreate, TagUpdate, TagResponse, MaterialTagUpdate
 import crud
+import async_crud
 import os
 import uuid
-from pdf_service import extract_text_from_pdf, validate_pdf_file
+from pdf_service import validate_pdf_file, PDF_ENGINES
 from config import settings
 from ai_service import refine_content, get_default_prompts
-from image_service import process_url_for_images, cleanup_image_files
+from database import init_db
+from task_pools import run_in_pool, shutdown_pools
+from utils import parse_tag_list
+from models import Material, Topic
+import search_service
+import dedup_service
+import ingest_service
+import job_service
+import http_client
+
+@app.on_event("startup")
+async def startup():
+    """启动时初始化数据库（建表、迁移、全文索引）"""
+    init_db()
+    job_service.resume_jobs()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """关闭时释放异步数据库连接、后台线程池和 HTTP 连接池"""
+    await async_engine.dispose()
+    shutdown_pools(wait=False)
+    http_client.close_session()
+
+# ========== 列表字段投影 ==========
+# 列表接口只查询需要返回的列：素材预览和长度在写入时预先计算，
+# 避免把整段长文本读进内存
+# 每个字段对应: (需要查询的列, 从查询结果行生成返回值的函数)
+
+PREVIEW_LENGTH = crud.PREVIEW_LENGTH
+
+def _parse_json_tags(raw):
+    """解析 JSON 格式的标签字段"""
+    if not raw:
+        return []
+    try:
+        return json.loads(raw)
+    except Exception:
+        return []
+
+def _preview(row):
+    """生成内容预览（超出长度时追加省略号）"""
+    preview = row.content_preview or ""
+    if (row.content_length or 0) > PREVIEW_LENGTH:
+        return preview + "..."
+    return preview
+
+MATERIAL_LIST_FIELDS = {
+    "id": ([Material.id], lambda row: row.id),
+    "title": ([Material.title], lambda row: row.title or "无标题"),
+    "content": ([Material.content_preview, Material.content_length], _preview),
+    # 正文在 material_bodies 表，查询列表后由 attach_material_contents 批量补充
+    "content_full": ([], lambda row: None),
+    "content_length": ([Material.content_length], lambda row: row.content_length),
+    "source_type": ([Material.source_type], lambda row: row.source_type),
+    "file_name": ([Material.file_name], lambda row: row.file_name),
+    "tags": ([Material.tags], lambda row: _parse_json_tags(row.tags)),
+    # processing 表示 PDF 仍在逐页写入
+    "ingest_status": ([Material.ingest_status], lambda row: row.ingest_status),
+    "created_at": ([Material.created_at], lambda row: row.created_at.isoformat()),
+}
+
+RECYCLE_BIN_FIELDS = {
+    **MATERIAL_LIST_FIELDS,
+    "title": ([Material.title], lambda row: row.title),
+    "updated_at": ([Material.updated_at], lambda row: row.updated_at.isoformat() if row.updated_at else None),
+    "deleted_at": ([Material.deleted_at], lambda row: row.deleted_at.isoformat() if row.deleted_at else None),
+}
+
+TOPIC_LIST_FIELDS = {
+    "id": ([Topic.id], lambda row: row.id),
+    "material_id": ([Topic.material_id], lambda row: row.material_id),
+    "title": ([Topic.title], lambda row: row.title),
+    "refined_content": ([Topic.refined_content], lambda row: row.refined_content),
+    "prompt_name": ([Topic.prompt_name], lambda row: row.prompt_name),
+    "tags": ([Topic.tags], lambda row: _parse_json_tags(row.tags)),
+    "source_type": ([Topic.source_type], lambda row: row.source_type),
+    "created_at": ([Topic.created_at], lambda row: row.created_at.isoformat()),
+    "updated_at": ([Topic.updated_at], lambda row: row.updated_at.isoformat() if row.updated_at else None),
+    # 内容可能压缩存储，解压后截取
+    # （未压缩的内容不超过压缩阈值，压缩后的数据也很小，读取代价有限）
+    "content_preview": (
+        [Topic.refined_content],
+        lambda row: row.refined_content[:PREVIEW_LENGTH] + "..."
+        if len(row.refined_content) > PREVIEW_LENGTH else row.refined_content
+    ),
+}
+
+# 未指定 fields 时的默认字段：列表只返回预览，不返回正文，
+# 完整正文（content_full / refined_content）需在 fields 中显式指定，或从详情接口读取
+MATERIAL_LIST_DEFAULT_FIELDS = [name for name in MATERIAL_LIST_FIELDS if name != "content_full"]
+RECYCLE_BIN_DEFAULT_FIELDS = [name for name in RECYCLE_BIN_FIELDS if name != "content_full"]
+TOPIC_LIST_DEFAULT_FIELDS = [name for name in TOPIC_LIST_FIELDS if name != "refined_content"]
+
+def select_list_fields(fields: str, available: dict, default: list, required_columns: list):
+    """
+    解析 fields 参数（逗号分隔），确定要返回的字段和需要查询的列
+
+    参数:
+        fields (str): 请求的字段列表，为空时返回 default
+        available (dict): 可选字段定义
+        default (list): 默认返回的字段
+        required_columns (list): 无论是否返回都必须查询的列（如分页排序列）
+
+    返回:
+        tuple: (字段名列表, 查询列列表)
+    """
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else list(default)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"不支持的字段: {', '.join(unknown)}")
+    if "id" not in names:
+        names.insert(0, "id")
+
+    columns = {}
+    for column in required_columns:
+        columns[column.key] = column
+    for name in names:
+        for column in available[name][0]:
+            columns.setdefault(column.key, column)
+    return names, list(columns.values())
+
+def format_list_row(row, names: list, available: dict) -> dict:
+    """按字段定义格式化一行查询结果"""
+    return {name: available[name][1](row) for name in names}
+
+async def attach_material_contents(db: AsyncSession, items: list):
+    """为列表数据补充完整正文（一次查询读取本页所有素材的正文）"""
+    contents = await async_crud.get_material_contents(db, [item["id"] for item in items])
+    for item in items:
+        item["content_full"] = contents.get(item["id"], "")
+
+# ========== 素材去重 ==========
+# 写入前按内容哈希（PDF 另按文件哈希、URL 另按来源地址）查重，
+# 命中时直接返回已有素材，不再重复解析和入库
+# 近似重复（SimHash）的处理方式由 near_duplicate 参数决定（见 ingest_service），
+# reject 时返回 409
+
+def check_near_duplicate_mode(near_duplicate: str):
+    """校验 near_duplicate 参数"""
+    if near_duplicate not in ingest_service.NEAR_DUPLICATE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"near_duplicate 参数错误，可选值: {', '.join(ingest_service.NEAR_DUPLICATE_MODES)}"
+        )
+
+def duplicate_material_response(material: Material, duplicate_type: str = "exact"):
+    """
+    返回已存在素材的响应
+
+    已有素材在回收站中时不自动恢复（查重不应修改数据），返回 is_deleted=true，
+    需要时由调用方通过恢复接口恢复
+    """
+    logger.info(f"素材已存在: id={material.id}, type={duplicate_type}, is_deleted={material.is_deleted}")
+    return ApiResponse(
+        code=200,
+        message="素材已存在（在回收站中）" if material.is_deleted else "素材已存在",
+        data={
+            "id": material.id,
+            "title": material.title,
+            "source_type": material.source_type,
+            "content_length": material.content_length,
+            "duplicate": True,
+            "duplicate_type": duplicate_type,
+            "is_deleted": bool(material.is_deleted),
+            "created_at": material.created_at.isoformat()
+        }
+    )
 
 @app.post("/api/materials/text", response_model=ApiResponse)
 async def create_text_material(
     material: MaterialCreate,
-    db: Session = Depends(get_db)
+    near_duplicate: str = "allow"
 ):
     """
     创建文本素材
@@ -85,6 +253,8 @@ async def create_text_material(
     logger.info(f"创建文本素材: source={material.source_type}, content_length={len(material.content)}")
     
     try:
+        check_near_duplicate_mode(near_duplicate)
+        
         # 1. 验证内容不为空
         if not material.content or not material.content.strip():
             logger.warning("内容为空")
@@ -102,8 +272,15 @@ async def create_text_material(
             "source_type": material.source_type
         }
         
-        # 4. 保存到数据库
-        db_material = crud.create_material(db, material_data)
+        # 4. 保存到数据库（内容重复时返回已有素材；哈希、SimHash 和压缩在线程池中执行，不阻塞事件循环）
+        try:
+            db_material, duplicate = await run_in_pool(
+                "text", run_with_session, ingest_service.save_material, material_data, near_duplicate
+            )
+        except ingest_service.NearDuplicateError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if duplicate:
+            return duplicate_material_response(db_material, duplicate)
         
         logger.info(f"素材创建成功: id={db_material.id}")
         
@@ -115,7 +292,7 @@ async def create_text_material(
                 "id": db_material.id,
                 "title": db_material.title,
                 "source_type": db_material.source_type,
-                "content_length": len(db_material.content),
+                "content_length": db_material.content_length,
                 "created_at": db_material.created_at.isoformat()
             }
         )
@@ -133,75 +310,56 @@ async def get_materials_list(
     search: str = None,
     source_type: str = None,
     tag: str = None,
-    db: Session = Depends(get_db)
+    tag_mode: str = "any",
+    sort: str = "created_at",
+    cursor: str = None,
+    with_total: bool = True,
+    fields: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取素材列表
     
     支持分页、搜索、来源筛选、标签筛选
+    tag 可传多个标签（逗号分隔），tag_mode=all 时要求同时包含全部标签
+    sort=relevance 时按搜索相关度（BM25）排序
+    传入 cursor（上一页的 next_cursor）时使用游标分页，with_total=false 时不统计总数
+    fields 指定返回字段（逗号分隔），如 fields=id,title,content,tags；默认不返回完整正文 content_full
     """
-    logger.info(f"获取素材列表: page={page}, per_page={per_page}, search={search}, source_type={source_type}, tag={tag}")
+    logger.info(f"获取素材列表: page={page}, per_page={per_page}, search={search}, source_type={source_type}, tag={tag}, tag_mode={tag_mode}, sort={sort}, cursor={cursor}")
     
     try:
-        from models import Material
-        import json
-        
-        # 构建查询（只查询未删除的素材）
-        query = db.query(Material).filter(Material.is_deleted == 0)
-        
-        # 来源筛选
-        if source_type:
-            logger.info(f"按来源筛选: {source_type}")
-            query = query.filter(Material.source_type == source_type)
-        
-        # 标签筛选
-        if tag:
-            logger.info(f"按标签筛选: {tag}")
-            # 使用JSON函数查询tags字段中包含指定标签的素材
-            query = query.filter(Material.tags.like(f'%"{tag}"%'))
-        
-        # 搜索
-        if search:
-            logger.info(f"搜索关键词: {search}")
-            search_pattern = f"%{search}%"
-            query = query.filter(
-                (Material.title.like(search_pattern)) | 
-                (Material.content.like(search_pattern))
-            )
-        
-        # 按创建时间倒序排列
-        query = query.order_by(Material.created_at.desc())
+        # 只查询需要返回的列
+        field_names, columns = select_list_fields(
+            fields, MATERIAL_LIST_FIELDS, MATERIAL_LIST_DEFAULT_FIELDS,
+            [Material.id, Material.created_at]
+        )
         
-        # 统计总数
-        total = query.count()
+        # 按相关度排序时不支持游标分页
+        if sort == "relevance" and search and cursor and search_service.fts_available:
+            raise HTTPException(status_code=400, detail="按相关度排序时不支持游标分页")
         
-        # 分页
-        offset = (page - 1) * per_page
-        materials = query.offset(offset).limit(per_page).all()
+        # 查询未删除的素材（来源、标签筛选，全文搜索）并分页
+        try:
+            materials, total, next_cursor = await async_crud.list_materials(
+                db, columns,
+                source_type=source_type,
+                tag_names=parse_tag_list(tag),
+                match_all=(tag_mode == "all"),
+                search=search,
+                sort=sort,
+                page=page, per_page=per_page, cursor=cursor, with_total=with_total
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="分页游标格式错误")
         
         # 格式化返回数据
-        materials_data = []
-        for material in materials:
-            # 解析tags字段
-            tags = []
-            if material.tags:
-                try:
-                    import json
-                    tags = json.loads(material.tags)
-                except:
-                    tags = []
-            
-            materials_data.append({
-                "id": material.id,
-                "title": material.title or "无标题",
-                "content": material.content[:200] + "..." if len(material.content) > 200 else material.content,
-                "content_full": material.content,
-                "content_length": len(material.content),
-                "source_type": material.source_type,
-                "file_name": material.file_name,
-                "tags": tags,
-                "created_at": material.created_at.isoformat()
-            })
+        materials_data = [
+            format_list_row(material, field_names, MATERIAL_LIST_FIELDS)
+            for material in materials
+        ]
+        if "content_full" in field_names:
+            await attach_material_contents(db, materials_data)
         
         logger.info(f"查询成功: 共 {total} 条，返回 {len(materials_data)} 条")
         
@@ -213,26 +371,88 @@ async def get_materials_list(
                 "total": total,
                 "page": page,
                 "per_page": per_page,
-                "total_pages": (total + per_page - 1) // per_page
+                "total_pages": (total + per_page - 1) // per_page if total is not None else None,
+                "next_cursor": next_cursor
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取素材列表失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="服务器内部错误")
 
+@app.get("/api/materials/near-duplicates", response_model=ApiResponse)
+async def get_near_duplicate_materials(
+    max_distance: int = None,
+    cursor: int = None,
+    limit: int = 20
+):
+    """
+    分页获取近似重复的素材分组
+
+    按 SimHash 汉明距离分组，每组包含两条及以上内容近似的素材；
+    传入 cursor（上一页的 next_cursor）继续获取，next_cursor 为空表示已全部返回
+    """
+    logger.info(f"获取近似重复素材: max_distance={max_distance}, cursor={cursor}, limit={limit}")
+    
+    try:
+        if max_distance is not None and not 0 <= max_distance <= settings.NEAR_DUPLICATE_MAX_DISTANCE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"max_distance 取值范围为 0-{settings.NEAR_DUPLICATE_MAX_DISTANCE}"
+            )
+        if not 1 <= limit <= 100:
+            raise HTTPException(status_code=400, detail="limit 取值范围为 1-100")
+        
+        # 分组计算在线程池中用独立会话执行，不占用事件循环
+        clusters, next_cursor = await run_in_pool(
+            "text", run_with_session, crud.get_near_duplicate_clusters, max_distance, cursor, limit
+        )
+        
+        return ApiResponse(
+            code=200,
+            message="success",
+            data={
+                "clusters": [
+                    [
+                        {
+                            "id": material.id,
+                            "title": material.title or "无标题",
+                            "source_type": material.source_type,
+                            "content_length": material.content_length,
+                            "created_at": material.created_at.isoformat()
+                        }
+                        for material in cluster
+                    ]
+                    for cluster in clusters
+                ],
+                "total": len(clusters),
+                "next_cursor": next_cursor
+            }
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取近似重复素材失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="服务器内部错误")
+
 @app.get("/api/materials/{material_id}", response_model=ApiResponse)
 async def get_material(
     material_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取素材详情
+    
+    PDF 流式入库过程中 ingest_status 为 processing，content 为已写入的部分，
+    pages_done / pages_total 为解析进度
     """
     logger.info(f"获取素材详情: id={material_id}")
     
     try:
-        material = crud.get_material(db, material_id)
+        material = await async_crud.get_material(db, material_id, with_content=True)
         
         if not material:
             logger.warning(f"素材不存在: id={material_id}")
@@ -247,6 +467,9 @@ async def get_material(
                 "content": material.content,
                 "source_type": material.source_type,
                 "file_name": material.file_name,
+                "ingest_status": material.ingest_status,
+                "pages_done": material.pages_done,
+                "pages_total": material.pages_total,
                 "created_at": material.created_at.isoformat()
             }
         )
@@ -260,7 +483,7 @@ async def get_material(
 @app.delete("/api/materials/{material_id}", response_model=ApiResponse)
 async def delete_material(
     material_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     删除素材
@@ -268,12 +491,10 @@ async def delete_material(
     logger.info(f"删除素材: id={material_id}")
     
     try:
-        material = crud.get_material(db, material_id)
+        material = await async_crud.delete_material(db, material_id)
         if not material:
             raise HTTPException(status_code=404, detail="素材不存在")
         
-        crud.delete_material(db, material_id)
-        
         return ApiResponse(
             code=200,
             message="success",
@@ -286,76 +507,133 @@ async def delete_material(
         logger.error(f"删除素材失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="服务器内部错误")
 
+# ========== 文件上传 ==========
+
+async def save_upload_file(file: UploadFile, file_path: str, max_size: int) -> tuple:
+    """
+    分块把上传文件写入磁盘，边写边计算文件哈希
+
+    先写入 <file_path>.part，写完后原子重命名为 file_path，
+    超过 max_size 时立即中止；失败时删除临时文件。内存占用不超过一个分块
+
+    返回:
+        tuple: (文件大小, 文件哈希)
+    """
+    part_path = f"{file_path}.part"
+    hasher = dedup_service.file_hasher()
+    file_size = 0
+    try:
+        with open(part_path, "wb") as f:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > max_size:
+                    logger.warning(f"文件过大: 已超过 {max_size / (1024 * 1024):.0f} MB")
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"文件过大，最大支持 {max_size // (1024 * 1024)}MB"
+                    )
+                hasher.update(chunk)
+                f.write(chunk)
+        os.replace(part_path, file_path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return file_size, hasher.hexdigest()
+
 @app.post("/api/materials/pdf", response_model=ApiResponse)
 async def upload_pdf_material(
+    response: Response,
     file: UploadFile = File(...),
     source_type: str = "podcast",
     title: str = None,
-    db: Session = Depends(get_db)
+    near_duplicate: str = "allow",
+    async_mode: bool = False,
+    engine: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     上传 PDF 素材
     
     上传 PDF 文件，自动提取文本内容并保存
+    engine 指定提取引擎（pdfplumber / pdfium / auto），默认使用配置
+    async_mode=true 时保存文件后立即返回 202 和任务 id，在后台解析入库，
+    通过 /api/jobs/{job_id} 查询进度和结果
     """
-    logger.info(f"上传 PDF: filename={file.filename}, source={source_type}")
+    logger.info(f"上传 PDF: filename={file.filename}, source={source_type}, async_mode={async_mode}")
     
     try:
+        check_near_duplicate_mode(near_duplicate)
+        if engine is not None and engine not in PDF_ENGINES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"engine 参数错误，可选值: {', '.join(PDF_ENGINES)}"
+            )
+        
         # 1. 验证文件格式
         if not file.filename.lower().endswith('.pdf'):
             logger.warning(f"文件格式错误: {file.filename}")
             raise HTTPException(status_code=400, detail="仅支持 PDF 格式文件")
         
-        # 2. 读取文件内容并检查大小
-        file_content = await file.read()
-        file_size = len(file_content)
-        file_size_mb = file_size / (1024 * 1024)
-        
-        logger.info(f"文件大小: {file_size_mb:.2f} MB")
-        
-        if file_size_mb > settings.MAX_FILE_SIZE / (1024 * 1024):
-            logger.warning(f"文件过大: {file_size_mb:.2f} MB")
-            raise HTTPException(status_code=400, detail=f"文件过大，最大支持 50MB")
-        
-        # 3. 确保 uploads 目录存在
+        # 2. 确保 uploads 目录存在
         os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
         
-        # 4. 生成唯一文件名
+        # 3. 生成唯一文件名
         file_ext = os.path.splitext(file.filename)[1]
         unique_filename = f"{uuid.uuid4()}{file_ext}"
         file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
         
-        # 5. 保存文件
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        # 4. 分块保存文件（同时检查大小、计算文件哈希）
+        file_size, file_digest = await save_upload_file(file, file_path, settings.MAX_FILE_SIZE)
+        file_size_mb = file_size / (1024 * 1024)
         
-        logger.info(f"文件已保存: {file_path}")
+        logger.info(f"文件已保存: {file_path}, 大小: {file_size_mb:.2f} MB")
+        
+        # 5. 同一个文件已上传过时直接返回，跳过文本提取
+        existing = await async_crud.get_material_by_file_hash(db, file_digest)
+        if existing:
+            os.remove(file_path)
+            return duplicate_material_response(existing)
+        
+        # 6. 异步模式：创建后台任务后立即返回
+        if async_mode:
+            job = await async_crud.enqueue_job(db, "pdf", {
+                "file_path": file_path,
+                "file_name": file.filename,
+                "source_type": source_type,
+                "title": title,
+                "file_hash": file_digest,
+                "near_duplicate": near_duplicate,
+                "engine": engine
+            })
+            response.status_code = 202
+            return ApiResponse(
+                code=202,
+                message="PDF 已上传，正在后台解析",
+                data={"job_id": job.id, "status": job.status}
+            )
         
-        # 6. 提取 PDF 文本
+        # 7. 提取 PDF 文本并保存到数据库（解析、哈希和压缩都在线程池中执行）
         try:
-            extracted_text = extract_text_from_pdf(file_path)
-            word_count = len(extracted_text)
-            logger.info(f"PDF 文本提取成功: {word_count} 字")
-            
-        except Exception as e:
-            # 如果提取失败，删除上传的文件
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            logger.error(f"PDF 文本提取失败: {e}")
-            raise HTTPException(
-                status_code=400, 
-                detail=f"PDF 解析失败: {str(e)}。请确保上传的是文本版 PDF（非扫描版）"
+            db_material, duplicate = await run_in_pool(
+                "pdf", run_with_session, ingest_service.ingest_pdf,
+                file_path=file_path,
+                file_name=file.filename,
+                source_type=source_type,
+                title=title,
+                file_hash=file_digest,
+                near_duplicate=near_duplicate,
+                engine=engine
             )
-        
-        # 7. 保存到数据库
-        material_data = {
-            "title": title or file.filename,
-            "content": extracted_text,
-            "source_type": source_type,
-            "file_name": file.filename
-        }
-        
-        db_material = crud.create_material(db, material_data)
+        except ingest_service.IngestError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ingest_service.NearDuplicateError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if duplicate:
+            return duplicate_material_response(db_material, duplicate)
         
         logger.info(f"PDF 素材创建成功: id={db_material.id}")
         
@@ -368,7 +646,7 @@ async def upload_pdf_material(
                 "title": db_material.title,
                 "file_name": db_material.file_name,
                 "source_type": db_material.source_type,
-                "word_count": word_count,
+                "word_count": db_material.content_length,
                 "file_size_mb": round(file_size_mb, 2),
                 "created_at": db_material.created_at.isoformat()
             }
@@ -382,19 +660,26 @@ async def upload_pdf_material(
 
 @app.post("/api/materials/url", response_model=ApiResponse)
 async def create_url_material(
+    response: Response,
     url: str,
     source_type: str = None,
     title: str = None,
-    db: Session = Depends(get_db)
+    near_duplicate: str = "allow",
+    async_mode: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     通过URL创建素材
     
     支持从网页或图片URL提取文字内容
+    async_mode=true 时立即返回 202 和任务 id，在后台下载图片和识别文字，
+    通过 /api/jobs/{job_id} 查询进度和结果
     """
-    logger.info(f"处理URL素材: {url}")
+    logger.info(f"处理URL素材: {url}, async_mode={async_mode}")
     
     try:
+        check_near_duplicate_mode(near_duplicate)
+        
         # 1. 验证URL
         if not url or not url.strip():
             logger.warning("URL为空")
@@ -407,36 +692,45 @@ async def create_url_material(
             logger.warning(f"URL格式错误: {url}")
             raise HTTPException(status_code=400, detail="URL格式错误，必须以http://或https://开头")
         
-        # 3. 处理URL，提取图片和文字
-        try:
-            result = process_url_for_images(url)
-            logger.info(f"URL处理成功: 找到{len(result['images'])}个图片")
-            
-        except Exception as e:
-            logger.error(f"URL处理失败: {e}")
-            raise HTTPException(status_code=400, detail=f"处理URL失败: {str(e)}")
-        
-        # 4. 检查是否提取到文字
-        if not result['total_text'] or result['total_text'].strip() == "":
-            logger.warning("未提取到任何文字内容")
-            raise HTTPException(status_code=400, detail="未从图片中提取到文字内容")
-        
-        # 5. 准备数据
-        material_data = {
-            "title": title or f"来自{result['source_type']}的素材",
-            "content": result['total_text'],
-            "source_type": source_type or result['source_type']
-        }
+        # 同一个URL已处理过时直接返回，跳过下载和 OCR
+        existing = await async_crud.get_material_by_source_url(db, url)
+        if existing:
+            return duplicate_material_response(existing)
+        
+        # 3. 异步模式：创建后台任务后立即返回
+        if async_mode:
+            job = await async_crud.enqueue_job(db, "url", {
+                "url": url,
+                "source_type": source_type,
+                "title": title,
+                "near_duplicate": near_duplicate
+            })
+            response.status_code = 202
+            return ApiResponse(
+                code=202,
+                message="URL 已提交，正在后台处理",
+                data={"job_id": job.id, "status": job.status}
+            )
         
-        # 6. 保存到数据库
-        db_material = crud.create_material(db, material_data)
+        # 4. 处理URL，提取图片和文字，保存到数据库（在线程池中执行）
+        try:
+            db_material, duplicate, images_count = await run_in_pool(
+                "url", run_with_session, ingest_service.ingest_url,
+                url=url,
+                source_type=source_type,
+                title=title,
+                near_duplicate=near_duplicate
+            )
+        except ingest_service.IngestError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ingest_service.NearDuplicateError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if duplicate:
+            return duplicate_material_response(db_material, duplicate)
         
         logger.info(f"URL素材创建成功: id={db_material.id}")
         
-        # 7. 清理临时文件（可选，也可以保留用于后续处理）
-        # cleanup_image_files([img['file_path'] for img in result['images']])
-        
-        # 8. 返回成功响应
+        # 5. 返回成功响应
         return ApiResponse(
             code=200,
             message="URL素材创建成功",
@@ -444,8 +738,8 @@ async def create_url_material(
                 "id": db_material.id,
                 "title": db_material.title,
                 "source_type": db_material.source_type,
-                "content_length": len(db_material.content),
-                "images_count": len(result['images']),
+                "content_length": db_material.content_length,
+                "images_count": images_count,
                 "original_url": url,
                 "created_at": db_material.created_at.isoformat()
             }
@@ -457,12 +751,69 @@ async def create_url_material(
         logger.error(f"创建URL素材失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="服务器内部错误")
 
+# ========== 后台任务接口 ==========
+
+@app.get("/api/jobs/{job_id}", response_model=ApiResponse)
+async def get_job_status(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    查询后台任务状态
+    
+    返回任务状态（pending/running/succeeded/failed）、进度（PDF 为页数，URL 为图片数）、
+    生成的素材 id 和失败原因
+    """
+    logger.info(f"查询后台任务: id={job_id}")
+    
+    try:
+        job = await async_crud.get_job(db, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        
+        return ApiResponse(
+            code=200,
+            message="success",
+            data=job_service.format_job(job)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"查询后台任务失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="服务器内部错误")
+
+# ========== 运行指标接口 ==========
+
+@app.get("/api/metrics", response_model=ApiResponse)
+async def get_metrics(db: AsyncSession = Depends(get_async_db)):
+    """
+    获取运行指标
+    
+    extraction_cache: 提取缓存的条数、占用大小、命中率和命中字节数（命中统计为服务启动以来）
+    """
+    try:
+        return ApiResponse(
+            code=200,
+            message="success",
+            data={"extraction_cache": await async_crud.get_cache_stats(db)}
+        )
+        
+    except Exception as e:
+        logger.error(f"获取运行指标失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="服务器内部错误")
+
 # ========== AI 提炼接口 ==========
 
+def _refine_material(db: Session, material_id: int, prompt: str, model: str):
+    """读取素材正文并调用 AI 提炼（在线程池中执行，正文的读取和解压不占用事件循环）"""
+    content = crud.get_material_contents(db, [material_id]).get(material_id, "")
+    return refine_content(content=content, prompt=prompt, model=model, api_key=None)
+
 @app.post("/api/ai/refine", response_model=ApiResponse)
 async def refine_material(
     request: RefineRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     AI 提炼素材内容
@@ -472,8 +823,8 @@ async def refine_material(
     logger.info(f"AI 提炼: material_id={request.material_id}, prompt_id={request.prompt_id}, model={request.model}")
     
     try:
-        # 1. 获取素材
-        material = crud.get_material(db, request.material_id)
+        # 1. 获取素材（正文在提炼时读取）
+        material = await async_crud.get_material(db, request.material_id)
         if not material:
             logger.warning(f"素材不存在: id={request.material_id}")
             raise HTTPException(status_code=404, detail="素材不存在")
@@ -482,7 +833,7 @@ async def refine_material(
         prompts = []
         try:
             # 尝试从数据库配置获取提示词
-            config = crud.get_config(db, "default_prompts")
+            config = await async_crud.get_config(db, "default_prompts")
             if config and config.value:
                 prompts = json.loads(config.value)
                 logger.info(f"从数据库获取提示词: {len(prompts)} 个")
@@ -504,11 +855,9 @@ async def refine_material(
         
         # 3. 调用 AI 提炼
         try:
-            result = refine_content(
-                content=material.content,
-                prompt=prompt_obj['content'],
-                model=request.model,
-                api_key=None
+            result = await run_in_pool(
+                "ai", run_with_session, _refine_material,
+                request.material_id, prompt_obj['content'], request.model
             )
             
             logger.info(f"AI 提炼成功: tokens={result['tokens_used']}, cost=${result['cost_usd']}")
@@ -516,8 +865,8 @@ async def refine_material(
             # 4. 记录使用统计
             try:
                 from datetime import datetime
-                crud.create_or_update_usage_stats(
-                    db=db,
+                await async_crud.create_or_update_usage_stats(
+                    db,
                     date=datetime.now().strftime('%Y-%m-%d'),
                     model=result['model_used'],
                     requests=1,
@@ -601,7 +950,7 @@ async def get_prompts(db: Session = Depends(get_db)):
 
 @app.post("/api/ai/discover-topics", response_model=ApiResponse)
 async def discover_topics(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     发现选题灵感 - 分析素材库内容并推荐选题
@@ -609,9 +958,9 @@ async def discover_topics(
     logger.info("开始发现选题灵感")
     
     try:
-        # 获取所有素材
-        materials = crud.get_all_materials(db)
-        if not materials:
+        # 获取所有素材的标题和正文开头（不加载整篇正文，在线程池中查询，不阻塞事件循环）
+        excerpts = await run_in_pool("text", run_with_session, crud.get_material_excerpts, 500)
+        if not excerpts:
             return ApiResponse(
                 code=200,
                 message="success",
@@ -620,8 +969,8 @@ async def discover_topics(
         
         # 提取素材内容进行分析
         all_content = []
-        for material in materials:
-            content = f"标题: {material.title}\n内容: {material.content[:500]}"
+        for title, excerpt in excerpts:
+            content = f"标题: {title}\n内容: {excerpt}"
             all_content.append(content)
         
         combined_content = "\n\n".join(all_content)
@@ -632,7 +981,7 @@ async def discover_topics(
         # 尝试获取自定义选题提示词
         custom_prompt = None
         try:
-            config = crud.get_config(db, "topic_inspiration_prompt")
+            config = await async_crud.get_config(db, "topic_inspiration_prompt")
             if config and config.value:
                 custom_prompt = config.value
                 logger.info("使用自定义选题提示词")
@@ -775,14 +1124,14 @@ async def delete_prompt(
 # ========== 标签管理接口 ==========
 
 @app.get("/api/tags", response_model=ApiResponse)
-async def get_tags(db: Session = Depends(get_db)):
+async def get_tags(db: AsyncSession = Depends(get_async_db)):
     """
     获取所有标签
     """
     logger.info("获取标签列表")
     
     try:
-        tags = crud.get_all_tags(db)
+        tags = await async_crud.get_all_tags(db)
         tag_list = []
         
         for tag in tags:
@@ -808,7 +1157,7 @@ async def get_tags(db: Session = Depends(get_db)):
 @app.post("/api/tags", response_model=ApiResponse)
 async def create_tag(
     tag_data: TagCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建新标签
@@ -817,7 +1166,7 @@ async def create_tag(
     
     try:
         # 检查标签是否已存在
-        existing_tag = crud.get_tag_by_name(db, tag_data.name)
+        existing_tag = await async_crud.get_tag_by_name(db, tag_data.name)
         if existing_tag:
             return ApiResponse(
                 code=400,
@@ -826,7 +1175,7 @@ async def create_tag(
             )
         
         # 创建新标签
-        tag = crud.create_tag(db, tag_data.name, tag_data.color)
+        tag = await async_crud.create_tag(db, tag_data.name, tag_data.color)
         
         return ApiResponse(
             code=200,
@@ -848,7 +1197,7 @@ async def create_tag(
 @app.put("/api/materials/tags", response_model=ApiResponse)
 async def update_material_tags(
     update_data: MaterialTagUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     批量更新素材标签
@@ -860,15 +1209,14 @@ async def update_material_tags(
         
         # 更新每个素材的标签
         for material_id in update_data.material_ids:
-            material = crud.get_material(db, material_id)
+            material = await async_crud.get_material(db, material_id)
             if material:
-                # 更新素材标签
-                material.tags = json.dumps(update_data.tags, ensure_ascii=False)
-                db.commit()
+                # 更新素材标签（同时维护关联表）
+                await async_crud.update_material_tags(db, material, update_data.tags)
                 
                 # 更新标签使用次数
                 for tag_name in update_data.tags:
-                    crud.update_tag_usage_count(db, tag_name)
+                    await async_crud.update_tag_usage_count(db, tag_name)
         
         return ApiResponse(
             code=200,
@@ -898,7 +1246,7 @@ class TopicCreate(BaseModel):
 @app.post("/api/topics", response_model=ApiResponse)
 async def create_topic(
     topic: TopicCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建选题
@@ -928,7 +1276,7 @@ async def create_topic(
             raise HTTPException(status_code=400, detail="至少需要一个标签")
         
         # 4. 验证素材是否存在
-        material = crud.get_material(db, topic.material_id)
+        material = await async_crud.get_material(db, topic.material_id)
         if not material:
             logger.warning(f"素材不存在: id={topic.material_id}")
             raise HTTPException(status_code=404, detail="关联的素材不存在")
@@ -946,7 +1294,7 @@ async def create_topic(
         }
         
         # 6. 保存到数据库
-        db_topic = crud.create_topic(db, topic_data)
+        db_topic = await async_crud.create_topic(db, topic_data)
         
         logger.info(f"选题创建成功: id={db_topic.id}")
         
@@ -971,7 +1319,7 @@ async def create_topic(
 @app.get("/api/topics/{topic_id}", response_model=ApiResponse)
 async def get_topic_detail(
     topic_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取选题详情
@@ -981,17 +1329,15 @@ async def get_topic_detail(
     logger.info(f"获取选题详情: id={topic_id}")
     
     try:
-        from models import Topic
-        
         # 查询选题
-        topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        topic = await async_crud.get_topic(db, topic_id)
         
         if not topic:
             logger.warning(f"选题不存在: id={topic_id}")
             raise HTTPException(status_code=404, detail="选题不存在")
         
         # 查询关联的素材
-        material = crud.get_material(db, topic.material_id)
+        material = await async_crud.get_material(db, topic.material_id, with_content=True)
         
         # 格式化返回数据
         topic_data = {
@@ -1032,7 +1378,7 @@ async def get_topic_detail(
 async def update_topic(
     topic_id: int,
     topic: TopicCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     更新选题
@@ -1042,10 +1388,8 @@ async def update_topic(
     logger.info(f"更新选题: id={topic_id}, title={topic.title}")
     
     try:
-        from models import Topic
-        
         # 1. 查询选题是否存在
-        db_topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        db_topic = await async_crud.get_topic(db, topic_id)
         
         if not db_topic:
             logger.warning(f"选题不存在: id={topic_id}")
@@ -1070,15 +1414,13 @@ async def update_topic(
             logger.warning("标签为空")
             raise HTTPException(status_code=400, detail="至少需要一个标签")
         
-        # 5. 更新数据
-        db_topic.title = topic.title.strip()
-        db_topic.refined_content = topic.refined_content.strip()
-        db_topic.tags = json.dumps(topic.tags, ensure_ascii=False)
-        db_topic.prompt_name = topic.prompt_name
-        
-        # 更新时间会自动更新（onupdate）
-        db.commit()
-        db.refresh(db_topic)
+        # 5. 更新数据（更新时间会自动更新（onupdate））
+        db_topic = await async_crud.update_topic(db, db_topic, {
+            "title": topic.title.strip(),
+            "refined_content": topic.refined_content.strip(),
+            "tags": json.dumps(topic.tags, ensure_ascii=False),
+            "prompt_name": topic.prompt_name
+        })
         
         logger.info(f"选题更新成功: id={topic_id}")
         
@@ -1098,13 +1440,13 @@ async def update_topic(
         raise
     except Exception as e:
         logger.error(f"更新选题失败: {e}", exc_info=True)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="服务器内部错误")
 
 @app.delete("/api/topics/{topic_id}", response_model=ApiResponse)
 async def delete_topic(
     topic_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     删除选题
@@ -1114,18 +1456,15 @@ async def delete_topic(
     logger.info(f"删除选题: id={topic_id}")
     
     try:
-        from models import Topic
-        
         # 1. 查询选题是否存在
-        db_topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        db_topic = await async_crud.get_topic(db, topic_id)
         
         if not db_topic:
             logger.warning(f"选题不存在: id={topic_id}")
             raise HTTPException(status_code=404, detail="选题不存在")
         
         # 2. 删除选题
-        db.delete(db_topic)
-        db.commit()
+        await async_crud.delete_topic(db, db_topic)
         
         logger.info(f"选题删除成功: id={topic_id}")
         
@@ -1139,7 +1478,7 @@ async def delete_topic(
         raise
     except Exception as e:
         logger.error(f"删除选题失败: {e}", exc_info=True)
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="服务器内部错误")
 
 @app.get("/api/topics", response_model=ApiResponse)
@@ -1147,60 +1486,54 @@ async def get_topics(
     page: int = 1,
     per_page: int = 20,
     tags: str = None,
+    tag_mode: str = "any",
     search: str = None,
-    db: Session = Depends(get_db)
+    sort: str = "created_at",
+    cursor: str = None,
+    with_total: bool = True,
+    fields: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取选题列表
     
     支持分页、标签筛选、关键词搜索
+    tags 可传多个标签（逗号分隔），tag_mode=all 时要求同时包含全部标签
+    sort=relevance 时按搜索相关度（BM25）排序
+    传入 cursor（上一页的 next_cursor）时使用游标分页，with_total=false 时不统计总数
+    fields 指定返回字段（逗号分隔），默认返回 content_preview，完整内容需指定 refined_content
     """
-    logger.info(f"获取选题列表: page={page}, per_page={per_page}, tags={tags}, search={search}")
+    logger.info(f"获取选题列表: page={page}, per_page={per_page}, tags={tags}, tag_mode={tag_mode}, search={search}, sort={sort}, cursor={cursor}")
     
     try:
-        from models import Topic
-        
-        # 构建查询
-        query = db.query(Topic)
-        
-        # 标签筛选
-        if tags:
-            logger.info(f"按标签筛选: {tags}")
-            query = query.filter(Topic.tags.contains(tags))
-        
-        # 搜索
-        if search:
-            logger.info(f"搜索关键词: {search}")
-            search_pattern = f"%{search}%"
-            query = query.filter(
-                (Topic.title.like(search_pattern)) | 
-                (Topic.refined_content.like(search_pattern))
-            )
-        
-        # 按创建时间倒序排列
-        query = query.order_by(Topic.created_at.desc())
+        # 只查询需要返回的列
+        field_names, columns = select_list_fields(
+            fields, TOPIC_LIST_FIELDS, TOPIC_LIST_DEFAULT_FIELDS,
+            [Topic.id, Topic.created_at]
+        )
         
-        # 统计总数
-        total = query.count()
+        # 按相关度排序时不支持游标分页
+        if sort == "relevance" and search and cursor and search_service.fts_available:
+            raise HTTPException(status_code=400, detail="按相关度排序时不支持游标分页")
         
-        # 分页
-        offset = (page - 1) * per_page
-        topics = query.offset(offset).limit(per_page).all()
+        # 查询选题（标签筛选，全文搜索）并分页
+        try:
+            topics, total, next_cursor = await async_crud.list_topics(
+                db, columns,
+                tag_names=parse_tag_list(tags),
+                match_all=(tag_mode == "all"),
+                search=search,
+                sort=sort,
+                page=page, per_page=per_page, cursor=cursor, with_total=with_total
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="分页游标格式错误")
         
         # 格式化返回数据
-        topics_data = []
-        for topic in topics:
-            topics_data.append({
-                "id": topic.id,
-                "material_id": topic.material_id,
-                "title": topic.title,
-                "refined_content": topic.refined_content,
-                "prompt_name": topic.prompt_name,
-                "tags": json.loads(topic.tags) if topic.tags else [],
-                "source_type": topic.source_type,
-                "created_at": topic.created_at.isoformat(),
-                "updated_at": topic.updated_at.isoformat() if topic.updated_at else None
-            })
+        topics_data = [
+            format_list_row(topic, field_names, TOPIC_LIST_FIELDS)
+            for topic in topics
+        ]
         
         logger.info(f"查询成功: 共 {total} 条，返回 {len(topics_data)} 条")
         
@@ -1212,10 +1545,13 @@ async def get_topics(
                 "total": total,
                 "page": page,
                 "per_page": per_page,
-                "total_pages": (total + per_page - 1) // per_page
+                "total_pages": (total + per_page - 1) // per_page if total is not None else None,
+                "next_cursor": next_cursor
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取选题列表失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="服务器内部错误")
@@ -1373,54 +1709,42 @@ async def record_usage_stats(
 async def get_recycle_bin_materials(
     page: int = 1,
     per_page: int = 20,
-    db: Session = Depends(get_db)
+    cursor: str = None,
+    with_total: bool = True,
+    fields: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取回收站中的素材
+    
+    传入 cursor（上一页的 next_cursor）时使用游标分页，with_total=false 时不统计总数
+    fields 指定返回字段（逗号分隔），默认不返回完整正文 content_full
     """
-    logger.info(f"获取回收站素材: page={page}, per_page={per_page}")
+    logger.info(f"获取回收站素材: page={page}, per_page={per_page}, cursor={cursor}")
     
     try:
-        from models import Material
-        import json
-        
-        # 查询已删除的素材
-        query = db.query(Material).filter(Material.is_deleted == 1)
-        
-        # 按删除时间倒序排列
-        query = query.order_by(Material.deleted_at.desc())
-        
-        # 统计总数
-        total = query.count()
+        # 只查询需要返回的列
+        field_names, columns = select_list_fields(
+            fields, RECYCLE_BIN_FIELDS, RECYCLE_BIN_DEFAULT_FIELDS,
+            [Material.id, Material.deleted_at]
+        )
         
-        # 分页
-        offset = (page - 1) * per_page
-        materials = query.offset(offset).limit(per_page).all()
+        # 查询已删除的素材，按删除时间倒序排列并分页
+        try:
+            materials, total, next_cursor = await async_crud.list_deleted_materials(
+                db, columns,
+                page=page, per_page=per_page, cursor=cursor, with_total=with_total
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="分页游标格式错误")
         
         # 格式化返回数据
-        materials_data = []
-        for material in materials:
-            # 解析tags字段
-            tags = []
-            if material.tags:
-                try:
-                    tags = json.loads(material.tags)
-                except:
-                    tags = []
-            
-            materials_data.append({
-                "id": material.id,
-                "title": material.title,
-                "content": material.content[:200] + "..." if len(material.content) > 200 else material.content,
-                "content_full": material.content_full or material.content,
-                "content_length": material.content_length or len(material.content),
-                "source_type": material.source_type,
-                "file_name": material.file_name,
-                "tags": tags,
-                "created_at": material.created_at.isoformat(),
-                "updated_at": material.updated_at.isoformat() if material.updated_at else None,
-                "deleted_at": material.deleted_at.isoformat() if material.deleted_at else None
-            })
+        materials_data = [
+            format_list_row(material, field_names, RECYCLE_BIN_FIELDS)
+            for material in materials
+        ]
+        if "content_full" in field_names:
+            await attach_material_contents(db, materials_data)
         
         logger.info(f"回收站查询成功: 共 {total} 条，返回 {len(materials_data)} 条")
         
@@ -1431,10 +1755,13 @@ async def get_recycle_bin_materials(
                 "materials": materials_data,
                 "total": total,
                 "page": page,
-                "per_page": per_page
+                "per_page": per_page,
+                "next_cursor": next_cursor
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取回收站素材失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="服务器内部错误")
@@ -1442,7 +1769,7 @@ async def get_recycle_bin_materials(
 @app.post("/api/materials/{material_id}/restore", response_model=ApiResponse)
 async def restore_material(
     material_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     恢复素材
@@ -1450,7 +1777,7 @@ async def restore_material(
     logger.info(f"恢复素材: id={material_id}")
     
     try:
-        material = crud.restore_material(db, material_id)
+        material = await async_crud.restore_material(db, material_id)
         if material:
             return ApiResponse(
                 code=200,
@@ -1468,8 +1795,7 @@ async def restore_material(
 
 @app.delete("/api/materials/{material_id}/permanent", response_model=ApiResponse)
 async def permanent_delete_material(
-    material_id: int,
-    db: Session = Depends(get_db)
+    material_id: int
 ):
     """
     永久删除素材
@@ -1477,7 +1803,8 @@ async def permanent_delete_material(
     logger.info(f"永久删除素材: id={material_id}")
     
     try:
-        material = crud.permanent_delete_material(db, material_id)
+        # 删除时会级联删除正文分块并更新全文索引，在线程池中执行
+        material = await run_in_pool("text", run_with_session, crud.permanent_delete_material, material_id)
         if material:
             return ApiResponse(
                 code=200,
@@ -0,0 +1,386 @@
+"""
+文件名: migrations.py
+作用: 数据库结构升级（对已有数据库执行幂等的迁移步骤）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import logging
+import json
+from sqlalchemy import text
+from compression import decompress_text
+
+logger = logging.getLogger(__name__)
+
+def _table_columns(connection, table_name: str) -> set:
+    """获取表的列名集合"""
+    return {row[1] for row in connection.execute(text(f"PRAGMA table_info({table_name})"))}
+
+def _add_column(connection, table_name: str, column_name: str, column_type: str):
+    """为已有表添加列（列已存在时跳过）"""
+    if column_name in _table_columns(connection, table_name):
+        return False
+    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+    logger.info(f"已添加列: {table_name}.{column_name}")
+    return True
+
+def _database_size(connection) -> int:
+    """数据库已使用的字节数（不含空闲页，删除数据后不执行 VACUUM 文件大小不会变小）"""
+    page_size = connection.execute(text("PRAGMA page_size")).scalar()
+    page_count = connection.execute(text("PRAGMA page_count")).scalar()
+    freelist_count = connection.execute(text("PRAGMA freelist_count")).scalar()
+    return (page_count - freelist_count) * page_size
+
+def _format_mb(size: int) -> str:
+    """字节数格式化为 MB"""
+    return f"{size / 1024 / 1024:.2f} MB"
+
+def _ready_condition(connection) -> str:
+    """
+    排除正在流式入库的素材的查询条件
+
+    这类素材的正文还不完整，哈希和指纹在入库完成时计算，回填时必须跳过
+    （ingest_status 列在较新的迁移步骤中添加，旧数据库中不存在）
+    """
+    if "ingest_status" in _table_columns(connection, "materials"):
+        return " AND ingest_status = 'ready'"
+    return ""
+
+def migrate_material_bodies(connection):
+    """
+    把素材正文从 materials 表迁移到 material_bodies 表
+
+    迁移后 materials 表只保留元数据列，扫描列表时不再读取正文所在的溢出页
+    （DROP COLUMN 需要 SQLite >= 3.35；执行后可手动 VACUUM 回收磁盘空间）
+    """
+    columns = _table_columns(connection, "materials")
+    if "content" not in columns:
+        return
+
+    result = connection.execute(text(
+        "INSERT OR IGNORE INTO material_bodies (material_id, chunk_index, content) "
+        "SELECT id, 0, content FROM materials"
+    ))
+    logger.info(f"素材正文迁移到 material_bodies: {result.rowcount} 条")
+
+    connection.execute(text("ALTER TABLE materials DROP COLUMN content"))
+    if "content_full" in columns:
+        connection.execute(text("ALTER TABLE materials DROP COLUMN content_full"))
+    logger.info("materials 表已移除正文列")
+
+def migrate_search_index(connection):
+    """
+    创建全文索引表并构建索引
+
+    索引表是以视图为内容来源的外部内容表，视图依赖 materials.fts_chunks，先添加该列；
+    旧版本自带明文副本的索引表在这里重建，并输出重建前后的数据库大小
+    """
+    from search_service import init_search_index
+
+    _add_column(connection, "materials", "fts_chunks", "INTEGER")
+    size_before = _database_size(connection)
+    init_search_index(connection)
+    size_after = _database_size(connection)
+    if size_after != size_before:
+        logger.info(f"全文索引更新后数据库大小: {_format_mb(size_before)} -> {_format_mb(size_after)}")
+
+def _backfill_tag_links(connection, owner_table: str, link_table: str, owner_column: str):
+    """把某张表 JSON 格式的 tags 字段回填到关联表（只关联已创建的标签，不自动创建标签）"""
+    if connection.execute(text(f"SELECT 1 FROM {link_table} LIMIT 1")).first():
+        return
+
+    rows = connection.execute(text(
+        f"SELECT id, tags FROM {owner_table} WHERE tags IS NOT NULL AND tags != '' AND tags != '[]'"
+    )).fetchall()
+    if not rows:
+        return
+
+    tag_ids = {
+        name: tag_id for tag_id, name in connection.execute(text("SELECT id, name FROM tags"))
+    }
+    links = 0
+    for owner_id, tags_json in rows:
+        try:
+            names = json.loads(tags_json)
+        except (TypeError, ValueError):
+            logger.warning(f"{owner_table} id={owner_id} 的标签不是合法 JSON，跳过")
+            continue
+        for name in names:
+            if not isinstance(name, str) or not name.strip():
+                continue
+            name = name.strip()
+            if name not in tag_ids:
+                continue
+            connection.execute(
+                text(f"INSERT OR IGNORE INTO {link_table} ({owner_column}, tag_id) VALUES (:owner_id, :tag_id)"),
+                {"owner_id": owner_id, "tag_id": tag_ids[name]}
+            )
+            links += 1
+    logger.info(f"{link_table} 回填完成: {links} 条关联")
+
+def migrate_tag_links(connection):
+    """回填素材/选题-标签关联表"""
+    _backfill_tag_links(connection, "materials", "material_tags", "material_id")
+    _backfill_tag_links(connection, "topics", "topic_tags", "topic_id")
+
+def migrate_material_preview(connection):
+    """
+    添加 content_preview 列，并回填内容长度和预览
+
+    需要回填的只有压缩功能之前的旧素材：它们的正文由 migrate_material_bodies 原样复制为文本；
+    之后写入的素材在写入时就带有长度和预览，存量压缩（compress_existing_rows）也只在全部迁移执行后运行。
+    length() / substr() 仍通过 decompress_text 读取正文，即使遇到压缩过的行也按原文计算
+    """
+    from crud import PREVIEW_LENGTH
+
+    _add_column(connection, "materials", "content_preview", "VARCHAR(200)")
+    result = connection.execute(text(
+        "UPDATE materials SET "
+        "content_length = (SELECT sum(length(decompress_text(content))) FROM material_bodies "
+        "WHERE material_id = materials.id), "
+        "content_preview = (SELECT substr(decompress_text(content), 1, :preview_length) FROM material_bodies "
+        "WHERE material_id = materials.id AND chunk_index = 0) "
+        "WHERE content_length IS NULL OR content_preview IS NULL"
+    ), {"preview_length": PREVIEW_LENGTH})
+    if result.rowcount:
+        logger.info(f"回填素材预览: {result.rowcount} 条")
+
+def migrate_material_hashes(connection):
+    """
+    添加去重相关的列，回填内容哈希并创建唯一索引
+
+    历史数据中已存在的重复内容只有最早的一条保留哈希，其余留空
+    """
+    from dedup_service import content_hash
+
+    _add_column(connection, "materials", "source_url", "VARCHAR(500)")
+    _add_column(connection, "materials", "content_hash", "VARCHAR(64)")
+    _add_column(connection, "materials", "file_hash", "VARCHAR(64)")
+
+    seen = {row[0] for row in connection.execute(text(
+        "SELECT content_hash FROM materials WHERE content_hash IS NOT NULL"
+    ))}
+    pending = connection.execute(text(
+        f"SELECT id FROM materials WHERE content_hash IS NULL{_ready_condition(connection)} ORDER BY id"
+    )).fetchall()
+    duplicates = 0
+    for (material_id,) in pending:
+        chunks = connection.execute(text(
+            "SELECT content FROM material_bodies WHERE material_id = :id ORDER BY chunk_index"
+        ), {"id": material_id})
+        digest = content_hash("".join(decompress_text(row[0]) for row in chunks))
+        if digest in seen:
+            duplicates += 1
+            continue
+        seen.add(digest)
+        connection.execute(
+            text("UPDATE materials SET content_hash = :digest WHERE id = :id"),
+            {"digest": digest, "id": material_id}
+        )
+    if pending:
+        logger.info(f"回填内容哈希: {len(pending)} 条，其中历史重复 {duplicates} 条")
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_materials_content_hash ON materials (content_hash)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_materials_file_hash ON materials (file_hash)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_materials_source_url ON materials (source_url)"
+    ))
+
+def migrate_material_simhash(connection):
+    """添加 simhash 列，为历史素材计算指纹并写入分段索引表"""
+    from dedup_service import simhash, simhash_bands
+
+    _add_column(connection, "materials", "simhash", "INTEGER")
+    pending = connection.execute(text(
+        f"SELECT id FROM materials WHERE simhash IS NULL{_ready_condition(connection)} ORDER BY id"
+    )).fetchall()
+    for (material_id,) in pending:
+        chunks = connection.execute(text(
+            "SELECT content FROM material_bodies WHERE material_id = :id ORDER BY chunk_index"
+        ), {"id": material_id})
+        fingerprint = simhash("".join(decompress_text(row[0]) for row in chunks))
+        connection.execute(
+            text("UPDATE materials SET simhash = :fingerprint WHERE id = :id"),
+            {"fingerprint": fingerprint, "id": material_id}
+        )
+        connection.execute(
+            text("DELETE FROM material_simhash_bands WHERE material_id = :id"),
+            {"id": material_id}
+        )
+        connection.execute(
+            text("INSERT INTO material_simhash_bands (material_id, band, value) VALUES (:id, :band, :value)"),
+            [{"id": material_id, "band": band, "value": value} for band, value in simhash_bands(fingerprint)]
+        )
+    if pending:
+        logger.info(f"回填 SimHash 指纹: {len(pending)} 条")
+
+def _merge_usage_stats(connection):
+    """合并 (date, model) 重复的使用统计记录，保留 id 最小的一条"""
+    groups = connection.execute(text(
+        "SELECT date, model FROM usage_stats GROUP BY date, model HAVING count(*) > 1"
+    )).fetchall()
+    for date, model in groups:
+        rows = connection.execute(text(
+            "SELECT id, requests, tokens, cost FROM usage_stats "
+            "WHERE date = :date AND model = :model ORDER BY id"
+        ), {"date": date, "model": model}).fetchall()
+        keep_id = rows[0][0]
+        connection.execute(text(
+            "UPDATE usage_stats SET requests = :requests, tokens = :tokens, cost = :cost WHERE id = :id"
+        ), {
+            "requests": sum(row[1] or 0 for row in rows),
+            "tokens": sum(row[2] or 0 for row in rows),
+            "cost": str(sum(float(row[3] or 0) for row in rows)),
+            "id": keep_id
+        })
+        connection.execute(text(
+            "DELETE FROM usage_stats WHERE date = :date AND model = :model AND id != :id"
+        ), {"date": date, "model": model, "id": keep_id})
+    if groups:
+        logger.info(f"合并重复的使用统计: {len(groups)} 组")
+
+def migrate_query_indexes(connection):
+    """为已有数据库创建模型中声明的索引（列表查询用的组合索引等）"""
+    from models import Base
+
+    # 唯一索引创建前先合并历史重复数据
+    _merge_usage_stats(connection)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def migrate_material_ingest_status(connection):
+    """添加流式入库相关的列（已有素材均为已完成状态）"""
+    _add_column(connection, "materials", "ingest_status", "VARCHAR(20) NOT NULL DEFAULT 'ready'")
+    _add_column(connection, "materials", "pages_done", "INTEGER")
+    _add_column(connection, "materials", "pages_total", "INTEGER")
+
+def migrate_job_lease(connection):
+    """添加任务租约相关的列（多个工作进程时据此判断任务是否仍在执行）"""
+    _add_column(connection, "jobs", "worker_id", "VARCHAR(64)")
+    _add_column(connection, "jobs", "heartbeat_at", "DATETIME")
+
+# 迁移步骤按顺序执行，每一步都必须可以重复执行
+MIGRATIONS = [
+    migrate_material_bodies,
+    migrate_search_index,
+    migrate_tag_links,
+    migrate_material_preview,
+    migrate_material_hashes,
+    migrate_material_simhash,
+    migrate_query_indexes,
+    migrate_material_ingest_status,
+    migrate_job_lease,
+]
+
+def run_migrations(engine):
+    """依次执行所有迁移步骤"""
+    logger.info("开始执行数据库迁移")
+    for step in MIGRATIONS:
+        with engine.begin() as connection:
+            logger.info(f"迁移步骤: {step.__name__}")
+            step(connection)
+    logger.info("数据库迁移完成")
+
+# ========== 存量数据压缩 ==========
+
+# 需要压缩的列: (表名, 分批遍历用的键, 文本列)
+COMPRESSIBLE_COLUMNS = [
+    ("material_bodies", "rowid", "content"),
+    ("topics", "id", "refined_content"),
+]
+
+def compress_existing_rows(engine, batch_size: int = 500):
+    """
+    分批压缩已有的长文本（每批一个事务，可随时中断后重新执行）
+
+    参数:
+        engine: 数据库引擎
+        batch_size (int): 每批处理的行数
+
+    返回:
+        dict: {表名: {'rows': 压缩行数, 'bytes_before': 压缩前字节, 'bytes_after': 压缩后字节}}，
+              另有 'database': {'bytes_before': 压缩前数据库大小, 'bytes_after': 压缩后数据库大小}
+              （数据库大小按已使用的页计算，包含全文索引等全部表，是实际节省的空间）
+    """
+    from compression import compress_text
+    from config import settings
+
+    with engine.connect() as connection:
+        database_before = _database_size(connection)
+
+    report = {}
+    for table_name, key_column, column_name in COMPRESSIBLE_COLUMNS:
+        stats = {"rows": 0, "bytes_before": 0, "bytes_after": 0}
+        last_key = 0
+        while True:
+            with engine.begin() as connection:
+                rows = connection.execute(text(
+                    f"SELECT {key_column}, {column_name} FROM {table_name} "
+                    f"WHERE {key_column} > :last_key AND typeof({column_name}) = 'text' "
+                    f"AND length(CAST({column_name} AS BLOB)) >= :min_bytes "
+                    f"ORDER BY {key_column} LIMIT :batch_size"
+                ), {
+                    "last_key": last_key,
+                    "min_bytes": settings.COMPRESSION_MIN_BYTES,
+                    "batch_size": batch_size
+                }).fetchall()
+                if not rows:
+                    break
+
+                for key, value in rows:
+                    compressed = compress_text(value)
+                    if not isinstance(compressed, bytes):
+                        continue
+                    connection.execute(
+                        text(f"UPDATE {table_name} SET {column_name} = :value WHERE {key_column} = :key"),
+                        {"value": compressed, "key": key}
+                    )
+                    stats["rows"] += 1
+                    stats["bytes_before"] += len(value.encode("utf-8"))
+                    stats["bytes_after"] += len(compressed)
+                last_key = rows[-1][0]
+            logger.info(f"{table_name}: 已压缩 {stats['rows']} 行")
+        report[table_name] = stats
+
+    with engine.connect() as connection:
+        database_after = _database_size(connection)
+
+    # 输出统计报告
+    for table_name, stats in report.items():
+        saved = stats["bytes_before"] - stats["bytes_after"]
+        ratio = stats["bytes_after"] / stats["bytes_before"] if stats["bytes_before"] else 1
+        logger.info(
+            f"{table_name}: 压缩 {stats['rows']} 行, "
+            f"{stats['bytes_before'] / 1024 / 1024:.2f} MB -> {stats['bytes_after'] / 1024 / 1024:.2f} MB, "
+            f"节省 {saved / 1024 / 1024:.2f} MB（压缩率 {ratio:.1%}）"
+        )
+    logger.info(
+        f"数据库大小（已使用的页）: {_format_mb(database_before)} -> {_format_mb(database_after)}, "
+        f"节省 {_format_mb(database_before - database_after)}"
+    )
+    report["database"] = {"bytes_before": database_before, "bytes_after": database_after}
+    logger.info("压缩完成，可执行 VACUUM 回收磁盘空间")
+    return report
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # 用法:
+    #   python migrations.py                    执行所有迁移
+    #   python migrations.py compress [批大小]   压缩已有的长文本
+    from database import init_db, engine
+    init_db()
+    if len(sys.argv) > 1 and sys.argv[1] == "compress":
+        compress_existing_rows(engine, int(sys.argv[2]) if len(sys.argv) > 2 else 500)
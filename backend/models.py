@@ -6,37 +6,95 @@
 最后更新: 2025-10-25
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from datetime import datetime
+from compression import CompressedText
 
 Base = declarative_base()
 
 class Material(Base):
-    """素材表"""
+    """素材表（只保存元数据，正文存放在 material_bodies 表）"""
     __tablename__ = 'materials'
+    # 列表查询按 is_deleted 筛选、按时间倒序 + id 倒序分页
+    # 索引保持升序：SQLite 反向扫描升序索引时，末尾隐含的 rowid 也是倒序，
+    # 正好匹配 ORDER BY 时间 DESC, id DESC，无需额外排序
+    __table_args__ = (
+        Index('ix_materials_deleted_created', 'is_deleted', 'created_at'),
+        Index('ix_materials_deleted_deleted_at', 'is_deleted', 'deleted_at'),
+        Index('ix_materials_source_deleted_created', 'source_type', 'is_deleted', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=True, comment='素材标题')
-    content = Column(Text, nullable=False, comment='素材内容')
-    content_full = Column(Text, nullable=True, comment='完整内容')
     content_length = Column(Integer, nullable=True, comment='内容长度')
+    content_preview = Column(String(200), nullable=True, comment='内容预览（写入时截取）')
     source_type = Column(String(20), nullable=False, comment='来源类型')
     file_name = Column(String(200), nullable=True, comment='PDF文件名')
+    source_url = Column(String(500), nullable=True, index=True, comment='来源URL')
+    content_hash = Column(String(64), nullable=True, unique=True, index=True, comment='规范化内容的 SHA-256')
+    file_hash = Column(String(64), nullable=True, index=True, comment='原始文件的 SHA-256')
+    simhash = Column(Integer, nullable=True, comment='内容的 64 位 SimHash 指纹')
+    ingest_status = Column(String(20), nullable=False, default='ready', server_default='ready',
+                           comment='入库状态（processing=正在逐页写入，ready=已完成）')
+    pages_done = Column(Integer, nullable=True, comment='已写入页数（PDF 流式入库）')
+    pages_total = Column(Integer, nullable=True, comment='总页数（PDF 流式入库）')
+    fts_chunks = Column(Integer, nullable=True, comment='已写入全文索引的正文分块数（流式入库中使用，为空表示全部分块）')
     tags = Column(Text, nullable=True, comment='标签（JSON格式）')
     is_deleted = Column(Integer, default=0, comment='是否已删除（0=未删除，1=已删除）')
     deleted_at = Column(DateTime, nullable=True, comment='删除时间')
     created_at = Column(DateTime, default=datetime.now, comment='创建时间')
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+    
+    # 正文分块，访问 content 时才加载
+    body_chunks = relationship(
+        'MaterialBody',
+        order_by='MaterialBody.chunk_index',
+        cascade='all, delete-orphan',
+        lazy='select'
+    )
+    
+    @property
+    def content(self):
+        """素材内容（按顺序拼接正文分块）"""
+        return "".join(chunk.content for chunk in self.body_chunks)
+    
+    @content.setter
+    def content(self, value):
+        self.body_chunks = [MaterialBody(chunk_index=0, content=value)]
+
+class MaterialBody(Base):
+    """素材正文表（与素材表垂直拆分，正文可按页/段落分块存放）"""
+    __tablename__ = 'material_bodies'
+    
+    material_id = Column(Integer, ForeignKey('materials.id'), primary_key=True, comment='素材ID')
+    chunk_index = Column(Integer, primary_key=True, default=0, comment='分块序号')
+    content = Column(CompressedText, nullable=False, comment='正文内容（超过阈值时压缩存储）')
+
+class MaterialSimhashBand(Base):
+    """素材 SimHash 分段索引表（按段值查找近似重复的候选素材）"""
+    __tablename__ = 'material_simhash_bands'
+    __table_args__ = (
+        Index('ix_material_simhash_bands_band_value', 'band', 'value'),
+    )
+    
+    material_id = Column(Integer, ForeignKey('materials.id'), primary_key=True, comment='素材ID')
+    band = Column(Integer, primary_key=True, comment='段序号')
+    value = Column(Integer, nullable=False, comment='段值（16 位）')
 
 class Topic(Base):
     """选题表"""
     __tablename__ = 'topics'
+    __table_args__ = (
+        Index('ix_topics_material_id', 'material_id'),
+        Index('ix_topics_created_at', 'created_at'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     material_id = Column(Integer, nullable=False, comment='关联的素材ID')
     title = Column(String(200), nullable=False, comment='选题标题')
-    refined_content = Column(Text, nullable=False, comment='提炼后的内容')
+    refined_content = Column(CompressedText, nullable=False, comment='提炼后的内容（超过阈值时压缩存储）')
     prompt_name = Column(String(100), nullable=True, comment='使用的提示词名称')
     tags = Column(Text, nullable=False, comment='标签（JSON格式）')
     source_type = Column(String(20), nullable=True, comment='来源类型')
@@ -55,9 +113,32 @@ class Tag(Base):
     created_at = Column(DateTime, default=datetime.now, comment='创建时间')
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
 
+class MaterialTag(Base):
+    """素材-标签关联表"""
+    __tablename__ = 'material_tags'
+    __table_args__ = (
+        Index('ix_material_tags_tag_material', 'tag_id', 'material_id'),
+    )
+    
+    material_id = Column(Integer, ForeignKey('materials.id'), primary_key=True, comment='素材ID')
+    tag_id = Column(Integer, ForeignKey('tags.id'), primary_key=True, comment='标签ID')
+
+class TopicTag(Base):
+    """选题-标签关联表"""
+    __tablename__ = 'topic_tags'
+    __table_args__ = (
+        Index('ix_topic_tags_tag_topic', 'tag_id', 'topic_id'),
+    )
+    
+    topic_id = Column(Integer, ForeignKey('topics.id'), primary_key=True, comment='选题ID')
+    tag_id = Column(Integer, ForeignKey('tags.id'), primary_key=True, comment='标签ID')
+
 class UsageStats(Base):
     """使用统计表"""
     __tablename__ = 'usage_stats'
+    __table_args__ = (
+        Index('ux_usage_stats_date_model', 'date', 'model', unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(String(10), nullable=False, comment='日期 YYYY-MM-DD')
@@ -68,6 +149,45 @@ class UsageStats(Base):
     created_at = Column(DateTime, default=datetime.now, comment='创建时间')
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
 
+class Job(Base):
+    """后台任务表（PDF/URL 异步入库，服务重启后继续执行）"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_id', 'status', 'id'),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(20), nullable=False, comment='任务类型（pdf/url）')
+    status = Column(String(20), nullable=False, default='pending', comment='状态（pending/running/succeeded/failed）')
+    params = Column(Text, nullable=False, comment='任务参数（JSON格式）')
+    progress_done = Column(Integer, default=0, comment='已处理数量（PDF为页数，URL为图片数）')
+    progress_total = Column(Integer, nullable=True, comment='总数量')
+    material_id = Column(Integer, nullable=True, comment='生成的素材ID')
+    result = Column(Text, nullable=True, comment='任务结果（JSON格式）')
+    error = Column(Text, nullable=True, comment='失败原因')
+    attempts = Column(Integer, default=0, comment='执行次数')
+    worker_id = Column(String(64), nullable=True, comment='执行中的工作进程')
+    heartbeat_at = Column(DateTime, nullable=True, comment='工作进程最近一次心跳时间（超过租约时长视为进程已退出）')
+    created_at = Column(DateTime, default=datetime.now, comment='创建时间')
+    started_at = Column(DateTime, nullable=True, comment='开始执行时间')
+    finished_at = Column(DateTime, nullable=True, comment='结束时间')
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+
+class ExtractionCache(Base):
+    """文本提取结果缓存表（按原始文件哈希 + 提取方式寻址，按最近使用时间淘汰）"""
+    __tablename__ = 'extraction_cache'
+    __table_args__ = (
+        Index('ix_extraction_cache_last_used_at', 'last_used_at'),
+    )
+    
+    cache_key = Column(String(64), primary_key=True, comment='缓存键（类型、文件哈希、提取方式的 SHA-256）')
+    kind = Column(String(20), nullable=False, comment='类型（pdf/image）')
+    content = Column(CompressedText, nullable=False, comment='提取出的文本（超过阈值时压缩存储）')
+    size_bytes = Column(Integer, nullable=False, comment='文本大小（UTF-8 字节数）')
+    hit_count = Column(Integer, default=0, comment='命中次数')
+    created_at = Column(DateTime, default=datetime.now, comment='创建时间')
+    last_used_at = Column(DateTime, default=datetime.now, comment='最近使用时间')
+
 class Config(Base):
     """配置表"""
     __tablename__ = 'configs'
@@ -8,19 +8,299 @@
 
 import logging
 import pdfplumber
+import pypdfium2 as pdfium
 import os
+import threading
+from concurrent.futures import as_completed
+from config import settings
+from task_pools import get_process_pool
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(file_path: str):
+# ========== 提取引擎 ==========
+# 每个引擎是一个生成器 (文件路径, 起始页下标, 结束页下标) -> 逐页产出 (页码, 文本, 错误信息)，
+# 单页出错时文本为 None、记录错误信息
+#   pdfplumber - 带版面分析，最慢，复杂排版的还原度最好
+#   pdfium     - pypdfium2 直接读取文本层，速度快很多，适合纯文本逐字稿
+#   auto       - 先用 pdfium，某页没有提取到文字时再用 pdfplumber 重试该页
+
+# PDFium 不是线程安全的，同一进程内的调用必须串行
+_pdfium_lock = threading.Lock()
+
+def _pdfplumber_page(pdf, index: int) -> tuple:
+    """用 pdfplumber 提取单页文本"""
+    page = pdf.pages[index]
+    try:
+        return index + 1, page.extract_text(), None
+    except Exception as e:
+        return index + 1, None, str(e)
+    finally:
+        # 释放页面解析缓存，长文档不会随页数累积内存
+        page.flush_cache()
+
+def _iter_pages_pdfplumber(file_path: str, start: int, end: int):
+    """pdfplumber 引擎"""
+    with pdfplumber.open(file_path) as pdf:
+        for index in range(start, end):
+            yield _pdfplumber_page(pdf, index)
+
+def _pdfium_page(pdf, index: int) -> tuple:
+    """用 pypdfium2 提取单页文本（调用方需持有 _pdfium_lock）"""
+    try:
+        page = pdf[index]
+        try:
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+        return index + 1, text.replace("\r\n", "\n").replace("\r", "\n"), None
+    except Exception as e:
+        return index + 1, None, str(e)
+
+def _iter_pages_pdfium(file_path: str, start: int, end: int):
+    """pdfium 引擎"""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+    try:
+        for index in range(start, end):
+            with _pdfium_lock:
+                result = _pdfium_page(pdf, index)
+            yield result
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+def _iter_pages_auto(file_path: str, start: int, end: int):
+    """auto 引擎：pdfium 没有提取到文字的页面用 pdfplumber 重试"""
+    fallback = None
+    try:
+        for page_num, page_text, error in _iter_pages_pdfium(file_path, start, end):
+            if error is None and page_text and page_text.strip():
+                yield page_num, page_text, None
+                continue
+            if fallback is None:
+                fallback = pdfplumber.open(file_path)
+            logger.info(f"第 {page_num} 页改用 pdfplumber 提取")
+            yield _pdfplumber_page(fallback, page_num - 1)
+    finally:
+        if fallback is not None:
+            fallback.close()
+
+# 引擎名称 -> 逐页提取函数
+PDF_ENGINES = {
+    "pdfplumber": _iter_pages_pdfplumber,
+    "pdfium": _iter_pages_pdfium,
+    "auto": _iter_pages_auto,
+}
+
+def _count_pages(file_path: str) -> int:
+    """获取 PDF 页数（优先用 pdfium，打不开时再用 pdfplumber）"""
+    try:
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+    except Exception as e:
+        logger.warning(f"pdfium 无法打开 PDF，改用 pdfplumber: {e}")
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+def _extract_page_range(engine: str, file_path: str, start: int, end: int) -> list:
+    """进程池子任务：提取一段页面，返回 [(页码, 文本, 错误信息)]"""
+    return list(PDF_ENGINES[engine](file_path, start, end))
+
+def _extract_sequential(engine: str, file_path: str, total_pages: int, progress_callback=None) -> list:
+    """在当前线程中逐页提取"""
+    results = []
+    for result in PDF_ENGINES[engine](file_path, 0, total_pages):
+        page_num = result[0]
+        logger.info(f"已处理第 {page_num}/{total_pages} 页")
+        results.append(result)
+        if progress_callback:
+            progress_callback(page_num, total_pages)
+    return results
+
+def _extract_parallel(engine: str, file_path: str, total_pages: int, progress_callback=None) -> list:
+    """按页段拆分给进程池并行提取，结果按页码顺序返回"""
+    pool = get_process_pool()
+    step = settings.PDF_PAGES_PER_TASK
+    futures = {
+        pool.submit(_extract_page_range, engine, file_path, start, min(start + step, total_pages)): start
+        for start in range(0, total_pages, step)
+    }
+    logger.info(f"并行提取: {len(futures)} 个子任务, 每个 {step} 页")
+
+    chunks = {}
+    done_pages = 0
+    try:
+        for future in as_completed(futures):
+            chunk = future.result()
+            chunks[futures[future]] = chunk
+            done_pages += len(chunk)
+            logger.info(f"已处理 {done_pages}/{total_pages} 页")
+            if progress_callback:
+                progress_callback(done_pages, total_pages)
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return [result for start in sorted(chunks) for result in chunks[start]]
+
+# ========== 扫描页 OCR ==========
+# 没有文字层的页面（扫描页）用 pdfium 渲染成图片，再复用 image_service 的 Tesseract OCR；
+# 只处理需要的页面，混合型 PDF 中的文本页不受影响
+
+def _ocr_page(file_path: str, page_num: int, dpi: int) -> tuple:
+    """进程池子任务：渲染一页并 OCR，返回 (页码, 文本, 错误信息)"""
+    from image_service import ocr_image
+
+    try:
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(file_path)
+            try:
+                page = pdf[page_num - 1]
+                try:
+                    image = page.render(scale=dpi / 72).to_pil()
+                finally:
+                    page.close()
+            finally:
+                pdf.close()
+        return page_num, ocr_image(image), None
+    except Exception as e:
+        return page_num, None, str(e)
+
+def _ocr_pages(file_path: str, page_nums: list) -> dict:
+    """
+    在进程池中并行 OCR 指定页面
+
+    返回:
+        dict: {页码: (文本, 错误信息)}
+    """
+    pool = get_process_pool()
+    dpi = settings.PDF_OCR_DPI
+    logger.info(f"OCR 扫描页: {len(page_nums)} 页, DPI={dpi}")
+    futures = [pool.submit(_ocr_page, file_path, page_num, dpi) for page_num in page_nums]
+    results = {}
+    try:
+        for future in as_completed(futures):
+            page_num, page_text, error = future.result()
+            results[page_num] = (page_text, error)
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+def _needs_ocr(page_text: str, error: str) -> bool:
+    """页面是否需要 OCR（出错或没有提取到文字）"""
+    return error is not None or not (page_text and page_text.strip())
+
+def _resolve_engine(engine: str = None) -> str:
+    """确定提取引擎（未指定时使用配置）"""
+    engine = engine or settings.PDF_ENGINE
+    if engine not in PDF_ENGINES:
+        raise ValueError(f"未知的 PDF 提取引擎: {engine}")
+    return engine
+
+# 提取逻辑的输出发生变化时递增，使旧的提取缓存失效
+EXTRACTOR_VERSION = 1
+
+def extraction_variant(engine: str = None) -> str:
+    """提取方式标识（引擎、版本、OCR 参数），作为提取缓存键的一部分"""
+    engine = _resolve_engine(engine)
+    ocr = f"ocr{settings.PDF_OCR_DPI}:{settings.OCR_TESSERACT_CONFIG}" if settings.PDF_OCR_ENABLED else "no-ocr"
+    return f"{engine}:v{EXTRACTOR_VERSION}:pdfplumber{pdfplumber.__version__}:{ocr}"
+
+def _check_file(file_path: str):
+    """检查 PDF 文件是否存在，并记录文件大小"""
+    if not os.path.exists(file_path):
+        logger.error(f"PDF 文件不存在: {file_path}")
+        raise FileNotFoundError(f"PDF 文件不存在: {file_path}")
+    
+    file_size = os.path.getsize(file_path)
+    file_size_mb = file_size / (1024 * 1024)
+    logger.info(f"PDF 文件大小: {file_size_mb:.2f} MB")
+
+def _page_has_text(page_num: int, page_text: str, error: str) -> bool:
+    """判断页面是否提取到文字（出错或空白时记录日志）"""
+    if error is not None:
+        logger.error(f"处理第 {page_num} 页时出错: {error}")
+        return False
+    if page_text and page_text.strip():
+        return True
+    logger.warning(f"第 {page_num} 页无法提取文字或为空")
+    return False
+
+def iter_pdf_pages(file_path: str, engine: str = None):
+    """
+    逐页提取 PDF 文本（生成器，提取一页产出一页，不在内存中累积全文）
+    
+    参数:
+        file_path (str): PDF 文件路径
+        engine (str): 提取引擎，默认使用 settings.PDF_ENGINE
+    
+    产出:
+        tuple: (页码, 总页数, 文本)，空白页或出错的页面文本为空字符串；
+               扫描页在 OCR 后产出（连续的扫描页成批并行识别）
+    
+    异常:
+        FileNotFoundError: 当文件不存在时
+        Exception: 当 PDF 无法打开时
+    """
+    engine = _resolve_engine(engine)
+    logger.info(f"开始逐页处理 PDF: {file_path}, 引擎={engine}")
+    _check_file(file_path)
+    
+    total_pages = _count_pages(file_path)
+    logger.info(f"PDF 总页数: {total_pages}")
+    
+    # 需要 OCR 的连续页面攒成一批并行识别，再按页码顺序产出
+    ocr_batch = []
+    
+    def flush_ocr_batch():
+        ocr_results = _ocr_pages(file_path, [page_num for page_num, _, _ in ocr_batch])
+        for page_num, page_text, error in ocr_batch:
+            ocr_text, ocr_error = ocr_results[page_num]
+            if ocr_error is None and ocr_text:
+                page_text, error = ocr_text, None
+            if not _page_has_text(page_num, page_text, error):
+                page_text = ""
+            yield page_num, total_pages, page_text
+        ocr_batch.clear()
+    
+    for page_num, page_text, error in PDF_ENGINES[engine](file_path, 0, total_pages):
+        if settings.PDF_OCR_ENABLED and _needs_ocr(page_text, error):
+            ocr_batch.append((page_num, page_text, error))
+            if len(ocr_batch) >= settings.PDF_PAGES_PER_TASK:
+                yield from flush_ocr_batch()
+            continue
+        if ocr_batch:
+            yield from flush_ocr_batch()
+        if not _page_has_text(page_num, page_text, error):
+            page_text = ""
+        yield page_num, total_pages, page_text
+    if ocr_batch:
+        yield from flush_ocr_batch()
+
+def extract_text_from_pdf(file_path: str, progress_callback=None, parallel: bool = None, engine: str = None):
     """
     从 PDF 提取文本
     
-    这个函数会逐页提取 PDF 中的文字内容，适用于文本版 PDF。
-    注意：不支持扫描版（图片型）PDF。
+    这个函数会逐页提取 PDF 中的文字内容。
+    页数较多时按页段分给进程池并行提取，结果仍按页码顺序拼接。
+    没有文字层的页面（扫描页）渲染成图片后 OCR（PDF_OCR_ENABLED）。
     
     参数:
         file_path (str): PDF 文件路径
+        progress_callback (callable): 进度回调 callback(已处理页数, 总页数)，可选
+        parallel (bool): 是否并行提取，默认根据页数和进程数自动选择
+        engine (str): 提取引擎（pdfplumber / pdfium / auto），默认使用 settings.PDF_ENGINE
     
     返回:
         str: 提取的文本内容
@@ -29,65 +309,67 @@ def extract_text_from_pdf(file_path: str):
         FileNotFoundError: 当文件不存在时
         Exception: 当 PDF 解析失败时
     """
-    logger.info(f"开始处理 PDF: {file_path}")
+    engine = _resolve_engine(engine)
+    logger.info(f"开始处理 PDF: {file_path}, 引擎={engine}")
     
-    # 1. 检查文件是否存在
-    if not os.path.exists(file_path):
-        logger.error(f"PDF 文件不存在: {file_path}")
-        raise FileNotFoundError(f"PDF 文件不存在: {file_path}")
-    
-    # 2. 获取文件大小
-    file_size = os.path.getsize(file_path)
-    file_size_mb = file_size / (1024 * 1024)
-    logger.info(f"PDF 文件大小: {file_size_mb:.2f} MB")
+    # 1. 检查文件是否存在，记录文件大小
+    _check_file(file_path)
     
     try:
-        # 3. 打开 PDF 文件
-        # pdfplumber 会自动处理编码问题
-        with pdfplumber.open(file_path) as pdf:
-            total_pages = len(pdf.pages)
-            logger.info(f"PDF 总页数: {total_pages}")
-            
-            text = ""
-            successful_pages = 0
-            empty_pages = 0
-            
-            # 4. 遍历每一页，提取文字
-            # 注意：对于大文件（如1小时播客逐字稿），这可能需要几秒钟
-            for page_num, page in enumerate(pdf.pages, 1):
-                logger.info(f"正在处理第 {page_num}/{total_pages} 页")
-                
-                try:
-                    # 提取当前页的文本
-                    page_text = page.extract_text()
-                    
-                    if page_text and page_text.strip():
-                        # 有内容的页面
-                        text += page_text + "\n"
-                        successful_pages += 1
-                    else:
-                        # 空页面或无法提取的页面
-                        empty_pages += 1
-                        logger.warning(f"第 {page_num} 页无法提取文字或为空")
-                        
-                except Exception as e:
-                    logger.error(f"处理第 {page_num} 页时出错: {e}")
-                    empty_pages += 1
-                    continue
-            
-            # 5. 清理文本
-            text = text.strip()
-            
-            # 6. 统计信息
-            word_count = len(text)
-            logger.info(f"PDF 处理完成: 成功={successful_pages}页, 空白={empty_pages}页, 总字数={word_count}")
-            
-            # 7. 检查是否提取到内容
-            if not text:
-                logger.error("PDF 中没有提取到任何文字，可能是扫描版 PDF")
-                raise Exception("PDF 中没有文字内容，请确保是文本版 PDF（非扫描版）")
-            
-            return text
+        # 2. 获取页数
+        total_pages = _count_pages(file_path)
+        logger.info(f"PDF 总页数: {total_pages}")
+        
+        if parallel is None:
+            parallel = (
+                settings.PROCESS_POOL_WORKERS > 1
+                and total_pages >= settings.PDF_PARALLEL_MIN_PAGES
+            )
+        
+        # 3. 提取每一页的文字
+        # 注意：对于大文件（如1小时播客逐字稿），这可能需要几秒钟
+        if parallel:
+            page_results = _extract_parallel(engine, file_path, total_pages, progress_callback)
+        else:
+            page_results = _extract_sequential(engine, file_path, total_pages, progress_callback)
+        
+        # 没有文字层的页面改用 OCR
+        if settings.PDF_OCR_ENABLED:
+            ocr_page_nums = [
+                page_num for page_num, page_text, error in page_results
+                if _needs_ocr(page_text, error)
+            ]
+            if ocr_page_nums:
+                ocr_results = _ocr_pages(file_path, ocr_page_nums)
+                page_results = [
+                    (page_num, *ocr_results[page_num]) if page_num in ocr_results else (page_num, page_text, error)
+                    for page_num, page_text, error in page_results
+                ]
+        
+        texts = []
+        successful_pages = 0
+        empty_pages = 0
+        for page_num, page_text, error in page_results:
+            if _page_has_text(page_num, page_text, error):
+                texts.append(page_text)
+                successful_pages += 1
+            else:
+                # 空页面或无法提取的页面
+                empty_pages += 1
+        
+        # 4. 拼接并清理文本
+        text = "\n".join(texts).strip()
+        
+        # 5. 统计信息
+        word_count = len(text)
+        logger.info(f"PDF 处理完成: 成功={successful_pages}页, 空白={empty_pages}页, 总字数={word_count}")
+        
+        # 6. 检查是否提取到内容
+        if not text:
+            logger.error("PDF 中没有提取到任何文字（OCR 也未识别到文字）")
+            raise Exception("PDF 中没有可识别的文字内容")
+        
+        return text
             
     except Exception as e:
         logger.error(f"PDF 解析失败: {e}", exc_info=True)
@@ -0,0 +1,86 @@
+"""
+文件名: rate_limiter.py
+作用: 按域名的令牌桶限速（进程内所有抓取请求共用，避免对同一站点请求过快）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    令牌桶：每秒补充 rate 个令牌，最多积累 burst 个
+
+    令牌不足时允许预支（令牌数为负），调用方按欠数睡眠，
+    多个线程同时等待时按到达顺序依次放行，不需要轮询
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取一个令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+# 域名 -> 令牌桶
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_limit(host: str) -> tuple:
+    """
+    查找域名的限速规则（按 HOST_RATE_LIMITS 中最长的域名后缀匹配）
+
+    返回:
+        tuple: (每秒请求数, 突发请求数)，未配置的域名使用 DEFAULT_HOST_RATE_LIMIT
+    """
+    best = None
+    for domain, limit in settings.HOST_RATE_LIMITS.items():
+        if host == domain or host.endswith("." + domain):
+            if best is None or len(domain) > len(best[0]):
+                best = (domain, limit)
+    return best[1] if best else settings.DEFAULT_HOST_RATE_LIMIT
+
+def _get_bucket(host: str) -> TokenBucket:
+    """获取域名的令牌桶（首次请求时按规则创建）"""
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            rate, burst = get_limit(host)
+            bucket = TokenBucket(rate, burst)
+            _buckets[host] = bucket
+        return bucket
+
+def acquire(url: str) -> float:
+    """
+    请求 URL 前调用：按目标域名限速，必要时阻塞等待
+
+    返回:
+        float: 实际等待的秒数
+    """
+    if not settings.HOST_RATE_LIMIT_ENABLED:
+        return 0.0
+
+    host = urlparse(url).hostname or ""
+    wait = _get_bucket(host.lower()).reserve()
+    if wait > 0:
+        logger.info(f"限速等待: {host}, {wait:.2f} 秒")
+        time.sleep(wait)
+    return wait
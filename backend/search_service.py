@@ -0,0 +1,171 @@
+"""
+文件名: search_service.py
+作用: 全文检索服务（SQLite FTS5 索引）
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import logging
+from sqlalchemy import text, select, literal, literal_column, table, column
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# FTS5 虚拟表，rowid 与素材/选题的 id 一一对应
+# 使用 trigram 分词器：中文没有空格分词，按三字切分可以支持任意子串匹配
+MATERIALS_FTS = "materials_fts"
+TOPICS_FTS = "topics_fts"
+
+# 索引表的内容来源视图：索引表为外部内容表（content=视图），不另存一份明文正文，
+# 读取列值、删除索引记录时通过视图解压原表（decompress_text 在每个连接上注册）
+MATERIALS_FTS_SOURCE = "material_fts_source"
+TOPICS_FTS_SOURCE = "topic_fts_source"
+
+FTS_SOURCES = {
+    MATERIALS_FTS: MATERIALS_FTS_SOURCE,
+    TOPICS_FTS: TOPICS_FTS_SOURCE,
+}
+
+# 素材正文按分块顺序拼接；流式入库中的素材只包含已写入索引的分块（fts_chunks），
+# 保证视图内容始终与索引中的内容一致
+_SOURCE_VIEWS = {
+    MATERIALS_FTS_SOURCE: (
+        "SELECT m.id AS id, coalesce(m.title, '') AS title, coalesce(("
+        "SELECT group_concat(chunk, '') FROM ("
+        "SELECT decompress_text(b.content) AS chunk FROM material_bodies b "
+        "WHERE b.material_id = m.id AND (m.fts_chunks IS NULL OR b.chunk_index < m.fts_chunks) "
+        "ORDER BY b.chunk_index)), '') AS content "
+        "FROM materials m"
+    ),
+    TOPICS_FTS_SOURCE: (
+        "SELECT id, coalesce(title, '') AS title, coalesce(decompress_text(refined_content), '') AS content "
+        "FROM topics"
+    ),
+}
+
+# trigram 分词器要求关键词至少 3 个字符，更短的关键词退化为 LIKE 扫描
+MIN_MATCH_LENGTH = 3
+
+# 启动时检测 SQLite 是否支持 FTS5 trigram（需要 SQLite >= 3.34）
+fts_available = False
+
+def init_search_index(connection):
+    """
+    创建内容来源视图和全文索引表，新建索引表时从现有数据构建索引
+
+    旧版本的索引表自带一份明文正文（内部内容表），这里删除后按外部内容表重建
+
+    参数:
+        connection: SQLAlchemy 连接（在事务中执行）
+    """
+    global fts_available
+
+    try:
+        for fts_table, source in FTS_SOURCES.items():
+            connection.execute(text(f"CREATE VIEW IF NOT EXISTS {source} AS {_SOURCE_VIEWS[source]}"))
+            sql = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": fts_table}
+            ).scalar()
+            if sql and "content=" in sql:
+                continue
+            if sql:
+                connection.execute(text(f"DROP TABLE {fts_table}"))
+                logger.info(f"{fts_table}: 删除自带明文副本的旧索引表")
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {fts_table} "
+                f"USING fts5(title, content, content='{source}', content_rowid='id', tokenize='trigram')"
+            ))
+            connection.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+            logger.info(f"{fts_table}: 全文索引构建完成")
+        fts_available = True
+    except Exception as e:
+        fts_available = False
+        logger.error(f"当前 SQLite 不支持 FTS5 trigram，搜索将退化为 LIKE 扫描: {e}")
+
+# 外部内容表删除索引记录时需要提供写入时的内容，这里从来源视图读取，
+# 因此必须在修改原表（标题、正文、fts_chunks）之前删除，修改之后再写入
+
+def _index_document(db: Session, fts_table: str, doc_id: int):
+    """按来源视图的当前内容写入一条索引记录（该记录必须尚未索引或已先删除）"""
+    if not fts_available:
+        return
+    db.execute(
+        text(
+            f"INSERT INTO {fts_table}(rowid, title, content) "
+            f"SELECT id, title, content FROM {FTS_SOURCES[fts_table]} WHERE id = :id"
+        ),
+        {"id": doc_id}
+    )
+
+def _remove_document(db: Session, fts_table: str, doc_id: int):
+    """删除一条索引记录（须在修改原表之前调用）"""
+    if not fts_available:
+        return
+    db.execute(
+        text(
+            f"INSERT INTO {fts_table}({fts_table}, rowid, title, content) "
+            f"SELECT 'delete', id, title, content FROM {FTS_SOURCES[fts_table]} WHERE id = :id"
+        ),
+        {"id": doc_id}
+    )
+
+def index_material(db: Session, material_id: int):
+    """索引素材（与素材写入处于同一事务，由调用方提交）"""
+    _index_document(db, MATERIALS_FTS, material_id)
+
+def remove_material(db: Session, material_id: int):
+    """从索引中移除素材（须在修改或删除素材之前调用）"""
+    _remove_document(db, MATERIALS_FTS, material_id)
+
+def index_topic(db: Session, topic_id: int):
+    """索引选题（与选题写入处于同一事务，由调用方提交）"""
+    _index_document(db, TOPICS_FTS, topic_id)
+
+def remove_topic(db: Session, topic_id: int):
+    """从索引中移除选题（须在修改或删除选题之前调用）"""
+    _remove_document(db, TOPICS_FTS, topic_id)
+
+def _match_expression(keyword: str) -> str:
+    """把用户输入转成 FTS5 短语查询（整体作为子串匹配，与原 LIKE 语义一致）"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+def search_subquery(fts_table: str, keyword: str):
+    """
+    构建全文检索子查询
+
+    参数:
+        fts_table (str): 索引表名（MATERIALS_FTS / TOPICS_FTS）
+        keyword (str): 搜索关键词
+
+    返回:
+        Subquery: 包含 id 和 rank 两列，rank 越小越相关（BM25）；
+                  关键词过短时 rank 恒为 0
+    """
+    fts = table(fts_table, column("rowid"), column("title"), column("content"))
+
+    if len(keyword) >= MIN_MATCH_LENGTH:
+        stmt = select(
+            fts.c.rowid.label("id"),
+            literal_column(f"bm25({fts_table})").label("rank")
+        ).where(literal_column(fts_table).op("MATCH")(_match_expression(keyword)))
+    else:
+        # 索引表不存正文，直接在来源视图上匹配
+        source = table(FTS_SOURCES[fts_table], column("id"), column("title"), column("content"))
+        pattern = f"%{keyword}%"
+        stmt = select(
+            source.c.id,
+            literal(0).label("rank")
+        ).where(source.c.title.like(pattern) | source.c.content.like(pattern))
+
+    return stmt.subquery()
+
+def rebuild_search_index(db: Session):
+    """按来源视图重建全部全文索引"""
+    if not fts_available:
+        return
+    logger.info("开始重建全文索引")
+    for fts_table in FTS_SOURCES:
+        db.execute(text(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')"))
+    db.commit()
+    logger.info("全文索引重建完成")
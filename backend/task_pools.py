@@ -0,0 +1,92 @@
+"""
+文件名: task_pools.py
+作用: 后台线程池（PDF 解析、URL 处理、图片下载/OCR、AI 调用、后台入库任务等阻塞任务）和 CPU 密集任务的进程池
+作者: ContentHub Team
+日期: 2026-10-16
+最后更新: 2026-10-16
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 线程池名称 -> 配置项（线程数）
+# 每类任务使用独立的线程池：大量 PDF 上传不会占满 AI 调用的线程，反之亦然
+POOL_SIZES = {
+    "pdf": "PDF_POOL_WORKERS",
+    "url": "URL_POOL_WORKERS",
+    "ai": "AI_POOL_WORKERS",
+    "job": "JOB_POOL_WORKERS",
+    "text": "TEXT_POOL_WORKERS",
+    "image": "IMAGE_DOWNLOAD_WORKERS",
+    "ocr": "OCR_POOL_WORKERS",
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+_process_pool = None
+
+def get_pool(name: str) -> ThreadPoolExecutor:
+    """获取线程池（首次使用时按配置创建）"""
+    if name not in POOL_SIZES:
+        raise ValueError(f"未知的线程池: {name}")
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            workers = getattr(settings, POOL_SIZES[name])
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool")
+            _pools[name] = pool
+            logger.info(f"创建线程池: {name}, 线程数={workers}")
+        return pool
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    获取进程池（首次使用时按 PROCESS_POOL_WORKERS 创建）
+
+    用于 PDF 逐页解析等 CPU 密集任务，绕开 GIL 利用多核。
+    子进程用 spawn 方式启动：服务进程里有多个线程，fork 可能复制到被其他线程持有的锁
+    """
+    global _process_pool
+    with _pools_lock:
+        if _process_pool is None:
+            workers = settings.PROCESS_POOL_WORKERS
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"创建进程池: 进程数={workers}")
+        return _process_pool
+
+async def run_in_pool(name: str, func, *args, **kwargs):
+    """
+    在指定线程池中执行阻塞函数，并异步等待结果
+
+    参数:
+        name (str): 线程池名称（pdf / url / ai）
+        func: 要执行的函数
+
+    返回:
+        函数的返回值（函数抛出的异常会原样抛出）
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(name), functools.partial(func, *args, **kwargs))
+
+def shutdown_pools(wait: bool = True):
+    """关闭所有线程池和进程池"""
+    global _process_pool
+    with _pools_lock:
+        for name, pool in _pools.items():
+            pool.shutdown(wait=wait)
+            logger.info(f"线程池已关闭: {name}")
+        _pools.clear()
+
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=wait)
+            _process_pool = None
+            logger.info("进程池已关闭")
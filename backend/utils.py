@@ -25,4 +25,25 @@ def sanitize_filename(filename: str) -> str:
     import re
     return re.sub(r'[^\w\s.-]', '', filename)
 
+def parse_tag_list(tags: str) -> list:
+    """解析逗号分隔的标签参数"""
+    if not tags:
+        return []
+    return [tag.strip() for tag in tags.split(",") if tag.strip()]
 
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """编码分页游标（格式: <排序时间ISO>,<id>）"""
+    return f"{sort_value.isoformat()},{row_id}"
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    解析分页游标
+
+    返回:
+        tuple: (排序时间, id)
+
+    异常:
+        ValueError: 游标格式错误时
+    """
+    sort_value, row_id = cursor.rsplit(",", 1)
+    return datetime.fromisoformat(sort_value), int(row_id)
@@ -290,8 +290,17 @@ export default function Materials() {
     }
   }
 
+  // 加载素材正文（列表接口不返回正文，查看和提炼时从详情接口读取）
+  const loadMaterialContent = async (materialId) => {
+    const response = await materialApi.getDetail(materialId)
+    if (response.code !== 200) {
+      throw new Error(response.message || '加载素材正文失败')
+    }
+    return response.data.content
+  }
+
   // AI提炼选中的素材
-  const handleRefineSelected = () => {
+  const handleRefineSelected = async () => {
     console.log('AI提炼按钮被点击，选中素材数量:', selectedIds.length)
     
     if (selectedIds.length === 0) {
@@ -308,19 +317,25 @@ export default function Materials() {
     console.log('选中的素材:', selectedMaterial)
     
     if (selectedMaterial) {
-      setCurrentMaterial({
-        id: selectedMaterial.id,
-        content: selectedMaterial.content_full,
-        source_type: selectedMaterial.source_type,
-        title: selectedMaterial.title
-      })
-      console.log('准备跳转到提炼页面')
-      navigate('/refine')
+      try {
+        const content = await loadMaterialContent(selectedMaterial.id)
+        setCurrentMaterial({
+          id: selectedMaterial.id,
+          content,
+          source_type: selectedMaterial.source_type,
+          title: selectedMaterial.title
+        })
+        console.log('准备跳转到提炼页面')
+        navigate('/refine')
+      } catch (error) {
+        console.error('加载素材正文失败:', error)
+        message.error('加载素材正文失败，请重试')
+      }
     }
   }
 
   // 批量提炼选中的素材
-  const handleBatchRefine = () => {
+  const handleBatchRefine = async () => {
     console.log('批量提炼按钮被点击，选中素材数量:', selectedIds.length)
     
     if (selectedIds.length < 2) {
@@ -332,8 +347,15 @@ export default function Materials() {
     const selectedMaterials = materials.filter(m => selectedIds.includes(m.id))
     console.log('选中的素材:', selectedMaterials)
     
-    // 设置批量素材到全局状态
-    setBatchMaterials(selectedMaterials)
+    // 读取正文后设置批量素材到全局状态（提炼页面使用 content_full）
+    try {
+      const contents = await Promise.all(selectedMaterials.map(m => loadMaterialContent(m.id)))
+      setBatchMaterials(selectedMaterials.map((m, i) => ({ ...m, content_full: contents[i] })))
+    } catch (error) {
+      console.error('加载素材正文失败:', error)
+      message.error('加载素材正文失败，请重试')
+      return
+    }
     
     console.log('准备跳转到批量提炼页面')
     navigate('/refine', { state: { isBatch: true } })
@@ -363,9 +385,20 @@ export default function Materials() {
   }
   
   // 查看素材详情
-  const handleViewMaterial = (material, e) => {
+  const handleViewMaterial = async (material, e) => {
     e.stopPropagation() // 阻止卡片点击事件
     setViewingMaterial(material)
+
+    // 正文单独加载，加载完成时弹窗仍是该素材才更新
+    try {
+      const content = await loadMaterialContent(material.id)
+      setViewingMaterial(current =>
+        current && current.id === material.id ? { ...current, content_full: content } : current
+      )
+    } catch (error) {
+      console.error('加载素材正文失败:', error)
+      message.error('加载素材正文失败，请重试')
+    }
   }
 
   // 加载更多
@@ -1319,6 +1352,7 @@ export default function Materials() {
           <Button
             key="select"
             type="primary"
+            disabled={viewingMaterial?.content_full === undefined}
             onClick={() => {
               if (viewingMaterial) {
                 setCurrentMaterial({
@@ -1365,7 +1399,7 @@ export default function Materials() {
                 完整内容
               </div>
               <TextArea
-                value={viewingMaterial.content_full}
+                value={viewingMaterial.content_full ?? '正文加载中...'}
                 readOnly
                 autoSize={{ minRows: 10, maxRows: 30 }}
                 style={{
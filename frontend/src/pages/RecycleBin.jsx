@@ -47,6 +47,22 @@ export default function RecycleBin() {
     loadMaterials()
   }, [page])
 
+  // 查看素材（列表不返回正文，打开弹窗后从详情接口读取）
+  const handleView = async (material) => {
+    setViewingMaterial(material)
+    try {
+      const response = await materialApi.getDetail(material.id)
+      if (response.code === 200) {
+        setViewingMaterial(current =>
+          current && current.id === material.id ? { ...current, content_full: response.data.content } : current
+        )
+      }
+    } catch (error) {
+      console.error('加载素材正文失败:', error)
+      message.error('加载素材正文失败')
+    }
+  }
+
   // 恢复素材
   const handleRestore = async (materialId) => {
     setRestoring(true)
@@ -202,7 +218,7 @@ export default function RecycleBin() {
                   <Button
                     type="link"
                     icon={<EyeOutlined />}
-                    onClick={() => setViewingMaterial(material)}
+                    onClick={() => handleView(material)}
                   >
                     查看
                   </Button>
@@ -243,7 +243,7 @@ export default function Topics() {
                   WebkitLineClamp: 3,
                   WebkitBoxOrient: 'vertical'
                 }}>
-                  {topic.refined_content}
+                  {topic.content_preview}
                 </div>
 
                 {/* 标签 */}